@@ -1,6 +1,10 @@
 import React, { useEffect } from "react";
 import { useDispatch, useSelector } from "react-redux";
-import { fetchChats, deleteChat } from "../store/slices/chatSlice";
+import {
+  fetchChats,
+  fetchMoreChats,
+  deleteChat,
+} from "../store/slices/chatSlice";
 import { MessageSquare, Trash2, Clock } from "lucide-react";
 import { Button } from "./ui/button";
 import { Skeleton } from "./ui/skeleton";
@@ -21,7 +25,7 @@ const ChatListSkeleton = () => (
 
 const ChatList = ({ activeChat, onChatSelect, onChatDeleted }) => {
   const dispatch = useDispatch();
-  const { chats, loading } = useSelector((state) => state.chat);
+  const { chats, chatsCursor, loading } = useSelector((state) => state.chat);
 
   useEffect(() => {
     dispatch(fetchChats());
@@ -135,6 +139,15 @@ const ChatList = ({ activeChat, onChatSelect, onChatDeleted }) => {
           </Button>
         </div>
       ))}
+      {chatsCursor && (
+        <Button
+          variant="ghost"
+          className="w-full text-xs text-muted-foreground"
+          onClick={() => dispatch(fetchMoreChats())}
+        >
+          Load more
+        </Button>
+      )}
     </div>
   );
 };
@@ -85,7 +85,7 @@ const MessageInput = ({ onSend, disabled }) => {
               type="file"
               ref={fileInputRef}
               onChange={handleFileChange}
-              accept=".pdf"
+              accept=".pdf,.txt,.md,.docx,.html,.htm"
               multiple
               className="hidden"
             />
@@ -96,7 +96,7 @@ const MessageInput = ({ onSend, disabled }) => {
               onClick={() => fileInputRef.current?.click()}
               className="flex-shrink-0 h-10 w-10 rounded-xl hover:bg-primary/10 hover:text-primary"
               disabled={disabled}
-              title="Attach PDF files"
+              title="Attach files"
             >
               <Paperclip className="h-5 w-5" />
             </Button>
@@ -30,16 +30,18 @@ const MessageSkeleton = () => (
   </div>
 );
 
-const MessageView = ({ messages, loading }) => {
+const MessageView = ({ messages, loading, hasOlder, onLoadOlder }) => {
   const messagesEndRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  // only follow new messages at the bottom, not older pages prepended at the top
+  const lastMessageId = messages[messages.length - 1]?.id;
   useEffect(() => {
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessageId]);
 
   if (loading) {
     return <MessageSkeleton />;
@@ -70,6 +72,16 @@ const MessageView = ({ messages, loading }) => {
   return (
     <div className="flex-1 overflow-y-auto px-4 md:px-6 lg:px-8 py-6 bg-muted/20">
       <div className="max-w-3xl mx-auto space-y-6">
+        {hasOlder && (
+          <div className="flex justify-center">
+            <button
+              onClick={onLoadOlder}
+              className="text-xs text-muted-foreground hover:text-foreground"
+            >
+              Load earlier messages
+            </button>
+          </div>
+        )}
         {messages.map((msg, index) => (
           <div
             key={msg.id || index}
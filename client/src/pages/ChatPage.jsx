@@ -3,6 +3,7 @@ import { useDispatch, useSelector } from "react-redux";
 import {
   fetchChats,
   fetchMessages,
+  fetchOlderMessages,
   createChat,
   sendMessage,
   setActiveChat,
@@ -44,9 +45,8 @@ import { Badge } from "../components/ui/badge";
 
 const ChatPage = () => {
   const dispatch = useDispatch();
-  const { chats, activeChat, messages, messagesLoading } = useSelector(
-    (state) => state.chat
-  );
+  const { chats, activeChat, messages, messagesCursor, messagesLoading } =
+    useSelector((state) => state.chat);
   const [showNewChatModal, setShowNewChatModal] = useState(false);
   const [newChatFiles, setNewChatFiles] = useState([]);
   const [creating, setCreating] = useState(false);
@@ -166,7 +166,12 @@ const ChatPage = () => {
           {/* Messages or Empty State */}
           {activeChat ? (
             <>
-              <MessageView messages={messages} loading={messagesLoading} />
+              <MessageView
+                messages={messages}
+                loading={messagesLoading}
+                hasOlder={!!messagesCursor}
+                onLoadOlder={() => dispatch(fetchOlderMessages(activeChat.id))}
+              />
               <MessageInput onSend={handleSendMessage} />
             </>
           ) : (
@@ -237,7 +242,7 @@ const ChatPage = () => {
               <div className="relative">
                 <input
                   type="file"
-                  accept=".pdf"
+                  accept=".pdf,.txt,.md,.docx,.html,.htm"
                   multiple
                   className="hidden"
                   id="chat-file-upload"
@@ -249,7 +254,7 @@ const ChatPage = () => {
                 >
                   <Upload className="h-6 w-6 text-muted-foreground" />
                   <div className="text-center">
-                    <p className="text-sm font-medium">Click to upload PDFs</p>
+                    <p className="text-sm font-medium">Click to upload documents</p>
                     <p className="text-xs text-muted-foreground">
                       or drag and drop
                     </p>
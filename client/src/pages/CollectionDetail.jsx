@@ -114,7 +114,7 @@ const CollectionDetail = () => {
     setDragActive(false);
 
     const files = Array.from(e.dataTransfer.files).filter((file) =>
-      file.name.endsWith(".pdf")
+      /\.(pdf|txt|md|docx|html?)$/i.test(file.name)
     );
     if (files.length > 0) {
       setSelectedFiles([...selectedFiles, ...files]);
@@ -182,7 +182,7 @@ const CollectionDetail = () => {
             >
               <input
                 type="file"
-                accept=".pdf"
+                accept=".pdf,.txt,.md,.docx,.html,.htm"
                 multiple
                 className="absolute inset-0 w-full h-full opacity-0 cursor-pointer"
                 onChange={(e) =>
@@ -198,10 +198,10 @@ const CollectionDetail = () => {
                 }`}
               />
               <p className="font-medium">
-                Drop PDF files here or click to browse
+                Drop files here or click to browse
               </p>
               <p className="text-sm text-muted-foreground mt-1">
-                Supports multiple PDF files
+                Supports PDF, DOCX, TXT, Markdown and HTML
               </p>
             </div>
 
@@ -285,7 +285,7 @@ const CollectionDetail = () => {
                 </div>
                 <h3 className="font-semibold text-lg mb-2">No documents yet</h3>
                 <p className="text-sm text-muted-foreground max-w-sm mx-auto">
-                  Upload PDF files to this collection to get started
+                  Upload files to this collection to get started
                 </p>
               </div>
             ) : (
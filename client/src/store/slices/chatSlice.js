@@ -16,6 +16,19 @@ export const fetchChats = createAsyncThunk(
   }
 );
 
+export const fetchMoreChats = createAsyncThunk(
+  "chat/fetchMoreChats",
+  async (_, { getState, rejectWithValue }) => {
+    try {
+      const response = await chatsAPI.listChats(getState().chat.chatsCursor);
+      return response.data;
+    } catch (error) {
+      toast.error("Failed to load chats");
+      return rejectWithValue(error.response?.data);
+    }
+  }
+);
+
 export const fetchMessages = createAsyncThunk(
   "chat/fetchMessages",
   async (chatId, { rejectWithValue }) => {
@@ -29,6 +42,22 @@ export const fetchMessages = createAsyncThunk(
   }
 );
 
+export const fetchOlderMessages = createAsyncThunk(
+  "chat/fetchOlderMessages",
+  async (chatId, { getState, rejectWithValue }) => {
+    try {
+      const response = await chatsAPI.getMessages(
+        chatId,
+        getState().chat.messagesCursor
+      );
+      return response.data;
+    } catch (error) {
+      toast.error("Failed to load messages");
+      return rejectWithValue(error.response?.data);
+    }
+  }
+);
+
 export const createChat = createAsyncThunk(
   "chat/createChat",
   async ({ name, files }, { rejectWithValue }) => {
@@ -53,9 +82,31 @@ export const createChat = createAsyncThunk(
   }
 );
 
+// The server names a chat in the background after its first reply
+const GENERIC_CHAT_NAMES = ["New Chat", "Documents", ""];
+
+export const pollChatTitle = createAsyncThunk(
+  "chat/pollChatTitle",
+  async (chatId, { rejectWithValue }) => {
+    for (let attempt = 0; attempt < 10; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      try {
+        const response = await chatsAPI.getChat(chatId, { limit: 1 });
+        const { name } = response.data.chat;
+        if (!GENERIC_CHAT_NAMES.includes(name)) {
+          return { id: chatId, name };
+        }
+      } catch (error) {
+        return rejectWithValue(error.response?.data);
+      }
+    }
+    return rejectWithValue(null);
+  }
+);
+
 export const sendMessage = createAsyncThunk(
   "chat/sendMessage",
-  async ({ chatId, content, files }, { rejectWithValue }) => {
+  async ({ chatId, content, files }, { dispatch, rejectWithValue }) => {
     try {
       // Upload files first if any
       if (files && files.length > 0) {
@@ -67,6 +118,9 @@ export const sendMessage = createAsyncThunk(
       // Send message
       if (content.trim()) {
         const response = await chatsAPI.sendMessage(chatId, { content });
+        if (response.data.title_pending) {
+          dispatch(pollChatTitle(chatId));
+        }
         return response.data;
       }
       return null;
@@ -95,8 +149,10 @@ const chatSlice = createSlice({
   name: "chat",
   initialState: {
     chats: [],
+    chatsCursor: null,
     activeChat: null,
     messages: [],
+    messagesCursor: null,
     loading: false,
     messagesLoading: false,
     sendingMessage: false,
@@ -109,6 +165,7 @@ const chatSlice = createSlice({
     clearActiveChat: (state) => {
       state.activeChat = null;
       state.messages = [];
+      state.messagesCursor = null;
     },
     // Optimistic update - add user message immediately
     addOptimisticMessage: (state, action) => {
@@ -142,24 +199,37 @@ const chatSlice = createSlice({
       })
       .addCase(fetchChats.fulfilled, (state, action) => {
         state.loading = false;
-        state.chats = action.payload;
+        state.chats = action.payload.items;
+        state.chatsCursor = action.payload.next_cursor;
       })
       .addCase(fetchChats.rejected, (state, action) => {
         state.loading = false;
         state.error = action.payload;
       })
+      .addCase(fetchMoreChats.fulfilled, (state, action) => {
+        const known = new Set(state.chats.map((c) => c.id));
+        state.chats.push(
+          ...action.payload.items.filter((c) => !known.has(c.id))
+        );
+        state.chatsCursor = action.payload.next_cursor;
+      })
       // Fetch messages
       .addCase(fetchMessages.pending, (state) => {
         state.messagesLoading = true;
       })
       .addCase(fetchMessages.fulfilled, (state, action) => {
         state.messagesLoading = false;
-        state.messages = action.payload;
+        state.messages = action.payload.items;
+        state.messagesCursor = action.payload.next_cursor;
       })
       .addCase(fetchMessages.rejected, (state, action) => {
         state.messagesLoading = false;
         state.error = action.payload;
       })
+      .addCase(fetchOlderMessages.fulfilled, (state, action) => {
+        state.messages = [...action.payload.items, ...state.messages];
+        state.messagesCursor = action.payload.next_cursor;
+      })
       // Create chat
       .addCase(createChat.fulfilled, (state, action) => {
         state.chats.unshift(action.payload);
@@ -196,6 +266,16 @@ const chatSlice = createSlice({
           }
         }
       })
+      .addCase(pollChatTitle.fulfilled, (state, action) => {
+        const { id, name } = action.payload;
+        if (state.activeChat?.id === id) {
+          state.activeChat.name = name;
+        }
+        const chat = state.chats.find((c) => c.id === id);
+        if (chat) {
+          chat.name = name;
+        }
+      })
       .addCase(sendMessage.rejected, (state) => {
         state.sendingMessage = false;
         // Remove temporary and loading messages on error
@@ -209,6 +289,7 @@ const chatSlice = createSlice({
         if (state.activeChat?.id === action.payload) {
           state.activeChat = null;
           state.messages = [];
+          state.messagesCursor = null;
         }
       });
   },
@@ -37,6 +37,7 @@ export const authAPI = {
   register: (data) => api.post("/api/v1/auth/register", data),
   login: (data) => api.post("/api/v1/auth/login", data),
   getCurrentUser: () => api.get("/api/v1/auth/me"),
+  changePassword: (data) => api.post("/api/v1/auth/change-password", data),
 };
 
 // Chats API
@@ -45,16 +46,21 @@ export const chatsAPI = {
     api.post("/api/v1/chats/", formData, {
       headers: { "Content-Type": "multipart/form-data" },
     }),
-  listChats: () => api.get("/api/v1/chats/"),
-  getChat: (id) => api.get(`/api/v1/chats/${id}`),
+  listChats: (cursor) => api.get("/api/v1/chats/", { params: { cursor } }),
+  getChat: (id, params) => api.get(`/api/v1/chats/${id}`, { params }),
   updateChat: (id, data) => api.put(`/api/v1/chats/${id}`, data),
   deleteChat: (id) => api.delete(`/api/v1/chats/${id}`),
   sendMessage: (id, data) => api.post(`/api/v1/chats/${id}/messages`, data),
-  getMessages: (id) => api.get(`/api/v1/chats/${id}/messages`),
+  getMessages: (id, cursor) =>
+    api.get(`/api/v1/chats/${id}/messages`, { params: { cursor } }),
   uploadToChat: (id, formData) =>
     api.post(`/api/v1/chats/${id}/upload`, formData, {
       headers: { "Content-Type": "multipart/form-data" },
     }),
+  attachCollection: (id, collectionId) =>
+    api.post(`/api/v1/chats/${id}/collections`, { collection_id: collectionId }),
+  detachCollection: (id, collectionId) =>
+    api.delete(`/api/v1/chats/${id}/collections/${collectionId}`),
 };
 
 // Collections API
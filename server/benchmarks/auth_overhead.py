@@ -0,0 +1,98 @@
+"""Per-request authentication overhead.
+
+Boots the app in-process on SQLite and times GET /api/v1/chats/ (a
+read-only endpoint) and GET /api/v1/auth/me with three kinds of token:
+
+- legacy: email-only token, the user is loaded from the DB on every request
+- cached: uid/ver token through get_current_user, served from the user cache
+- stateless: uid/ver token through get_token_user, no user lookup at all
+
+Reports mean/p50/p99 latency and users-table queries per request.
+
+    cd server && python -m benchmarks.auth_overhead --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def run(requests):
+    import httpx
+    from sqlalchemy import event
+    from contextbase.core import async_engine, create_access_token
+    from contextbase.main import create_app
+
+    app = create_app()
+    user_queries = 0
+
+    def count(conn, cursor, statement, *args):
+        nonlocal user_queries
+        if "FROM users" in statement:
+            user_queries += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            await c.post("/api/v1/auth/register", json={"name": "bench", "email": "bench@example.com", "password": "pw"})
+            token = (await c.post("/api/v1/auth/login", json={"email": "bench@example.com", "password": "pw"})).json()["access_token"]
+            legacy = create_access_token({"sub": "bench@example.com"})
+
+            cases = [
+                ("legacy", "/api/v1/chats/", legacy),
+                ("stateless", "/api/v1/chats/", token),
+                ("legacy", "/api/v1/auth/me", legacy),
+                ("cached", "/api/v1/auth/me", token),
+            ]
+            for mode, path, tok in cases:
+                headers = {"Authorization": f"Bearer {tok}"}
+                for _ in range(50):  # warm up
+                    (await c.get(path, headers=headers)).raise_for_status()
+                user_queries = 0
+                latencies = []
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    (await c.get(path, headers=headers)).raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                results.append({
+                    "mode": mode,
+                    "path": path,
+                    "mean_us": round(statistics.mean(latencies) * 1e6),
+                    "p50_us": round(statistics.median(latencies) * 1e6),
+                    "p99_us": round(_percentile(latencies, 99) * 1e6),
+                    "user_queries_per_request": round(user_queries / requests, 3),
+                })
+
+    return {"benchmark": "auth_overhead", "requests": requests, "runs": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+    )
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Database cost of a multi-file upload.
+
+Uploads N small text files in one POST /documents/collections/{id}/documents
+and reports, for that request only, how many statements the async engine
+ran and how long it kept a pooled connection checked out. Indexing happens
+afterwards on the ingestion workers and is not counted.
+
+    cd server && python -m benchmarks.bulk_upload --files 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+class DatabaseCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements = 0
+        self.checkouts = 0
+        self.held = 0.0
+        self._since = None
+        event.listen(engine, "before_cursor_execute", self._execute)
+        event.listen(engine, "checkout", self._checkout)
+        event.listen(engine, "checkin", self._checkin)
+
+    def _execute(self, *_):
+        self.statements += 1
+
+    def _checkout(self, *_):
+        self.checkouts += 1
+        self._since = time.perf_counter()
+
+    def _checkin(self, *_):
+        if self._since is not None:
+            self.held += time.perf_counter() - self._since
+            self._since = None
+
+    def reset(self):
+        self.statements, self.checkouts, self.held = 0, 0, 0.0
+
+
+async def run(files):
+    import httpx
+    from contextbase.core.database import async_engine
+    from contextbase.main import create_app
+
+    app = create_app()
+    counter = DatabaseCounter(async_engine.sync_engine)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            await c.post("/api/v1/auth/register", json={"name": "bench", "email": "bench@example.com", "password": "pw"})
+            token = (await c.post("/api/v1/auth/login", json={"email": "bench@example.com", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            collection_id = (await c.post("/api/v1/documents/collections", json={"name": "bench"}, headers=headers)).json()["id"]
+
+            upload = [("files", (f"note-{i}.txt", f"note {i}: the quick brown fox".encode(), "text/plain")) for i in range(files)]
+            counter.reset()
+            start = time.perf_counter()
+            r = await c.post(f"/api/v1/documents/collections/{collection_id}/documents", files=upload, headers=headers)
+            r.raise_for_status()
+            request_s = time.perf_counter() - start
+            stats = {"statements": counter.statements, "checkouts": counter.checkouts, "connection_held_ms": round(counter.held * 1000, 1)}
+
+    return {"benchmark": "bulk_upload", "files": files, "request_ms": round(request_s * 1000, 1), **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+        PARSE_WORKERS="0",
+    )
+    print(json.dumps(asyncio.run(run(args.files)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
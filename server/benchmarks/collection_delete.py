@@ -0,0 +1,82 @@
+"""Deleting a collection with many documents.
+
+Seeds a collection with N documents (rows plus a small file each, no
+vectors) and times DELETE /documents/collections/{id}. The request only
+does bulk SQL; files and vectors are removed afterwards by the reaper,
+whose drain time is reported separately.
+
+    cd server && python -m benchmarks.collection_delete --documents 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+
+def seed(collection_id, count, upload_dir):
+    from contextbase.core import engine
+    from contextbase.models import Document
+
+    os.makedirs(upload_dir, exist_ok=True)
+    rows = []
+    for i in range(count):
+        path = os.path.join(upload_dir, f"{uuid.uuid4().hex}.txt")
+        with open(path, "w") as f:
+            f.write(f"document {i}")
+        rows.append({
+            "id": str(uuid.uuid4()), "collection_id": collection_id, "file_path": path, "filename": f"{i}.txt",
+            "file_size": "10 B", "status": "ready", "progress": 100,
+        })
+    with engine.begin() as conn:
+        conn.execute(Document.__table__.insert(), rows)
+
+
+async def run(documents):
+    import httpx
+    from contextbase.core import settings
+    from contextbase.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            await c.post("/api/v1/auth/register", json={"name": "bench", "email": "bench@example.com", "password": "pw"})
+            token = (await c.post("/api/v1/auth/login", json={"email": "bench@example.com", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            collection_id = (await c.post("/api/v1/documents/collections", json={"name": "bench"}, headers=headers)).json()["id"]
+            await asyncio.to_thread(seed, collection_id, documents, settings.UPLOAD_DIR)
+
+            start = time.perf_counter()
+            r = await c.delete(f"/api/v1/documents/collections/{collection_id}", headers=headers)
+            r.raise_for_status()
+            request_s = time.perf_counter() - start
+            while os.listdir(settings.UPLOAD_DIR):
+                await asyncio.sleep(0.05)
+            drained_s = time.perf_counter() - start
+
+    return {"benchmark": "collection_delete", "documents": documents, "request_ms": round(request_s * 1000, 1), "files_removed_s": round(drained_s, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+    )
+    print(json.dumps(asyncio.run(run(args.documents)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
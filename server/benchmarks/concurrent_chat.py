@@ -0,0 +1,92 @@
+"""Concurrent chat load benchmark.
+
+Boots the app in-process on SQLite, in-memory Qdrant and the fake LLM /
+embedding backends, then sends many chat messages at once and reports
+latency percentiles and how many threadpool workers were in use.
+
+    cd server && python -m benchmarks.concurrent_chat --concurrency 200 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def run(concurrency, llm_latency):
+    import anyio.to_thread
+    import httpx
+    from contextbase.main import create_app
+
+    app = create_app()
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    peak_threads = 0
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while True:
+            peak_threads = max(peak_threads, limiter.borrowed_tokens)
+            await asyncio.sleep(0.005)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            await c.post("/api/v1/auth/register", json={"name": "bench", "email": "bench@example.com", "password": "pw"})
+            token = (await c.post("/api/v1/auth/login", json={"email": "bench@example.com", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            chat_ids = [(await c.post("/api/v1/chats/", headers=headers)).json()["chat"]["id"] for _ in range(concurrency)]
+
+            async def one(chat_id):
+                start = time.perf_counter()
+                r = await c.post(f"/api/v1/chats/{chat_id}/messages", json={"content": "hello there"}, headers=headers)
+                r.raise_for_status()
+                return time.perf_counter() - start
+
+            sampler = asyncio.create_task(sample_threads())
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(one(cid) for cid in chat_ids))
+            wall = time.perf_counter() - start
+            sampler.cancel()
+
+    return {
+        "benchmark": "concurrent_chat",
+        "concurrency": concurrency,
+        "llm_latency_s": llm_latency,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(concurrency / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "peak_threadpool_workers": peak_threads,
+        "threadpool_limit": limiter.total_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds the fake LLM takes per call")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+        FAKE_LLM_LATENCY=str(args.llm_latency),
+    )
+    print(json.dumps(asyncio.run(run(args.concurrency, args.llm_latency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Prompt tokens spent on retrieved context, raw chunks vs assembled.
+
+Indexes a synthetic manual whose procedures each run over several
+overlapping chunks (CHUNK_SIZE / CHUNK_OVERLAP as configured), plus a
+lightly edited second copy of it, then asks about random procedures and
+compares the context tokens of the top-k chunks as they come out of
+search with what assemble_context puts in the prompt. "steps_kept"
+checks that every step of the asked procedure found in the raw chunks
+is still in the assembled context. Token counts use tiktoken when its
+encoding can be loaded, else the len/4 estimate.
+
+Retrieval is the BM25 side alone: the offline fake embeddings rank at
+random, where a real model would also return the asked procedure's
+neighbouring chunks.
+
+    cd server && python -m benchmarks.context_assembly --queries 200 --top-k 4 8
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+
+WORDS = "pump valve pressure sensor motor gasket flow temperature error reset manual controller relay fuse coolant".split()
+
+
+def write_manual(path, procedures, steps, seed=0, edited=False):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for p in range(procedures):
+            f.write(f"Procedure P-{p}\n\n")
+            for s in range(steps):
+                body = " ".join(rng.choice(WORDS) for _ in range(25))
+                if edited and s % 3 == 0:
+                    body = body.upper()
+                f.write(f"Step P-{p}.{s}: {body}.\n")
+            f.write("\n")
+
+
+def run(procedures, steps, queries, top_ks):
+    from contextbase.services.context import assemble_context
+    from contextbase.services.tokens import count_tokens, load_tokenizer
+    from contextbase.services.vector_store import index_document, _lexical_ranking
+
+    workdir = os.environ["UPLOAD_DIR"]
+    os.makedirs(workdir, exist_ok=True)
+    for name, edited in (("manual", False), ("manual-rev2", True)):
+        path = os.path.join(workdir, f"{name}.txt")
+        write_manual(path, procedures, steps, edited=edited)
+        index_document(path, "bench", name)
+
+    rng = random.Random(1)
+    asked = [rng.randrange(procedures) for _ in range(queries)]
+    runs = []
+    for top_k in top_ks:
+        raw, assembled, kept, latency = [], [], 0, []
+        for p in asked:
+            docs = [doc for _, doc in _lexical_ranking(f"Procedure P-{p} steps", "bench")[:top_k]]
+            t = time.perf_counter()
+            context = assemble_context(docs)
+            latency.append(time.perf_counter() - t)
+            raw.append(sum(count_tokens(d.page_content) for d in docs))
+            assembled.append(sum(count_tokens(d.page_content) for d in context))
+            found = lambda texts: {m.casefold() for t in texts for m in re.findall(rf"Step P-{p}\.\d+", t)}
+            kept += found(d.page_content for d in context) >= found(d.page_content for d in docs)
+        runs.append({
+            "top_k": top_k,
+            "raw_tokens_p50": statistics.median(raw),
+            "assembled_tokens_p50": statistics.median(assembled),
+            "saved_pct": round((1 - sum(assembled) / sum(raw)) * 100, 1),
+            "steps_kept": round(kept / queries, 3),
+            "assemble_p50_ms": round(statistics.median(latency) * 1000, 3),
+        })
+    return {
+        "benchmark": "context_assembly", "procedures": procedures, "queries": queries,
+        "tokenizer": "tiktoken" if load_tokenizer() else "estimate", "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procedures", type=int, default=300)
+    parser.add_argument("--steps", type=int, default=12, help="steps per procedure, about 200 characters each")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[4, 8])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        PARSE_WORKERS="0",
+    )
+    print(json.dumps(run(args.procedures, args.steps, args.queries, args.top_k), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Latency of a chat's first reply, which also names the chat.
+
+Creates N chats and sends each its first message at once, with the fake
+LLM answering after --llm-latency seconds. Reports reply latency and how
+many model calls went into titles, counted once every chat has a name.
+
+    cd server && python -m benchmarks.first_reply --chats 50 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def _title_calls():
+    from contextbase.core.metrics import LLM_LATENCY
+
+    return sum(s.value for m in LLM_LATENCY.collect() for s in m.samples if s.name.endswith("_count") and s.labels["operation"] == "title")
+
+
+async def run(chats, llm_latency):
+    import httpx
+    from contextbase.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            await c.post("/api/v1/auth/register", json={"name": "bench", "email": "bench@example.com", "password": "pw"})
+            token = (await c.post("/api/v1/auth/login", json={"email": "bench@example.com", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            chat_ids = [(await c.post("/api/v1/chats/", headers=headers)).json()["chat"]["id"] for _ in range(chats)]
+
+            async def first(i, chat_id):
+                start = time.perf_counter()
+                r = await c.post(f"/api/v1/chats/{chat_id}/messages", json={"content": f"How do I reset pump {i}?"}, headers=headers)
+                r.raise_for_status()
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(first(i, cid) for i, cid in enumerate(chat_ids)))
+            while True:
+                names = [(await c.get(f"/api/v1/chats/{cid}", params={"limit": 1}, headers=headers)).json()["chat"]["name"] for cid in chat_ids]
+                if "New Chat" not in names:
+                    break
+                await asyncio.sleep(0.05)
+            titled_s = time.perf_counter() - start
+
+    return {
+        "benchmark": "first_reply",
+        "chats": chats,
+        "llm_latency": llm_latency,
+        "reply_p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "reply_max_ms": round(max(latencies) * 1000, 1),
+        "all_titled_s": round(titled_s, 2),
+        "title_llm_calls": int(_title_calls()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+        FAKE_LLM_LATENCY=str(args.llm_latency),
+    )
+    print(json.dumps(asyncio.run(run(args.chats, args.llm_latency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
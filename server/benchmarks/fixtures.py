@@ -0,0 +1,32 @@
+"""Synthetic input files for the benchmarks."""
+
+
+def make_pdf(path, pages, lines=40):
+    """write a plain-text PDF with `pages` pages of `lines` lines each"""
+    body = {3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for p in range(pages):
+        page_id, content_id = 4 + 2 * p, 5 + 2 * p
+        kids.append(f"{page_id} 0 R")
+        text = "".join(f"(page {p} line {l} lorem ipsum dolor sit amet part-{p * 1000 + l}) Tj T* " for l in range(lines))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {text} ET".encode()
+        body[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        body[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+    body[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    body[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for i in sorted(body):
+        offsets[i] = len(out)
+        out += f"{i} 0 obj\n".encode() + body[i] + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(body) + 1}\n0000000000 65535 f \n".encode()
+    for i in sorted(body):
+        out += f"{offsets[i]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(body) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
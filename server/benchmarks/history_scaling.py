@@ -0,0 +1,88 @@
+"""Per-turn cost as a chat grows.
+
+Seeds chats with 10 to 5000 messages, then posts a few more turns to each
+and records, per turn: request latency, SQL statements run by the request,
+and the prompt tokens the (fake) LLM was sent. History is fetched with a
+LIMIT and trimmed to HISTORY_TOKEN_BUDGET, so all three should stay flat
+as the chat gets longer.
+
+    cd server && python -m benchmarks.history_scaling --sizes 10 100 1000 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+async def run(sizes, turns):
+    import httpx
+    from sqlalchemy import event
+    from contextbase.core import async_engine
+    from contextbase.core.metrics import LLM_TOKENS
+    from contextbase.main import create_app
+    from benchmarks.message_pagination import seed
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    prompt_tokens = LLM_TOKENS.labels("simple", "input")
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            await c.post("/api/v1/auth/register", json={"name": "bench", "email": "bench@example.com", "password": "pw"})
+            token = (await c.post("/api/v1/auth/login", json={"email": "bench@example.com", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            results = []
+            for size in sizes:
+                chat_id = (await c.post("/api/v1/chats/", headers=headers)).json()["chat"]["id"]
+                await asyncio.to_thread(seed, chat_id, size)
+                latency, queries, tokens = [], [], []
+                for i in range(turns):
+                    before_statements, before_tokens = statements, prompt_tokens._value.get()
+                    t = time.perf_counter()
+                    r = await c.post(f"/api/v1/chats/{chat_id}/messages", json={"content": f"follow-up question {i}"}, headers=headers)
+                    r.raise_for_status()
+                    latency.append(time.perf_counter() - t)
+                    queries.append(statements - before_statements)
+                    tokens.append(prompt_tokens._value.get() - before_tokens)
+                results.append({
+                    "messages": size,
+                    "turn_ms": round(statistics.median(latency) * 1000, 2),
+                    "sql_statements": statistics.median(queries),
+                    "prompt_tokens": statistics.median(tokens),
+                })
+
+    return {"benchmark": "history_scaling", "turns": turns, "runs": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+        METRICS_ENABLED="true",
+    )
+    print(json.dumps(asyncio.run(run(args.sizes, args.turns)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
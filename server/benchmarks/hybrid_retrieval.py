@@ -0,0 +1,81 @@
+"""Exact-identifier recall and latency, dense only vs hybrid.
+
+Indexes a synthetic manual where every section mentions one error code
+(ERR-4000, ERR-4001, ...), then asks for random codes and checks whether
+the section naming that code is in the top k. Dense embeddings are poor
+at exact tokens like these; the BM25 side should find them. Runs
+offline with the fake embedding model, so the dense numbers are a floor
+rather than what a real model would score; pass --embedding openai to
+compare against the real thing.
+
+    cd server && python -m benchmarks.hybrid_retrieval --sections 2000 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+WORDS = "pump valve pressure sensor motor gasket flow temperature error reset manual controller relay fuse coolant".split()
+
+
+def write_manual(path, sections, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(sections):
+            body = " ".join(rng.choice(WORDS) for _ in range(60))
+            f.write(f"Code ERR-{4000 + i}: {body}\n\n")
+
+
+def run(sections, queries, top_k):
+    from contextbase.core import settings
+    from contextbase.services.vector_store import index_document, search_documents
+
+    workdir = os.environ["UPLOAD_DIR"]
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, "manual.txt")
+    write_manual(path, sections)
+    start = time.perf_counter()
+    index_document(path, "bench", "manual")
+    index_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    asked = [rng.randrange(sections) for _ in range(queries)]
+    results = {}
+    for mode, hybrid in (("dense", False), ("hybrid", True)):
+        settings.RAG_HYBRID_ENABLED = hybrid
+        hits, latency = 0, []
+        for i in asked:
+            code = f"ERR-{4000 + i}"
+            t = time.perf_counter()
+            docs = search_documents(f"what does {code} mean?", "bench", top_k=top_k)
+            latency.append(time.perf_counter() - t)
+            hits += any(f"{code}:" in d.page_content for d in docs)
+        results[mode] = {"recall_at_k": round(hits / queries, 3), "p50_ms": round(statistics.median(latency) * 1000, 2)}
+    return {"benchmark": "hybrid_retrieval", "sections": sections, "queries": queries, "top_k": top_k, "index_s": round(index_s, 1), **results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--embedding", default="fake")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER=args.embedding,
+        EMBEDDING_CACHE_PATH=f"{workdir}/embeddings.sqlite3",
+        PARSE_WORKERS="0",
+    )
+    print(json.dumps(run(args.sections, args.queries, args.top_k), indent=2))
+
+
+if __name__ == "__main__":
+    main()
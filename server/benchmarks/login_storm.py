@@ -0,0 +1,116 @@
+"""Login storm load test.
+
+Boots the app in-process on SQLite, registers a set of users, then fires
+a burst of concurrent logins while probing an unrelated endpoint (chat
+list) at a steady rate. Reports login latency percentiles, how many
+logins were turned away with 429, and the probe's latency during the burst.
+
+    cd server && python -m benchmarks.login_storm --logins 200 --hash-workers 2
+    cd server && python -m benchmarks.login_storm --logins 200 --hash-workers 0   # thread executor
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _summary(latencies):
+    if not latencies:
+        return {}
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+async def run(users, logins, probe_interval):
+    import httpx
+    from contextbase.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            for i in range(users):
+                await c.post("/api/v1/auth/register", json={"name": f"u{i}", "email": f"u{i}@example.com", "password": "pw"})
+            token = (await c.post("/api/v1/auth/login", json={"email": "u0@example.com", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            statuses = collections.Counter()
+            retry_after = []
+            login_latencies, probe_latencies = [], []
+
+            async def login(i):
+                start = time.perf_counter()
+                r = await c.post("/api/v1/auth/login", json={"email": f"u{i % users}@example.com", "password": "pw"})
+                statuses[r.status_code] += 1
+                if r.status_code == 429:
+                    retry_after.append(int(r.headers["retry-after"]))
+                else:
+                    login_latencies.append(time.perf_counter() - start)
+
+            async def probe(done):
+                while not done.is_set():
+                    start = time.perf_counter()
+                    (await c.get("/api/v1/chats/", headers=headers)).raise_for_status()
+                    probe_latencies.append(time.perf_counter() - start)
+                    await asyncio.sleep(probe_interval)
+
+            done = asyncio.Event()
+            prober = asyncio.create_task(probe(done))
+            start = time.perf_counter()
+            await asyncio.gather(*(login(i) for i in range(logins)))
+            wall = time.perf_counter() - start
+            done.set()
+            await prober
+
+    return {
+        "benchmark": "login_storm",
+        "logins": logins,
+        "wall_s": round(wall, 3),
+        "statuses": dict(statuses),
+        "max_retry_after_s": max(retry_after, default=None),
+        "login": _summary(login_latencies),
+        "probe": {"requests": len(probe_latencies), **_summary(probe_latencies)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--hash-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+        BCRYPT_ROUNDS=str(args.rounds),
+        HASH_WORKERS=str(args.hash_workers),
+        HASH_QUEUE_SIZE=str(args.queue_size),
+    )
+    result = asyncio.run(run(args.users, args.logins, args.probe_interval))
+    result.update(rounds=args.rounds, hash_workers=args.hash_workers, queue_size=args.queue_size)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
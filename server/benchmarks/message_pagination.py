@@ -0,0 +1,133 @@
+"""Keyset pagination at depth.
+
+Seeds one chat with N messages (1M by default) straight into SQLite, then
+times GET /api/v1/chats/{id}/messages for cursors taken at increasing
+depths into the history. Keyset pages seek on (chat_id, created_at, id),
+so latency should stay flat no matter how deep the cursor is. The same
+depths are also fetched with LIMIT/OFFSET for comparison.
+
+    cd server && python -m benchmarks.message_pagination --messages 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+
+def seed(chat_id, count, batch=50_000):
+    from contextbase.core import engine
+    from contextbase.models import Message
+
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, count, batch):
+            rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "chat_id": chat_id,
+                    "content": f"message {i} " + "lorem ipsum " * 20,
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "created_at": start + timedelta(seconds=i),
+                }
+                for i in range(offset, min(offset + batch, count))
+            ]
+            conn.execute(Message.__table__.insert(), rows)
+
+
+def cursor_at(chat_id, depth):
+    """cursor a client would hold after paging `depth` messages back from the newest"""
+    from sqlalchemy import select
+    from contextbase.api.v1.pagination import encode_cursor
+    from contextbase.core import engine
+    from contextbase.models import Message
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(Message.created_at, Message.id).where(Message.chat_id == chat_id)
+            .order_by(Message.created_at.desc(), Message.id.desc()).offset(depth - 1).limit(1)
+        ).one()
+    return encode_cursor(row.created_at, row.id)
+
+
+def offset_page(chat_id, depth, limit):
+    from sqlalchemy import select
+    from contextbase.core import engine
+    from contextbase.models import Message
+
+    with engine.connect() as conn:
+        return conn.execute(
+            select(Message).where(Message.chat_id == chat_id)
+            .order_by(Message.created_at.desc(), Message.id.desc()).offset(depth).limit(limit)
+        ).all()
+
+
+async def run(messages, limit, repeat):
+    import httpx
+    from contextbase.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            await c.post("/api/v1/auth/register", json={"name": "bench", "email": "bench@example.com", "password": "pw"})
+            token = (await c.post("/api/v1/auth/login", json={"email": "bench@example.com", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            chat_id = (await c.post("/api/v1/chats/", headers=headers)).json()["chat"]["id"]
+
+            start = time.perf_counter()
+            await asyncio.to_thread(seed, chat_id, messages)
+            seed_s = time.perf_counter() - start
+
+            depths = [d for d in (0, 1_000, 10_000, 100_000, 500_000, messages - limit) if 0 <= d <= messages - limit]
+            results = []
+            for depth in depths:
+                params = {"limit": limit}
+                if depth:
+                    params["cursor"] = await asyncio.to_thread(cursor_at, chat_id, depth)
+                keyset = []
+                for _ in range(repeat):
+                    t = time.perf_counter()
+                    r = await c.get(f"/api/v1/chats/{chat_id}/messages", params=params, headers=headers)
+                    r.raise_for_status()
+                    keyset.append(time.perf_counter() - t)
+                offset = []
+                for _ in range(repeat):
+                    t = time.perf_counter()
+                    await asyncio.to_thread(offset_page, chat_id, depth, limit)
+                    offset.append(time.perf_counter() - t)
+                results.append({
+                    "depth": depth,
+                    "keyset_http_ms": round(statistics.median(keyset) * 1000, 2),
+                    "offset_query_ms": round(statistics.median(offset) * 1000, 2),
+                    "items": len(r.json()["items"]),
+                })
+
+    return {"benchmark": "message_pagination", "messages": messages, "page_size": limit, "seed_s": round(seed_s, 1), "runs": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+    )
+    print(json.dumps(asyncio.run(run(args.messages, args.limit, args.repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
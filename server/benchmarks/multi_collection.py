@@ -0,0 +1,94 @@
+"""Retrieval latency for chats that search several collections.
+
+Indexes N small collections, then times asearch_collections (concurrent
+fan-out) against searching the same collections one after another.
+Embedded Qdrant answers in microseconds, so --rtt adds a simulated
+network round trip to every query_points call. With fan-out the total
+should track one round trip regardless of N; sequentially it grows
+linearly.
+
+    cd server && python -m benchmarks.multi_collection --collections 1 2 4 8 --rtt 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def add_latency(rtt):
+    from contextbase.services.qdrant import get_qdrant_client
+
+    client = get_qdrant_client()
+    query_points = client.query_points
+
+    def slow_query_points(*args, **kwargs):
+        time.sleep(rtt)
+        return query_points(*args, **kwargs)
+
+    client.query_points = slow_query_points
+
+
+def index(names, workdir):
+    from contextbase.services.vector_store import index_document
+    from benchmarks.hybrid_retrieval import write_manual
+
+    for i, name in enumerate(names):
+        path = os.path.join(workdir, f"{name}.txt")
+        write_manual(path, 50, seed=i)
+        index_document(path, name, f"doc-{name}")
+
+
+async def run(counts, rtt, repeat):
+    from contextbase.services.vector_store import asearch_collections, asearch_documents
+
+    workdir = os.environ["UPLOAD_DIR"]
+    os.makedirs(workdir, exist_ok=True)
+    names = [f"collection-{i}" for i in range(max(counts))]
+    await asyncio.to_thread(index, names, workdir)
+    add_latency(rtt)
+
+    results = []
+    for n in counts:
+        fan_out, sequential = [], []
+        for r in range(repeat):
+            query = f"what does ERR-{4000 + r} mean?"
+            t = time.perf_counter()
+            docs = await asearch_collections(query, names[:n])
+            fan_out.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            for name in names[:n]:
+                await asearch_documents(query, name)
+            sequential.append(time.perf_counter() - t)
+        results.append({
+            "collections": n,
+            "fan_out_ms": round(statistics.median(fan_out) * 1000, 1),
+            "sequential_ms": round(statistics.median(sequential) * 1000, 1),
+            "chunks": len(docs),
+        })
+    return {"benchmark": "multi_collection", "rtt_ms": rtt * 1000, "runs": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collections", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rtt", type=float, default=20, help="simulated milliseconds per qdrant query")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH=f"{workdir}/embeddings.sqlite3",
+        PARSE_WORKERS="0",
+    )
+    print(json.dumps(asyncio.run(run(args.collections, args.rtt / 1000, args.repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""PDF parse/split throughput by parse worker count.
+
+Generates a synthetic PDF and streams it through loaders.iter_chunks with
+PARSE_WORKERS set to 0 (inline), 1, 2, ... up to the core count, reporting
+pages/sec and time to the first chunk for each.
+
+    cd server && python -m benchmarks.parse_throughput --pages 400
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import make_pdf
+
+
+def run(path, pages, worker_counts, repeat):
+    from contextbase.core.config import settings
+    from contextbase.services import loaders
+
+    results = []
+    for workers in worker_counts:
+        loaders.shutdown_parse_pool()
+        settings.PARSE_WORKERS = workers
+        # spawn the pool outside the timed runs
+        for _ in loaders.iter_chunks(path):
+            break
+
+        best, first = None, None
+        chunks = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            chunks, first_at = 0, None
+            for _ in loaders.iter_chunks(path):
+                if first_at is None:
+                    first_at = time.perf_counter() - start
+                chunks += 1
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best, first = elapsed, first_at
+        results.append({
+            "parse_workers": workers,
+            "chunks": chunks,
+            "wall_s": round(best, 3),
+            "pages_per_s": round(pages / best, 1),
+            "first_chunk_ms": round(first * 1000, 1),
+        })
+    loaders.shutdown_parse_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        PARSE_PAGES_PER_TASK=str(args.pages_per_task),
+    )
+    path = os.path.join(workdir, "bench.pdf")
+    make_pdf(path, args.pages)
+
+    results = run(path, args.pages, [0, *range(1, args.max_workers + 1)], args.repeat)
+    print(json.dumps({"benchmark": "parse_throughput", "pages": args.pages, "cpu_count": os.cpu_count(), "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
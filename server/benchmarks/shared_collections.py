@@ -0,0 +1,110 @@
+"""Many small collections: one qdrant collection each vs one shared collection.
+
+Indexes --collections small documents, one per collection, in each
+QDRANT_STORAGE_MODE, then reports indexing time, the number of qdrant
+collections, disk use, memory, how long reopening the storage takes (a
+restart) and search latency on random collections. Each mode runs in a
+fresh process against embedded on-disk Qdrant, or against --qdrant-url.
+
+Embedded Qdrant has no HNSW or payload indexes and scans every point it
+filters, so shared search latency there grows with the total point count;
+a server answers it from the tenant's own graph.
+
+    cd server && python -m benchmarks.shared_collections --collections 500
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+import uuid
+
+MODES = ("per_collection", "shared")
+
+
+def _disk_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / 2**20
+
+
+def run(mode, collections, chunks, searches, qdrant_url):
+    workdir = tempfile.mkdtemp(prefix=f"contextbase-bench-{mode}-")
+    storage = qdrant_url or f"{workdir}/qdrant"
+    os.environ.update(
+        QDRANT_URL=storage,
+        QDRANT_STORAGE_MODE=mode,
+        QDRANT_SHARED_COLLECTION=f"bench_{uuid.uuid4().hex[:8]}",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+        PARSE_WORKERS="0",
+    )
+    from contextbase.services import qdrant
+    from contextbase.services.vector_store import index_document, search_documents
+
+    names = [f"bench-{uuid.uuid4().hex[:8]}" for _ in range(collections)]
+    start = time.perf_counter()
+    for i, name in enumerate(names):
+        path = os.path.join(workdir, f"{i}.txt")
+        with open(path, "w") as f:
+            f.write("\n\n".join(f"Note {i}.{j}: check valve {j} and the pressure sensor on pump {i}. " * 8 for j in range(chunks)))
+        index_document(path, name, f"doc-{i}")
+    index_s = time.perf_counter() - start
+
+    client = qdrant.get_qdrant_client()
+    physical = len(client.get_collections().collections)
+    asyncio.run(qdrant.close_qdrant())
+
+    # a restart: embedded qdrant loads every collection it finds on open
+    start = time.perf_counter()
+    client = qdrant.get_qdrant_client()
+    client.get_collections()
+    reopen_s = time.perf_counter() - start
+
+    latencies = []
+    for name in random.Random(0).choices(names, k=searches):
+        t = time.perf_counter()
+        hits = search_documents("pressure sensor", name, top_k=4)
+        latencies.append(time.perf_counter() - t)
+        assert hits and all(h.metadata["_collection_name"] == name for h in hits)
+    asyncio.run(qdrant.close_qdrant())
+
+    return {
+        "mode": mode,
+        "qdrant_collections": physical,
+        "index_s": round(index_s, 2),
+        "reopen_ms": round(reopen_s * 1000, 1),
+        "search_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "disk_mb": None if qdrant_url else round(_disk_mb(storage), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collections", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=4, help="chunks per collection")
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--qdrant-url", help="a qdrant server to use instead of embedded storage")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    runs = []
+    for mode in args.modes:
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            runs.append(pool.submit(run, mode, args.collections, args.chunks, args.searches, args.qdrant_url).result())
+    print(json.dumps({"benchmark": "shared_collections", "collections": args.collections, "chunks": args.chunks, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
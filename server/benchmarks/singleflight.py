@@ -0,0 +1,101 @@
+"""Identical questions arriving at once, with and without single-flight.
+
+Starts W worker processes that each fire C concurrent achat_with_rag
+calls for the same question (with varying case and spacing) against one
+collection, all at the same moment, and counts how many retrievals and
+LLM calls actually ran. Modes: off, memory (coalesces within a process)
+and sqlite (also across the processes).
+
+    cd server && python -m benchmarks.singleflight --workers 4 --callers 25 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+QUESTION = "What does ERR-4007 mean?"
+
+
+def worker(mode, callers, workdir, start_at, llm_latency):
+    os.environ.update(
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical-{os.getpid()}",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+        FAKE_LLM_LATENCY=str(llm_latency),
+        PARSE_WORKERS="0",
+        SINGLEFLIGHT_ENABLED=str(mode != "off"),
+        SINGLEFLIGHT_BACKEND=mode,
+        SINGLEFLIGHT_PATH=f"{workdir}/singleflight-{mode}.sqlite3",
+    )
+    from contextbase.services import chat
+    from contextbase.services.vector_store import index_document
+    from benchmarks.hybrid_retrieval import write_manual
+
+    path = os.path.join(workdir, f"manual-{os.getpid()}.txt")
+    write_manual(path, 50)
+    index_document(path, "bench", "manual")
+
+    calls = {"search": 0, "llm": 0}
+    asearch, ainvoke = chat.asearch_collections, chat.ainvoke_llm
+
+    async def counted_search(*args, **kwargs):
+        calls["search"] += 1
+        return await asearch(*args, **kwargs)
+
+    async def counted_invoke(*args, **kwargs):
+        calls["llm"] += 1
+        return await ainvoke(*args, **kwargs)
+
+    chat.asearch_collections, chat.ainvoke_llm = counted_search, counted_invoke
+
+    async def one(i):
+        question = QUESTION.upper() if i % 2 else "  " + QUESTION.replace(" ", "  ")
+        t = time.perf_counter()
+        await chat.achat_with_rag(question, ["bench"])
+        return time.perf_counter() - t
+
+    async def burst():
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        return await asyncio.gather(*(one(i) for i in range(callers)))
+
+    return calls, asyncio.run(burst())
+
+
+def run(mode, workers, callers, llm_latency):
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    os.makedirs(f"{workdir}/uploads")
+    start_at = time.time() + 3 + workers  # after every process has indexed
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.starmap(worker, [(mode, callers, workdir, start_at, llm_latency)] * workers)
+    latencies = [t for _, ts in results for t in ts]
+    return {
+        "mode": mode,
+        "requests": workers * callers,
+        "retrievals": sum(c["search"] for c, _ in results),
+        "llm_calls": sum(c["llm"] for c, _ in results),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--callers", type=int, default=25, help="concurrent calls per worker")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--modes", nargs="+", default=["off", "memory", "sqlite"])
+    args = parser.parse_args()
+
+    runs = [run(mode, args.workers, args.callers, args.llm_latency) for mode in args.modes]
+    print(json.dumps({"benchmark": "singleflight", "workers": args.workers, "callers": args.callers, "llm_latency": args.llm_latency, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Cold import time and time-to-ready of the server.
+
+cold import: a fresh interpreter importing contextbase.main, median of
+--runs, plus which heavy client libraries that import pulled in. With
+--budget-ms the script exits non-zero when the median is over budget,
+so CI can hold the line.
+
+time to ready: starts the server as deployed and polls /health until it
+answers, then adds up the proportional set size (PSS) of every process
+in the tree. PSS splits shared pages between the processes sharing
+them, so it shows what a preloading master saves its forked workers.
+  uvicorn    one process
+  gunicorn   --workers uvicorn workers from gunicorn.conf.py
+
+Everything runs offline against SQLite and in-memory Qdrant.
+
+    cd server && python -m benchmarks.startup --runs 5 --workers 4
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HEAVY = ("langchain_openai", "langchain_qdrant", "qdrant_client", "openai", "langchain_community")
+
+_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import contextbase.main
+print(json.dumps({"s": time.perf_counter() - start, "modules": len(sys.modules), "heavy": sorted(m for m in %r if m in sys.modules)}))
+"""
+
+
+def _env(workdir, workers=1):
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",  # embedded on-disk storage is locked to one process
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        LLM_PROVIDER="fake",
+        WEB_CONCURRENCY=str(workers),
+    )
+    return env
+
+
+def cold_import(runs):
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    results = []
+    for _ in range(runs + 1):  # the first run also writes bytecode caches
+        out = subprocess.run([sys.executable, "-c", _IMPORT % (HEAVY,)], env=_env(workdir), capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    results = results[1:]
+    return {
+        "import_ms_p50": round(statistics.median(r["s"] for r in results) * 1000, 1),
+        "import_ms_max": round(max(r["s"] for r in results) * 1000, 1),
+        "modules": results[0]["modules"],
+        "heavy_modules": results[0]["heavy"],
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _tree(pid):
+    pids, frontier = [pid], [pid]
+    while frontier:
+        parent = frontier.pop()
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                children = [int(c) for c in f.read().split()]
+        except OSError:
+            children = []
+        pids += children
+        frontier += children
+    return pids
+
+
+def _pss_mb(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                total += sum(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+        except OSError:
+            pass
+    return total / 1024
+
+
+def time_to_ready(server, workers, timeout=120):
+    workdir = tempfile.mkdtemp(prefix="contextbase-bench-")
+    port = _free_port()
+    if server == "uvicorn":
+        cmd = [sys.executable, "-m", "uvicorn", "contextbase.main:app", "--port", str(port)]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}", "contextbase.main:app"]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=_env(workdir, 1 if server == "uvicorn" else workers), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{server} exited with {proc.returncode}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"{server} not ready after {timeout}s")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                    if r.status == 200:
+                        break
+            except OSError:
+                time.sleep(0.02)
+        ready = time.perf_counter() - start
+        pids = _tree(proc.pid)
+        # every worker, not just the first, has to be up before memory means anything
+        deadline = time.perf_counter() + timeout
+        while server == "gunicorn" and len(pids) < workers + 1 and time.perf_counter() < deadline:
+            time.sleep(0.1)
+            pids = _tree(proc.pid)
+        time.sleep(1)
+        return {"server": server, "workers": 1 if server == "uvicorn" else workers, "ready_ms": round(ready * 1000, 1), "pss_mb": round(_pss_mb(_tree(proc.pid)), 1)}
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--servers", nargs="+", choices=["uvicorn", "gunicorn"], default=["uvicorn", "gunicorn"])
+    parser.add_argument("--budget-ms", type=float, help="fail when the median cold import takes longer")
+    args = parser.parse_args()
+
+    report = {"benchmark": "startup", "cold_import": cold_import(args.runs), "servers": [time_to_ready(s, args.workers) for s in args.servers]}
+    print(json.dumps(report, indent=2))
+    if args.budget_ms and report["cold_import"]["import_ms_p50"] > args.budget_ms:
+        sys.exit(f"cold import {report['cold_import']['import_ms_p50']} ms is over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""End-to-end load suite, offline.
+
+Runs each workload in a fresh process against create_app() with SQLite
+(or --database-url, e.g. a local MySQL), in-memory Qdrant and the fake
+embedding and chat models, whose latency and token rate are set below.
+Reports throughput, p50/p95/p99 and memory per workload as one JSON
+document; save it with --output and pass it back as --baseline on
+another commit to get the relative change of every metric.
+
+Workloads:
+  login   concurrent logins against registered users (bcrypt-bound)
+  chat    concurrent chats, each sending --rounds RAG messages in turn
+  upload  concurrent multi-file uploads, then time until all are indexed
+  index   index_document over multi-page PDFs, no HTTP
+
+    cd server && python -m benchmarks.suite --output before.json
+    cd server && python -m benchmarks.suite --baseline before.json --output after.json
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+WORKLOADS = ("login", "chat", "upload", "index")
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(latencies, wall):
+    """throughput and latency percentiles for one batch of operations"""
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(len(latencies) / wall, 1) if wall else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+async def timed(coros):
+    """run coroutines concurrently, returns (latencies, wall seconds, results)"""
+    latencies = []
+
+    async def one(coro):
+        start = time.perf_counter()
+        result = await coro
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(c) for c in coros))
+    return latencies, time.perf_counter() - start, results
+
+
+async def _session(c):
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    await c.post("/api/v1/auth/register", json={"name": "bench", "email": email, "password": "pw"})
+    token = (await c.post("/api/v1/auth/login", json={"email": email, "password": "pw"})).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _wait_ready(c, headers, collection_id, expected, poll=0.05):
+    while True:
+        docs = (await c.get(f"/api/v1/documents/collections/{collection_id}/documents", headers=headers)).json()
+        if len(docs) >= expected and all(d["status"] in ("ready", "failed") for d in docs):
+            return docs
+        await asyncio.sleep(poll)
+
+
+async def login_workload(c, opts):
+    emails = [f"login-{uuid.uuid4().hex[:8]}@example.com" for _ in range(opts.users)]
+    for email in emails:
+        await c.post("/api/v1/auth/register", json={"name": "bench", "email": email, "password": "pw"})
+    statuses = {}
+
+    async def login(i):
+        r = await c.post("/api/v1/auth/login", json={"email": emails[i % len(emails)], "password": "pw"})
+        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    latencies, wall, _ = await timed(login(i) for i in range(opts.logins))
+    return {"logins": summarize(latencies, wall), "statuses": {str(k): v for k, v in sorted(statuses.items())}}
+
+
+async def chat_workload(c, opts):
+    headers = await _session(c)
+    collection_id = (await c.post("/api/v1/documents/collections", json={"name": "bench"}, headers=headers)).json()["id"]
+    manual = "\n\n".join(f"Code ERR-{4000 + i}: reset the pump, check valve {i} and the pressure sensor." for i in range(200))
+    await c.post(f"/api/v1/documents/collections/{collection_id}/documents", files=[("files", ("manual.txt", manual.encode(), "text/plain"))], headers=headers)
+    await _wait_ready(c, headers, collection_id, 1)
+
+    chat_ids = []
+    for _ in range(opts.chats):
+        chat = (await c.post("/api/v1/chats/", data={"data": json.dumps({"collection_ids": [collection_id]})}, headers=headers)).json()["chat"]
+        chat_ids.append(chat["id"])
+
+    async def converse(n, chat_id):
+        latencies = []
+        for r in range(opts.rounds):
+            start = time.perf_counter()
+            resp = await c.post(f"/api/v1/chats/{chat_id}/messages", json={"content": f"What does ERR-{4000 + (n + r) % 200} mean?"}, headers=headers)
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    _, wall, per_chat = await timed(converse(n, cid) for n, cid in enumerate(chat_ids))
+    return {
+        "messages": summarize([t for chat in per_chat for t in chat], wall),
+        "first_message": summarize([chat[0] for chat in per_chat], wall),
+    }
+
+
+async def upload_workload(c, opts):
+    headers = await _session(c)
+    collection_ids = [
+        (await c.post("/api/v1/documents/collections", json={"name": f"bench-{i}"}, headers=headers)).json()["id"] for i in range(opts.uploads)
+    ]
+
+    async def upload(i, collection_id):
+        files = [
+            ("files", (f"note-{i}-{j}.txt", f"note {i}-{j}: " .encode() + b"the quick brown fox jumps over the lazy dog. " * 50, "text/plain"))
+            for j in range(opts.files_per_upload)
+        ]
+        (await c.post(f"/api/v1/documents/collections/{collection_id}/documents", files=files, headers=headers)).raise_for_status()
+
+    start = time.perf_counter()
+    latencies, wall, _ = await timed(upload(i, cid) for i, cid in enumerate(collection_ids))
+    docs = [d for cid in collection_ids for d in await _wait_ready(c, headers, cid, opts.files_per_upload)]
+    indexed = time.perf_counter() - start
+    return {
+        "requests": summarize(latencies, wall),
+        "documents": len(docs),
+        "failed": sum(d["status"] == "failed" for d in docs),
+        "indexed_s": round(indexed, 2),
+        "documents_per_s": round(len(docs) / indexed, 1),
+    }
+
+
+async def index_workload(c, opts):
+    from contextbase.services.vector_store import index_document
+    from benchmarks.fixtures import make_pdf
+
+    # untimed: the first document also pays for starting the parse pool
+    warmup = os.path.join(os.environ["UPLOAD_DIR"], "warmup.pdf")
+    make_pdf(warmup, 1)
+    await asyncio.to_thread(index_document, warmup, "bench-warmup", "warmup")
+
+    paths = []
+    for i in range(opts.index_docs):
+        path = os.path.join(os.environ["UPLOAD_DIR"], f"doc-{i}.pdf")
+        make_pdf(path, opts.pages)
+        paths.append(path)
+    latencies = []
+    start = time.perf_counter()
+    for i, path in enumerate(paths):
+        t = time.perf_counter()
+        await asyncio.to_thread(index_document, path, "bench-index", f"doc-{i}")
+        latencies.append(time.perf_counter() - t)
+    wall = time.perf_counter() - start
+    return {"documents": summarize(latencies, wall), "pages_per_s": round(len(paths) * opts.pages / wall, 1)}
+
+
+async def _run(name, opts):
+    import httpx
+    from contextbase.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            rss = _rss_mb()
+            result = await globals()[f"{name}_workload"](c, opts)
+            after = _rss_mb()
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    if rss is not None and after is not None:
+        result["rss_growth_mb"] = round(after - rss, 1)
+    return result
+
+
+def run_workload(name, opts):
+    """one workload in this (fresh) process, with its own scratch directory and database"""
+    workdir = tempfile.mkdtemp(prefix=f"contextbase-bench-{name}-")
+    os.makedirs(f"{workdir}/uploads")
+    os.environ.update(
+        DATABASE_URL=opts.database_url or f"sqlite:///{workdir}/bench.db",
+        QDRANT_URL=":memory:",
+        UPLOAD_DIR=f"{workdir}/uploads",
+        LEXICAL_INDEX_DIR=f"{workdir}/lexical",
+        EMBEDDING_PROVIDER="fake",
+        EMBEDDING_CACHE_PATH="",
+        FAKE_EMBEDDING_LATENCY=str(opts.embedding_latency),
+        LLM_PROVIDER="fake",
+        FAKE_LLM_LATENCY=str(opts.llm_latency),
+        FAKE_LLM_TOKENS_PER_SEC=str(opts.llm_tokens_per_sec),
+    )
+    # stdout is reserved for the report
+    with redirect_stdout(sys.stderr):
+        return asyncio.run(_run(name, opts))
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metrics(result, prefix=""):
+    for key, value in result.items():
+        if isinstance(value, dict):
+            yield from _metrics(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(report, baseline):
+    """relative change of every numeric metric present in both reports, in percent"""
+    changes = {}
+    for name, result in report["workloads"].items():
+        before = dict(_metrics(baseline.get("workloads", {}).get(name, {})))
+        changes[name] = {k: round((v - before[k]) / before[k] * 100, 1) for k, v in _metrics(result) if before.get(k)}
+    return {"commit": baseline.get("commit"), "change_pct": changes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL; default is a fresh SQLite file per workload")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake chat model seconds before the first token")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=0, help="fake chat model streaming rate, 0 = instant")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="fake embedding seconds per call")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--uploads", type=int, default=10)
+    parser.add_argument("--files-per-upload", type=int, default=20)
+    parser.add_argument("--index-docs", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "suite",
+        "commit": _commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "options": vars(args),
+        "workloads": {},
+    }
+    for name in args.workloads:
+        # not a Pool: its workers are daemonic and the app starts its own hashing processes
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            report["workloads"][name] = pool.submit(run_workload, name, args).result()
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["baseline"] = compare(report, json.load(f))
+
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Vector memory per 100k chunks and recall@k for each storage layout.
+
+Compares the current layout (3072-dim float32 vectors in RAM) with
+shortened embeddings, scalar (int8) and binary quantization with and
+without rescoring, and originals kept on disk. The recall numbers come
+from an exact numpy replay of what each layout scores; HNSW
+approximation is left out because it affects every layout equally.
+Ground truth is the exact top k over full-size float32 vectors.
+
+Memory is estimated the same way Qdrant's capacity planning guide does:
+vectors held in RAM plus the HNSW graph (m * 2 links of 4 bytes per
+point per layer 0). It leaves out payloads and the overhead of the
+process.
+
+Vectors are synthetic by default. They are grouped into topics, then
+documents, then chunks. Their variance falls off across dimensions the
+way matryoshka embeddings do, and queries are noisy copies of corpus
+vectors. Pass --texts FILE (one chunk per line) with
+EMBEDDING_PROVIDER=openai to use real embeddings.
+
+    cd server && python -m benchmarks.vector_memory --points 20000 --queries 200
+"""
+import argparse
+import json
+
+import numpy as np
+
+
+def synthetic(points, queries, dim, seed=0):
+    """topics, documents within a topic and chunks within a document, so neighbours are graded rather than ties"""
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(1 + np.arange(dim) / 64)  # early dimensions carry most of the signal
+
+    def noise(n, size):
+        return size * rng.standard_normal((n, dim)).astype(np.float32) * scale
+
+    topics = noise(max(1, points // 500), 1.0)
+    docs = topics[rng.integers(0, len(topics), max(1, points // 20))] + noise(max(1, points // 20), 0.6)
+    corpus = docs[rng.integers(0, len(docs), points)] + noise(points, 0.4)
+    query = corpus[rng.integers(0, points, queries)] + noise(queries, 0.3)
+    return corpus, query
+
+
+def embedded(path, queries, dim, seed=0):
+    from contextbase.services.llm import get_embedding_model
+
+    with open(path) as f:
+        texts = [line.strip() for line in f if line.strip()]
+    rng = np.random.default_rng(seed)
+    asked = [texts[i] for i in rng.integers(0, len(texts), queries)]
+    model = get_embedding_model()
+    corpus = np.asarray(model.embed_documents(texts), dtype=np.float32)[:, :dim]
+    # a chunk's first sentence stands in for a question about it
+    query = np.asarray(model.embed_documents([t.split(".")[0] for t in asked]), dtype=np.float32)[:, :dim]
+    return corpus, query
+
+
+def unit(x):
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(scores, k):
+    idx = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, idx, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def scalar_quantize(x, quantile=0.99):
+    bound = np.quantile(np.abs(x), quantile)
+    return np.round(np.clip(x, -bound, bound) / bound * 127)
+
+
+def search(corpus, query, dims, quantization, rescore, oversampling, k):
+    c, q = unit(corpus[:, :dims]), unit(query[:, :dims])
+    if quantization == "scalar":
+        approx = scalar_quantize(q) @ scalar_quantize(c).T
+    elif quantization == "binary":
+        approx = np.sign(q) @ np.sign(c).T
+    else:
+        return top_k(q @ c.T, k)
+    if not rescore:
+        return top_k(approx, k)
+    candidates = top_k(approx, int(k * oversampling))
+    exact = np.einsum("qd,qkd->qk", q, c[candidates])
+    return np.take_along_axis(candidates, top_k(exact, k), axis=1)
+
+
+def memory_per_100k(dims, quantization, on_disk, m=16):
+    n = 100_000
+    full = n * dims * 4
+    quantized = {"scalar": n * dims, "binary": n * dims / 8}.get(quantization, 0)
+    graph = n * m * 2 * 4
+    ram = (0 if on_disk else full) + quantized + graph
+    return {"ram_mb": round(ram / 2**20, 1), "disk_mb": round((full + quantized + graph) / 2**20, 1)}
+
+
+LAYOUTS = [
+    # name, dims, quantization, rescore, on-disk originals
+    ("current: 3072 float32", 3072, "none", False, False),
+    ("1024 float32", 1024, "none", False, False),
+    ("256 float32", 256, "none", False, False),
+    ("3072 scalar", 3072, "scalar", False, False),
+    ("3072 scalar + rescore, on disk", 3072, "scalar", True, True),
+    ("1024 scalar + rescore, on disk", 1024, "scalar", True, True),
+    ("3072 binary", 3072, "binary", False, False),
+    ("3072 binary + rescore, on disk", 3072, "binary", True, True),
+]
+
+
+def run(corpus, query, k, oversampling):
+    truth = top_k(unit(query) @ unit(corpus).T, k)
+    results = []
+    for name, dims, quantization, rescore, on_disk in LAYOUTS:
+        if dims > corpus.shape[1]:
+            continue
+        found = search(corpus, query, dims, quantization, rescore, oversampling, k)
+        recall = np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)])
+        results.append({"layout": name, f"recall_at_{k}": round(float(recall), 3), **memory_per_100k(dims, quantization, on_disk)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dims", type=int, default=3072)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, default=2.0)
+    parser.add_argument("--texts", help="embed these lines with the configured model instead of synthetic vectors")
+    args = parser.parse_args()
+
+    if args.texts:
+        corpus, query = embedded(args.texts, args.queries, args.dims)
+    else:
+        corpus, query = synthetic(args.points, args.queries, args.dims)
+    print(json.dumps({
+        "benchmark": "vector_memory",
+        "points": len(corpus),
+        "dims": corpus.shape[1],
+        "oversampling": args.oversampling,
+        "runs": run(corpus, query, args.k, args.oversampling),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
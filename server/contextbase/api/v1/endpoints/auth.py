@@ -1,40 +1,65 @@
-from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from contextbase.core import get_db, hash_password, verify_password, create_access_token, get_current_user, settings
+from contextbase.core import get_db, get_hasher, needs_rehash, create_user_token, get_current_user, invalidate_user
 from contextbase.models import User
-from contextbase.schemas import UserCreate, UserLogin, UserResponse, Token
+from contextbase.schemas import UserCreate, UserLogin, UserResponse, Token, PasswordChange
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=201)
-def register(data: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == data.email).first():
+async def register(data: UserCreate, db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(User).where(User.email == data.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
+    await db.commit()  # don't hold a pooled connection while bcrypt runs
     
-    user = User(name=data.name, email=data.email, password=hash_password(data.password))
+    password = await get_hasher().hash(data.password)
+    user = User(name=data.name, email=data.email, password=password)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.post("/login", response_model=Token)
-def login(data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
+async def login(data: UserLogin, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.email == data.email))
+    await db.commit()  # don't hold a pooled connection while bcrypt runs
     
-    if not user or not verify_password(data.password, user.password):
+    if not user or not await get_hasher().verify(data.password, user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials", headers={"WWW-Authenticate": "Bearer"})
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Account disabled")
     
-    token = create_access_token({"sub": user.email}, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
-    return {"access_token": token, "token_type": "bearer"}
+    if needs_rehash(user.password):
+        # BCRYPT_ROUNDS changed since this hash was made; the plaintext is only available now
+        try:
+            user.password = await get_hasher().hash(data.password)
+            await db.commit()
+        except HTTPException:
+            pass  # hasher is saturated, upgrade on a later login
+    
+    return {"access_token": create_user_token(user), "token_type": "bearer"}
+
+
+@router.post("/change-password", response_model=Token)
+async def change_password(data: PasswordChange, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """set a new password; tokens issued before this stop working, a fresh one is returned"""
+    user = await db.get(User, user.id)  # the cached user is detached
+    await db.commit()
+    if not await get_hasher().verify(data.current_password, user.password):
+        raise HTTPException(status_code=400, detail="Current password is incorrect")
+    
+    user.password = await get_hasher().hash(data.new_password)
+    user.auth_version = (user.auth_version or 0) + 1
+    await db.commit()
+    invalidate_user(user.id)
+    return {"access_token": create_user_token(user), "token_type": "bearer"}
 
 
 @router.get("/me", response_model=UserResponse)
-def me(user: User = Depends(get_current_user)):
+async def me(user: User = Depends(get_current_user)):
     return user
@@ -1,19 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, Form
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, Form, Request, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from contextlib import aclosing
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import asyncio
 import json
+import uuid
 
-from contextbase.core import get_db, get_current_user
-from contextbase.models import User, Chat, Message, Collection, Document
-from contextbase.schemas import ChatCreate, ChatUpdate, ChatResponse, MessageCreate, MessageResponse, ChatWithMessages, AIResponse
-from contextbase.services import save_upload, format_size, index_document, delete_vector_collection, chat_with_rag, chat_simple, generate_chat_title
+from contextbase.core import get_db, settings, get_current_user, get_token_user, TokenUser, AsyncSessionLocal
+from contextbase.models import User, Chat, Message, ChatCollection, Collection
+from contextbase.schemas import ChatCreate, ChatUpdate, ChatResponse, MessageCreate, MessageResponse, ChatWithMessages, ChatCollectionAttach, ChatCollections, ChatPage, MessagePage, AIResponse
+from contextbase.api.v1.pagination import keyset_page
+from contextbase.services import ingest_uploads, schedule_collection_deletion, wake_reaper, achat_with_rag, achat_simple, stream_chat, schedule_title, GENERIC_CHAT_NAMES, ainvalidate_answers, load_history, update_summary
 
 router = APIRouter(prefix="/chats", tags=["Chats"])
 
 
+async def _get_user_chat(db, chat_id, user):
+    chat = await db.scalar(select(Chat).where(Chat.id == chat_id, Chat.user_id == user.id))
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return chat
+
+
+async def _chat_collection_ids(db, chat):
+    """every collection the chat searches, its own first"""
+    attached = await db.scalars(select(ChatCollection.collection_id).where(ChatCollection.chat_id == chat.id).order_by(ChatCollection.created_at))
+    return list(dict.fromkeys(([chat.collection_id] if chat.collection_id else []) + list(attached)))
+
+
+async def _check_collections(db, collection_ids, user):
+    found = set(await db.scalars(select(Collection.id).where(Collection.id.in_(collection_ids), Collection.user_id == user.id)))
+    if found != set(collection_ids):
+        raise HTTPException(status_code=404, detail="Collection not found")
+
+
 @router.post("/")
-async def create_chat(data: str = Form(None), files: List[UploadFile] = None, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_chat(data: str = Form(None), files: List[UploadFile] = None, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     chat_data = None
     if data:
         try:
@@ -22,167 +47,252 @@ async def create_chat(data: str = Form(None), files: List[UploadFile] = None, us
         except json.JSONDecodeError:
             pass
 
+    attach = list(dict.fromkeys(chat_data.collection_ids)) if chat_data else []
+    if attach:
+        if len(attach) > settings.CHAT_MAX_COLLECTIONS:
+            raise HTTPException(status_code=400, detail=f"A chat can search at most {settings.CHAT_MAX_COLLECTIONS} collections")
+        await _check_collections(db, attach, user)
+
     collection_id = None
     docs = []
-    
+
     if files and len(files) > 0:
-        collection = Collection(user_id=user.id, name=chat_data.name if chat_data and chat_data.name else "Documents")
-        db.add(collection)
-        db.commit()
-        db.refresh(collection)
+        collection = Collection(id=str(uuid.uuid4()), user_id=user.id, name=chat_data.name if chat_data and chat_data.name else "Documents")
         collection_id = collection.id
-        
-        for f in files:
-            path, name, size = save_upload(f)
-            doc = Document(collection_id=collection_id, file_path=path, filename=name, file_size=format_size(size))
-            db.add(doc)
-            db.commit()
-            db.refresh(doc)
-            docs.append(doc)
-            await asyncio.to_thread(index_document, path, collection_id)
-    
+        docs = await ingest_uploads(db, collection_id, files, pending=[collection])
+
     chat = Chat(name=chat_data.name if chat_data and chat_data.name else "New Chat", user_id=user.id, collection_id=collection_id)
     db.add(chat)
-    db.commit()
-    db.refresh(chat)
-    
+    await db.flush()
+    db.add_all(ChatCollection(chat_id=chat.id, collection_id=c) for c in attach if c != collection_id)
+    await db.commit()
+    await db.refresh(chat)
+
     return {"message": "Chat created", "chat": chat, "documents": docs}
 
 
-@router.get("/", response_model=List[ChatResponse])
-def list_chats(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(Chat).filter(Chat.user_id == user.id).order_by(Chat.created_at.desc()).all()
+@router.get("/", response_model=ChatPage)
+async def list_chats(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200), user: TokenUser = Depends(get_token_user), db: AsyncSession = Depends(get_db)):
+    """newest first"""
+    items, next_cursor = await keyset_page(db, select(Chat).where(Chat.user_id == user.id), Chat, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def _message_page(db, chat_id, cursor, limit):
+    """the `limit` messages before `cursor` (latest if none), oldest first"""
+    items, next_cursor = await keyset_page(db, select(Message).where(Message.chat_id == chat_id), Message, cursor, limit)
+    return {"items": items[::-1], "next_cursor": next_cursor}
 
 
 @router.get("/{chat_id}", response_model=ChatWithMessages)
-def get_chat(chat_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user.id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    messages = db.query(Message).filter(Message.chat_id == chat_id).order_by(Message.created_at).all()
-    return {"chat": chat, "messages": messages}
+async def get_chat(chat_id: str, limit: int = Query(50, ge=1, le=200), user: TokenUser = Depends(get_token_user), db: AsyncSession = Depends(get_db)):
+    chat = await _get_user_chat(db, chat_id, user)
+    page = await _message_page(db, chat_id, None, limit)
+    return {"chat": chat, "collection_ids": await _chat_collection_ids(db, chat), "messages": page["items"], "next_cursor": page["next_cursor"]}
+
+
+@router.post("/{chat_id}/collections", response_model=ChatCollections)
+async def attach_collection(chat_id: str, data: ChatCollectionAttach, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """search an existing collection from this chat, without copying its documents"""
+    chat = await _get_user_chat(db, chat_id, user)
+    await _check_collections(db, [data.collection_id], user)
+    collection_ids = await _chat_collection_ids(db, chat)
+    if data.collection_id not in collection_ids:
+        if len(collection_ids) >= settings.CHAT_MAX_COLLECTIONS:
+            raise HTTPException(status_code=400, detail=f"A chat can search at most {settings.CHAT_MAX_COLLECTIONS} collections")
+        db.add(ChatCollection(chat_id=chat_id, collection_id=data.collection_id))
+        await db.commit()
+        collection_ids.append(data.collection_id)
+    return {"collection_ids": collection_ids}
+
+
+@router.delete("/{chat_id}/collections/{collection_id}", response_model=ChatCollections)
+async def detach_collection(chat_id: str, collection_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    chat = await _get_user_chat(db, chat_id, user)
+    if collection_id == chat.collection_id:
+        raise HTTPException(status_code=400, detail="The chat's own collection can't be detached")
+    await db.execute(delete(ChatCollection).where(ChatCollection.chat_id == chat_id, ChatCollection.collection_id == collection_id))
+    await db.commit()
+    return {"collection_ids": await _chat_collection_ids(db, chat)}
 
 
 @router.put("/{chat_id}", response_model=ChatResponse)
-def update_chat(chat_id: str, data: ChatUpdate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user.id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
+async def update_chat(chat_id: str, data: ChatUpdate, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    chat = await _get_user_chat(db, chat_id, user)
+
     if data.name is not None:
         chat.name = data.name
     if data.description is not None:
         chat.description = data.description
-    db.commit()
-    db.refresh(chat)
+    await db.commit()
+    await db.refresh(chat)
     return chat
 
 
 @router.delete("/{chat_id}")
-def delete_chat(chat_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user.id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
+async def delete_chat(chat_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    chat = await _get_user_chat(db, chat_id, user)
+
     # Save collection_id before deleting chat
     collection_id = chat.collection_id
-    
+
     # Delete messages logic
-    db.query(Message).filter(Message.chat_id == chat_id).delete()
-    
+    await db.execute(delete(Message).where(Message.chat_id == chat_id))
+    await db.execute(delete(ChatCollection).where(ChatCollection.chat_id == chat_id))
+
     # Delete the chat first to remove the foreign key reference
-    db.delete(chat)
-    db.commit()
-    
+    await db.delete(chat)
+    await db.commit()
+
     # Now check if we should delete the collection
     if collection_id:
-        # Check if any other chats use this collection
-        other_chats_count = db.query(Chat).filter(Chat.collection_id == collection_id).count()
-        
+        # Check if any other chats use this collection, as their own or attached
+        other_chats_count = await db.scalar(select(func.count()).select_from(Chat).where(Chat.collection_id == collection_id))
+        other_chats_count += await db.scalar(select(func.count()).select_from(ChatCollection).where(ChatCollection.collection_id == collection_id))
+
         if other_chats_count == 0:
-            # Safe to delete collection + documents + vector store
-            delete_vector_collection(collection_id)
-            db.query(Document).filter(Document.collection_id == collection_id).delete()
-            db.query(Collection).filter(Collection.id == collection_id).delete()
-            db.commit()
-            
+            # Safe to delete collection + documents; files and vectors go in the background
+            await schedule_collection_deletion(db, [collection_id])
+            await db.execute(delete(Collection).where(Collection.id == collection_id))
+            await db.commit()
+            await ainvalidate_answers(collection_id)
+            wake_reaper()
+
     return {"message": "deleted"}
 
 
 @router.post("/{chat_id}/messages", response_model=AIResponse)
-async def send_message(chat_id: str, data: MessageCreate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user.id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    # Check if this is the first message (for auto-rename)
-    existing_messages = db.query(Message).filter(Message.chat_id == chat_id).count()
-    is_first_message = existing_messages == 0
-    
+async def send_message(chat_id: str, data: MessageCreate, background: BackgroundTasks, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    chat = await _get_user_chat(db, chat_id, user)
+    collection_ids = await _chat_collection_ids(db, chat)
+
     user_msg = Message(chat_id=chat_id, content=data.content, role="user")
     db.add(user_msg)
-    db.commit()
-    db.refresh(user_msg)
-    
-    history = [{"role": m.role, "content": m.content} for m in db.query(Message).filter(Message.chat_id == chat_id).order_by(Message.created_at).all()]
-    
-    if chat.collection_id:
-        resp = await asyncio.to_thread(chat_with_rag, data.content, chat.collection_id, history)
+    await db.commit()
+    await db.refresh(user_msg)
+
+    # no earlier turns means this is the first message (for auto-rename)
+    history, is_first_message = await load_history(db, chat, before=user_msg)
+
+    if collection_ids:
+        resp = await achat_with_rag(data.content, collection_ids, history)
     else:
-        resp = await asyncio.to_thread(chat_simple, data.content, history)
-    
+        resp = await achat_simple(data.content, history)
+
     ai_msg = Message(chat_id=chat_id, content=resp["content"], role="assistant", sources=resp.get("sources"))
     db.add(ai_msg)
-    db.commit()
-    db.refresh(ai_msg)
-    
-    # Auto-rename chat after first Q&A if it has a generic name
-    chat_name = None
-    if is_first_message and chat.name in ["New Chat", "Documents", ""]:
+    await db.commit()
+    await db.refresh(ai_msg)
+
+    # Auto-rename chat after first Q&A if it has a generic name; the client polls for it
+    title_pending = is_first_message and chat.name in GENERIC_CHAT_NAMES
+    if title_pending:
+        schedule_title(chat_id, data.content, resp["content"])
+    if settings.HISTORY_SUMMARY_ENABLED:
+        background.add_task(update_summary, chat_id)
+    return {"user_message": user_msg, "ai_message": ai_msg, "title_pending": title_pending}
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+_saving = set()  # replies being written after their stream was cancelled
+
+
+async def _save_reply(chat_id, content, sources):
+    async with AsyncSessionLocal() as db:
+        msg = Message(chat_id=chat_id, content=content, role="assistant", sources=sources)
+        db.add(msg)
+        await db.commit()
+        await db.refresh(msg)
+        return msg
+
+
+def _persist(coro):
+    """await `coro` in its own task, which finishes even when the awaiting request is cancelled"""
+    task = asyncio.ensure_future(coro)
+    _saving.add(task)
+    task.add_done_callback(_saving.discard)
+    return asyncio.shield(task)
+
+
+@router.post("/{chat_id}/messages/stream")
+async def stream_message(chat_id: str, data: MessageCreate, request: Request, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """same as send_message, but streams sources and tokens as server-sent events"""
+    chat = await _get_user_chat(db, chat_id, user)
+    collection_ids = await _chat_collection_ids(db, chat)
+
+    user_msg = Message(chat_id=chat_id, content=data.content, role="user")
+    db.add(user_msg)
+    await db.commit()
+    await db.refresh(user_msg)
+
+    history, is_first_message = await load_history(db, chat, before=user_msg)
+    await db.commit()  # the reply is saved with its own session; don't hold this connection for the stream
+
+    async def events():
+        yield _sse("user_message", MessageResponse.model_validate(user_msg).model_dump(mode="json"))
+
+        parts, sources = [], "[]"
+        ai_msg = None
         try:
-            new_title = await asyncio.to_thread(generate_chat_title, data.content, resp["content"])
-            chat.name = new_title
-            db.commit()
-            db.refresh(chat)
-            chat_name = new_title
-        except Exception:
-            pass  # Keep existing name on error
-    
-    return {"user_message": user_msg, "ai_message": ai_msg, "chat_name": chat_name}
-
-
-@router.get("/{chat_id}/messages", response_model=List[MessageResponse])
-def get_messages(chat_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user.id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    return db.query(Message).filter(Message.chat_id == chat_id).order_by(Message.created_at).all()
+            # closed on a disconnect too, so its single-flight followers get released now rather than at gc
+            async with aclosing(stream_chat(data.content, collection_ids, history)) as chunks:
+                async for kind, value in chunks:
+                    if await request.is_disconnected():
+                        break
+                    if kind == "sources":
+                        sources = value
+                        yield _sse("sources", json.loads(value))
+                    else:
+                        parts.append(value)
+                        yield _sse("token", value)
+        finally:
+            # persist whatever was generated, even if the client went away mid-stream; a disconnect
+            # cancels this generator, and a cancelled commit would lose the reply
+            if parts:
+                ai_msg = await _persist(_save_reply(chat_id, "".join(parts), sources))
+
+        if ai_msg is None:
+            return
+        title = None
+        if is_first_message and chat.name in GENERIC_CHAT_NAMES:
+            title = schedule_title(chat_id, data.content, ai_msg.content)
+        if await request.is_disconnected():
+            return
+        yield _sse("done", {"ai_message": MessageResponse.model_validate(ai_msg).model_dump(mode="json")})
+
+        # the answer is complete; the stream stays open only to push the title when the titler has it
+        if title is not None:
+            try:
+                name = await asyncio.wait_for(asyncio.shield(title), 30)
+            except asyncio.TimeoutError:
+                name = None
+            if name:
+                yield _sse("chat_name", name)
+
+    summarize = BackgroundTask(update_summary, chat_id) if settings.HISTORY_SUMMARY_ENABLED else None
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, background=summarize)
+
+
+@router.get("/{chat_id}/messages", response_model=MessagePage)
+async def get_messages(chat_id: str, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200), user: TokenUser = Depends(get_token_user), db: AsyncSession = Depends(get_db)):
+    await _get_user_chat(db, chat_id, user)
+    return await _message_page(db, chat_id, cursor, limit)
 
 
 @router.post("/{chat_id}/upload")
-async def upload_to_chat(chat_id: str, files: List[UploadFile], user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user.id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    if not chat.collection_id:
-        collection = Collection(user_id=user.id, name=f"Chat docs")
-        db.add(collection)
-        db.commit()
-        db.refresh(collection)
+async def upload_to_chat(chat_id: str, files: List[UploadFile], user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    chat = await _get_user_chat(db, chat_id, user)
+
+    if chat.collection_id:
+        docs = await ingest_uploads(db, chat.collection_id, files)
+    else:
+        collection = Collection(id=str(uuid.uuid4()), user_id=user.id, name=f"Chat docs")
+        docs = await ingest_uploads(db, collection.id, files, pending=[collection])
         chat.collection_id = collection.id
-        db.commit()
-    
-    docs = []
-    for f in files:
-        path, name, size = save_upload(f)
-        doc = Document(collection_id=chat.collection_id, file_path=path, filename=name, file_size=format_size(size))
-        db.add(doc)
-        db.commit()
-        db.refresh(doc)
-        docs.append(doc)
-        await asyncio.to_thread(index_document, path, chat.collection_id)
-    
+        await db.commit()
+    await ainvalidate_answers(chat.collection_id)
+
     return {"message": "Uploaded", "documents": docs}
@@ -1,98 +1,148 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import asyncio
 
-from contextbase.core import get_db, get_current_user
-from contextbase.models import User, Collection, Document, Chat
-from contextbase.schemas import CollectionCreate, CollectionResponse, DocumentResponse, DocumentUploadResponse
-from contextbase.services import save_upload, delete_upload, format_size, index_document, delete_vector_collection
+from contextbase.core import get_db, get_current_user, get_token_user, TokenUser
+from contextbase.models import User, Collection, Document, Chat, ChatCollection
+from contextbase.schemas import CollectionCreate, CollectionResponse, DocumentResponse, DocumentUploadResponse, DocumentStatusResponse
+from contextbase.services import save_upload, release_upload, format_size, enqueue_document, ingest_uploads, delete_document_vectors, delete_untagged_vectors, ainvalidate_answers, schedule_collection_deletion, wake_reaper
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
 
+async def _get_user_collection(db, id, user, detail="Not found"):
+    collection = await db.scalar(select(Collection).where(Collection.id == id, Collection.user_id == user.id))
+    if not collection:
+        raise HTTPException(status_code=404, detail=detail)
+    return collection
+
+
 @router.post("/collections", response_model=CollectionResponse, status_code=201)
-def create_collection(data: CollectionCreate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_collection(data: CollectionCreate, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     collection = Collection(user_id=user.id, name=data.name)
     db.add(collection)
-    db.commit()
-    db.refresh(collection)
+    await db.commit()
+    await db.refresh(collection)
     return collection
 
 
 @router.get("/collections", response_model=List[CollectionResponse])
-def list_collections(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(Collection).filter(Collection.user_id == user.id).all()
+async def list_collections(user: TokenUser = Depends(get_token_user), db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(Collection).where(Collection.user_id == user.id))).all()
 
 
 @router.get("/collections/{id}", response_model=CollectionResponse)
-def get_collection(id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    collection = db.query(Collection).filter(Collection.id == id, Collection.user_id == user.id).first()
-    if not collection:
-        raise HTTPException(status_code=404, detail="Not found")
-    return collection
+async def get_collection(id: str, user: TokenUser = Depends(get_token_user), db: AsyncSession = Depends(get_db)):
+    return await _get_user_collection(db, id, user)
 
 
 @router.delete("/collections/{id}")
-def delete_collection(id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    collection = db.query(Collection).filter(Collection.id == id, Collection.user_id == user.id).first()
-    if not collection:
-        raise HTTPException(status_code=404, detail="Not found")
-    
+async def delete_collection(id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """rows go now in bulk; files and vectors are removed by the reaper in the background"""
+    await _get_user_collection(db, id, user)
+
     # Nullify collection_id in chats that use this collection
-    chats = db.query(Chat).filter(Chat.collection_id == id).all()
-    for chat in chats:
-        chat.collection_id = None
-    
-    for doc in db.query(Document).filter(Document.collection_id == id).all():
-        delete_upload(doc.file_path)
-        db.delete(doc)
-    
-    delete_vector_collection(id)
-    db.delete(collection)
-    db.commit()
+    await db.execute(update(Chat).where(Chat.collection_id == id).values(collection_id=None))
+    await db.execute(delete(ChatCollection).where(ChatCollection.collection_id == id))
+    await schedule_collection_deletion(db, [id])
+    await db.execute(delete(Collection).where(Collection.id == id))
+    await db.commit()
+    # stop serving answers built from it right away; the reaper clears them again once vectors are gone
+    await ainvalidate_answers(id)
+    wake_reaper()
     return {"message": "deleted"}
 
 
 @router.post("/collections/{id}/documents", response_model=DocumentUploadResponse)
-async def upload_documents(id: str, files: List[UploadFile], user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    collection = db.query(Collection).filter(Collection.id == id, Collection.user_id == user.id).first()
-    if not collection:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    
-    docs = []
-    for f in files:
-        path, name, size = save_upload(f)
-        doc = Document(collection_id=id, file_path=path, filename=name, file_size=format_size(size))
-        db.add(doc)
-        db.commit()
-        db.refresh(doc)
-        docs.append(doc)
-        await asyncio.to_thread(index_document, path, id)
-    
+async def upload_documents(id: str, files: List[UploadFile], user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    await _get_user_collection(db, id, user, detail="Collection not found")
+
+    docs = await ingest_uploads(db, id, files)
+    await ainvalidate_answers(id)
+
     return {"message": f"{len(docs)} uploaded", "documents": docs}
 
 
+@router.post("/collections/{id}/reindex", response_model=DocumentUploadResponse)
+async def reindex_collection(id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """re-queue every document; ones whose file hasn't changed are skipped by the indexer"""
+    await _get_user_collection(db, id, user, detail="Collection not found")
+    await asyncio.to_thread(delete_untagged_vectors, id)
+
+    docs = (await db.scalars(select(Document).where(Document.collection_id == id))).all()
+    for doc in docs:
+        doc.status, doc.progress, doc.error = "pending", 0, None
+        doc.claimed_by = doc.claimed_at = None  # a worker still indexing the old version won't mark it done
+    await db.commit()
+    for doc in docs:
+        enqueue_document(doc)
+    return {"message": f"{len(docs)} queued", "documents": docs}
+
+
 @router.get("/collections/{id}/documents", response_model=List[DocumentResponse])
-def list_documents(id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    collection = db.query(Collection).filter(Collection.id == id, Collection.user_id == user.id).first()
-    if not collection:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    
-    return db.query(Document).filter(Document.collection_id == id).all()
+async def list_documents(id: str, user: TokenUser = Depends(get_token_user), db: AsyncSession = Depends(get_db)):
+    await _get_user_collection(db, id, user, detail="Collection not found")
+    return (await db.scalars(select(Document).where(Document.collection_id == id))).all()
 
 
-@router.delete("/{doc_id}")
-def delete_document(doc_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    doc = db.query(Document).filter(Document.id == doc_id).first()
+@router.get("/{doc_id}/status", response_model=DocumentStatusResponse)
+async def get_document_status(doc_id: str, user: TokenUser = Depends(get_token_user), db: AsyncSession = Depends(get_db)):
+    doc = await db.scalar(
+        select(Document).join(Collection, Collection.id == Document.collection_id).where(Document.id == doc_id, Collection.user_id == user.id)
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Not found")
+    return doc
+
+
+async def _get_user_document(db, doc_id, user):
+    doc = await db.scalar(select(Document).where(Document.id == doc_id))
     if not doc:
         raise HTTPException(status_code=404, detail="Not found")
-    
-    collection = db.query(Collection).filter(Collection.id == doc.collection_id, Collection.user_id == user.id).first()
+
+    collection = await db.scalar(select(Collection).where(Collection.id == doc.collection_id, Collection.user_id == user.id))
     if not collection:
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    delete_upload(doc.file_path)
-    db.delete(doc)
-    db.commit()
+    return doc
+
+
+@router.put("/{doc_id}", response_model=DocumentResponse)
+async def replace_document(doc_id: str, file: UploadFile, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """swap in a new version of the file; only this document's chunks are re-embedded"""
+    await _get_user_document(db, doc_id, user)
+    await db.commit()  # hand the connection back to the pool while the file streams in
+
+    path, name, size, sha256 = await save_upload(file)
+    doc = await db.scalar(select(Document).where(Document.id == doc_id).execution_options(populate_existing=True))
+    if not doc:
+        # deleted during the upload; nothing will point at the new file
+        await release_upload(db, path)
+        await db.commit()
+        raise HTTPException(status_code=404, detail="Not found")
+    old_path = doc.file_path
+    doc.file_path, doc.filename, doc.file_size, doc.content_hash = path, name, format_size(size), sha256
+    doc.status, doc.progress, doc.error = "pending", 0, None
+    doc.claimed_by = doc.claimed_at = None  # a worker still indexing the old version won't mark it done
+    await db.flush()
+    if old_path != path:
+        await release_upload(db, old_path)
+    await db.commit()
+    enqueue_document(doc)
+    # answers built from the old version would otherwise be served until it is re-indexed
+    await ainvalidate_answers(doc.collection_id)
+    return doc
+
+
+@router.delete("/{doc_id}")
+async def delete_document(doc_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    doc = await _get_user_document(db, doc_id, user)
+
+    await asyncio.to_thread(delete_document_vectors, doc.collection_id, doc.id)
+    await db.delete(doc)
+    await db.flush()
+    await release_upload(db, doc.file_path)
+    await db.commit()
+    await ainvalidate_answers(doc.collection_id)
     return {"message": "deleted"}
@@ -0,0 +1,31 @@
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import or_
+import base64
+import json
+
+
+def encode_cursor(created_at, id):
+    raw = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def keyset_page(db, stmt, model, cursor=None, limit=50):
+    """newest-first page of `stmt` seeking on (created_at, id); next_cursor continues with older rows"""
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        # the bare <= bound is what lets mysql and sqlite seek the index; the OR only breaks ties
+        stmt = stmt.where(model.created_at <= created_at, or_(model.created_at < created_at, model.id < id))
+    rows = (await db.scalars(stmt.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last.created_at, last.id)
@@ -0,0 +1,189 @@
+"""maintenance commands: python -m contextbase.cli <command> --help"""
+import argparse
+import asyncio
+import sys
+import time
+
+import numpy as np
+from qdrant_client import models
+
+from contextbase.services.llm import get_embedding_model
+from contextbase.services.qdrant import (
+    get_qdrant_client, close_qdrant, collection_config, create_payload_indexes, ensure_collection, invalidate_store,
+    is_shared, physical_collection, shared_collections, REBUILD_SUFFIX,
+)
+
+
+def _fit(vectors, points, dim, reembed):
+    """vectors sized for the target collection: kept, truncated (matryoshka) or re-embedded"""
+    out, redo = [], []
+    for i, (vector, point) in enumerate(zip(vectors, points)):
+        if not reembed and len(vector) == dim:
+            out.append(vector)
+        elif not reembed and len(vector) > dim:
+            # text-embedding-3 vectors stay meaningful when cut short and renormalized
+            v = np.asarray(vector[:dim], dtype=np.float32)
+            out.append((v / (np.linalg.norm(v) or 1.0)).tolist())
+        else:
+            out.append(None)
+            redo.append(i)
+    if redo:
+        fresh = get_embedding_model().embed_documents([(points[i].payload or {}).get("page_content", "") for i in redo])
+        for i, vector in zip(redo, fresh):
+            out[i] = vector
+    return out
+
+
+def _tagged(payload, collection_id):
+    payload = dict(payload or {})
+    payload["metadata"] = {**(payload.get("metadata") or {}), "collection_id": collection_id}
+    return payload
+
+
+def _copy_points(source, target, dim, batch_size, reembed=False, tenant=None):
+    """copy every point; with a tenant, each payload is also tagged with that collection id"""
+    client = get_qdrant_client()
+    offset, copied = None, 0
+    while True:
+        points, offset = client.scroll(source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True)
+        if points:
+            vectors = _fit([p.vector for p in points], points, dim, reembed)
+            payloads = [p.payload if tenant is None else _tagged(p.payload, tenant) for p in points]
+            client.upsert(target, points=[models.PointStruct(id=p.id, vector=v, payload=pl) for p, v, pl in zip(points, vectors, payloads)])
+            copied += len(points)
+        if offset is None:
+            return copied
+
+
+def rebuild_collection(name, batch_size=256, reembed=False, log=print):
+    """recreate a collection under the current QDRANT_* / EMBEDDING_DIMENSIONS settings, keeping point ids and payloads
+
+    The points are staged in `<name>__rebuild` first, so an interrupted run can be restarted:
+    if the original is already gone, the copy resumes from the staged collection.
+    """
+    client = get_qdrant_client()
+    temp = name + REBUILD_SUFFIX
+    dim = len(get_embedding_model().embed_query("dimension probe"))
+    start = time.perf_counter()
+
+    if client.collection_exists(name):
+        if client.collection_exists(temp):
+            client.delete_collection(temp)  # partial copy from an earlier run
+        client.create_collection(temp, **collection_config(dim, name))
+        staged = _copy_points(name, temp, dim, batch_size, reembed)
+        log(f"{name}: staged {staged} points")
+        invalidate_store(name)
+        client.delete_collection(name)
+    elif not client.collection_exists(temp):
+        raise SystemExit(f"{name}: no such collection")
+
+    client.create_collection(name, **collection_config(dim, name))
+    create_payload_indexes(name)
+    copied = _copy_points(temp, name, dim, batch_size)
+    client.delete_collection(temp)
+    log(f"{name}: rebuilt {copied} points at {dim} dims in {time.perf_counter() - start:.1f}s")
+    return copied
+
+
+def _rebuild(args):
+    client = get_qdrant_client()
+    names = args.collections
+    if args.all:
+        existing = [c.name for c in client.get_collections().collections]
+        # staged copies left by an interrupted run resume under their original name
+        names = sorted({n[:-len(REBUILD_SUFFIX)] if n.endswith(REBUILD_SUFFIX) else n for n in existing})
+    if not names:
+        raise SystemExit("name one or more collections, or pass --all")
+    for name in names:
+        rebuild_collection(name, batch_size=args.batch_size, reembed=args.reembed)
+
+
+def migrate_collection(name, batch_size=256, keep=False, log=print):
+    """move a per-collection qdrant collection into the shared one, tagging its points with the collection id
+
+    Point ids are kept, so an interrupted run can simply be repeated.
+    """
+    client = get_qdrant_client()
+    target = physical_collection(name)
+    if not client.collection_exists(name):
+        raise SystemExit(f"{name}: no such collection")
+    start = time.perf_counter()
+    dim = client.get_collection(name).config.params.vectors.size
+    ensure_collection(target, dim)
+    copied = _copy_points(name, target, dim, batch_size, tenant=name)
+    if not keep:
+        invalidate_store(name)
+        client.delete_collection(name)
+    log(f"{name}: moved {copied} points into {target} in {time.perf_counter() - start:.1f}s")
+    return copied
+
+
+def _migrate(args):
+    if not is_shared():
+        raise SystemExit("set QDRANT_STORAGE_MODE=shared first")
+    names = args.collections
+    if args.all:
+        shared = set(shared_collections())
+        existing = [c.name for c in get_qdrant_client().get_collections().collections]
+        names = sorted(n for n in existing if n not in shared and not n.endswith(REBUILD_SUFFIX))
+    if not names:
+        raise SystemExit("name one or more collections, or pass --all")
+    for name in names:
+        migrate_collection(name, batch_size=args.batch_size, keep=args.keep)
+
+
+def _init_db(args):
+    from contextbase.core import init_db
+
+    init_db()
+    print("database schema is up to date")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m contextbase.cli", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser(
+        "rebuild",
+        help="recreate qdrant collections with the current storage settings",
+        description="Recreate collections with the current QDRANT_QUANTIZATION, QDRANT_ON_DISK_*, QDRANT_HNSW_* and "
+        "EMBEDDING_DIMENSIONS. Vectors are copied, truncated when the new size is smaller, or re-embedded. "
+        "Searches miss the collection while it is being recreated, and documents ingested meanwhile are lost, "
+        "so stop ingestion first.",
+    )
+    rebuild.add_argument("collections", nargs="*", help="collection ids")
+    rebuild.add_argument("--all", action="store_true", help="every collection on the server")
+    rebuild.add_argument("--batch-size", type=int, default=256)
+    rebuild.add_argument("--reembed", action="store_true", help="embed chunk text again instead of reusing or truncating vectors")
+    rebuild.set_defaults(func=_rebuild)
+
+    migrate = commands.add_parser(
+        "migrate",
+        help="move per-collection qdrant collections into the shared collection",
+        description="Copy each collection's points into QDRANT_SHARED_COLLECTION (or its QDRANT_SHARED_SHARDS), tagged "
+        "with the collection id, then drop the original. Run with QDRANT_STORAGE_MODE=shared, after stopping ingestion; "
+        "repeating it after an interruption is safe.",
+    )
+    migrate.add_argument("collections", nargs="*", help="collection ids")
+    migrate.add_argument("--all", action="store_true", help="every per-collection collection on the server")
+    migrate.add_argument("--batch-size", type=int, default=256)
+    migrate.add_argument("--keep", action="store_true", help="leave the original collections in place")
+    migrate.set_defaults(func=_migrate)
+
+    init = commands.add_parser(
+        "init-db",
+        help="create missing tables and apply schema upgrades",
+        description="What each worker does on startup unless DB_INIT_ON_STARTUP=false; run it once before starting "
+        "workers that don't.",
+    )
+    init.set_defaults(func=_init_db)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        asyncio.run(close_qdrant())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
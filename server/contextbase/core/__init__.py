@@ -1,3 +1,4 @@
 from .config import settings, get_settings
-from .database import Base, get_db, engine, init_db
-from .security import hash_password, verify_password, create_access_token, get_current_user, oauth2_scheme
+from .database import Base, get_db, engine, async_engine, SessionLocal, AsyncSessionLocal, init_db
+from .security import hash_password, verify_password, create_access_token, create_user_token, get_current_user, get_token_user, invalidate_user, TokenUser, oauth2_scheme
+from .hashing import get_hasher, needs_rehash, shutdown_hasher
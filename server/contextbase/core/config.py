@@ -1,5 +1,14 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+import os
+
+# worker processes serving on this host (env only: gunicorn.conf.py sets it before the app is imported)
+WORKER_PROCESSES = max(1, int(os.environ.get("WEB_CONCURRENCY") or 1))
+
+
+def _per_worker(total):
+    """an even share of something the whole host has `total` of, for each worker process"""
+    return max(1, total // WORKER_PROCESSES)
 
 
 class Settings(BaseSettings):
@@ -12,23 +21,133 @@ class Settings(BaseSettings):
     MYSQL_USER: str = "root"
     MYSQL_PASSWORD: str = ""
     MYSQL_DATABASE: str = "contextbase"
+    DATABASE_URL: str = ""  # overrides the MYSQL_* settings, e.g. sqlite:///contextbase.db
+    DB_INIT_ON_STARTUP: bool = True  # create and upgrade the schema when a worker starts; off under gunicorn.conf.py, whose master does it once
     
     SECRET_KEY: str = "change-this-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     RESET_TOKEN_EXPIRE_MINUTES: int = 15
+    BCRYPT_ROUNDS: int = 12  # existing hashes are upgraded on the next login
+    HASH_WORKERS: int = _per_worker(os.cpu_count() or 1)  # bcrypt processes per worker, the cores split across WEB_CONCURRENCY; 0 hashes on the default thread executor
+    HASH_QUEUE_SIZE: int = 64  # waiting hash calls before logins get 429
+    AUTH_CACHE_TTL: int = 60  # seconds a user stays cached; bounds how long other workers see a stale password/deactivation
+    AUTH_CACHE_MAX_ENTRIES: int = 10_000
+    # read-only endpoints skip loading the user and check only its cached auth version and active flag, so a
+    # password change or deactivation reaches them up to AUTH_CACHE_TTL late on workers that cached the old ones
+    AUTH_STATELESS_READS: bool = False
     
-    QDRANT_URL: str = "http://localhost:6333"
+    QDRANT_URL: str = "http://localhost:6333"  # or ":memory:" / a directory for embedded mode
+    QDRANT_API_KEY: str = ""
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_POOL_SIZE: int = 20
+    QDRANT_TIMEOUT: int = 30
+    QDRANT_STORAGE_MODE: str = "per_collection"  # per_collection | shared (every Collection in one qdrant collection, partitioned by payload)
+    QDRANT_SHARED_COLLECTION: str = "contextbase_chunks"
+    QDRANT_SHARED_SHARDS: int = 1  # spread shared mode over this many qdrant collections by collection id hash; fixed once data exists
+    # applied when a collection is created; `python -m contextbase.cli rebuild` moves existing ones over
+    QDRANT_QUANTIZATION: str = "none"  # none | scalar (int8, 4x smaller) | binary (32x smaller, for 1024+ dims)
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True  # keep quantized vectors in RAM when the originals are on disk
+    QDRANT_RESCORE: bool = True  # re-rank quantized hits with the original vectors
+    QDRANT_OVERSAMPLING: float = 2.0  # quantized candidates fetched per requested hit before rescoring
+    QDRANT_ON_DISK_VECTORS: bool = False
+    QDRANT_ON_DISK_PAYLOAD: bool = False
+    QDRANT_HNSW_M: int = 16
+    QDRANT_HNSW_EF_CONSTRUCT: int = 100
+    QDRANT_HNSW_EF: int = 0  # search-time ef, 0 = server default
+    QDRANT_HNSW_ON_DISK: bool = False
     
     OPENAI_API_KEY: str = ""
     
+    LLM_PROVIDER: str = "openai"  # openai | fake
+    LLM_MODEL: str = "gpt-4o-mini"
+    FAKE_LLM_RESPONSE: str = "This is a canned answer from the fake chat model."
+    FAKE_LLM_LATENCY: float = 0.0  # seconds before the first token
+    FAKE_LLM_TOKENS_PER_SEC: float = 0.0  # 0 = instant
+    TITLE_MODE: str = "llm"  # llm | heuristic (no model call)
+    TITLE_MODEL: str = ""  # e.g. a smaller model just for titles; empty = LLM_MODEL
+    TITLE_BATCH_SIZE: int = 20  # first exchanges titled by one call
+    TITLE_BATCH_WAIT: float = 0.2  # seconds to gather new chats before titling them
+    
+    EMBEDDING_PROVIDER: str = "openai"  # openai | fake
+    EMBEDDING_MODEL: str = "text-embedding-3-large"
+    EMBEDDING_DIMENSIONS: int = 0  # shorten text-embedding-3 vectors (matryoshka), e.g. 1024 or 256; 0 = full size
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 6
+    EMBEDDING_CACHE_PATH: str = "cache/embeddings.sqlite3"  # empty disables the cache
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500_000
+    FAKE_EMBEDDING_SIZE: int = 256
+    FAKE_EMBEDDING_LATENCY: float = 0.0  # seconds per embedding call
+    
+    ANSWER_CACHE_ENABLED: bool = False
+    # memory | sqlite (shared across workers); memory only invalidates in its own process, so it's the default for one worker
+    ANSWER_CACHE_BACKEND: str = "memory" if WORKER_PROCESSES == 1 else "sqlite"
+    ANSWER_CACHE_PATH: str = "cache/answers.sqlite3"
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # cosine similarity needed to reuse an answer
+    ANSWER_CACHE_TTL: int = 3600  # seconds, 0 = no expiry
+    ANSWER_CACHE_MAX_ENTRIES: int = 10_000
+
+    SINGLEFLIGHT_ENABLED: bool = True  # identical concurrent first questions to the same collections share one answer
+    SINGLEFLIGHT_BACKEND: str = "memory"  # memory (per process) | sqlite (also across workers on one host)
+    SINGLEFLIGHT_PATH: str = "cache/singleflight.sqlite3"
+    SINGLEFLIGHT_TIMEOUT: float = 30.0  # seconds a caller waits on another's identical request before running its own
+
+    RAG_TOP_K: int = 4  # chunks put in the prompt
+    RAG_DENSE_CANDIDATES: int = 20  # qdrant hits considered before fusion
+    RAG_HYBRID_ENABLED: bool = True  # also search a local bm25 index (sqlite fts5) and fuse the rankings
+    RAG_LEXICAL_CANDIDATES: int = 20
+    RAG_RRF_K: int = 60
+    RAG_MMR_ENABLED: bool = False
+    RAG_MMR_LAMBDA: float = 0.7  # 1 = pure relevance, 0 = pure diversity
+    RAG_RERANKER: str = "none"  # none | cross-encoder (needs sentence-transformers) | fake
+    RAG_RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RAG_RERANK_CANDIDATES: int = 20
+    LEXICAL_INDEX_DIR: str = "cache/lexical"
+    LEXICAL_INDEX_MAX_OPEN: int = 256  # collection indexes kept open per worker, least recently used closed first
+    RAG_MAX_PER_COLLECTION: int = 0  # cap on one collection's share of RAG_TOP_K when a chat searches several; 0 = no cap
+    CHAT_MAX_COLLECTIONS: int = 10
+    CONTEXT_TOKEN_BUDGET: int = 3000  # retrieved text per prompt after overlapping chunks are joined; 0 = no limit
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8  # drop a chunk when this share of its word trigrams is in a better one; 1 = keep all
+
+    HISTORY_MAX_MESSAGES: int = 20  # most recent messages fetched per turn
+    HISTORY_TOKEN_BUDGET: int = 2000  # those are trimmed, oldest first, to fit this
+    HISTORY_SUMMARY_ENABLED: bool = False  # keep a rolling LLM summary of turns older than the window
+    HISTORY_SUMMARY_TOKENS: int = 300
+    HISTORY_SUMMARY_BATCH: int = 40  # messages folded into the summary per turn
+
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024
     
+    REAPER_INTERVAL: float = 5.0  # seconds between passes over pending deletions
+    REAPER_BATCH_SIZE: int = 500  # files removed per transaction
+    REAPER_GC_INTERVAL: int = 3600  # seconds between orphan sweeps of UPLOAD_DIR and qdrant (by one worker), 0 = off
+    REAPER_GC_GRACE: int = 3600  # files younger than this are left alone (uploads in flight)
+    
+    INGEST_WORKERS: int = 2
+    INGEST_LEASE: int = 300  # seconds a worker's claim on a document lasts unless renewed; expired claims are taken over
+    PARSE_WORKERS: int = _per_worker(os.cpu_count() or 1)  # parse processes per worker, the cores split across WEB_CONCURRENCY; 0 parses inline in the ingest thread
+    PARSE_PAGES_PER_TASK: int = 8
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    
+    # Prometheus /metrics; several workers need PROMETHEUS_MULTIPROC_DIR (env only), which gunicorn.conf.py sets
+    METRICS_ENABLED: bool = True
+    
     @property
     def database_url(self):
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}"
     
+    @property
+    def async_database_url(self):
+        url = self.database_url
+        for sync, async_ in (("mysql+pymysql://", "mysql+aiomysql://"), ("mysql://", "mysql+aiomysql://"), ("sqlite://", "sqlite+aiosqlite://")):
+            if url.startswith(sync):
+                return async_ + url[len(sync):]
+        return url
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,20 +1,102 @@
-from sqlalchemy import create_engine
+from datetime import datetime, timezone
+from sqlalchemy import DateTime, create_engine, event, inspect, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
+from .metrics import timed_pool, track_connections
 
-engine = create_engine(settings.database_url, pool_pre_ping=True, pool_size=10, max_overflow=20)
+
+def _engine_kwargs(url, name):
+    parsed = make_url(url)
+    kwargs = {"poolclass": timed_pool(parsed.get_dialect().get_pool_class(parsed), name)}
+    if url.startswith("sqlite"):
+        if "aiosqlite" not in url:
+            kwargs["connect_args"] = {"check_same_thread": False}
+        return kwargs
+    return {**kwargs, "pool_pre_ping": True, "pool_size": 10, "max_overflow": 20}
+
+
+# sync engine for background workers and schema management, async engine for requests
+engine = create_engine(settings.database_url, **_engine_kwargs(settings.database_url, "sync"))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(settings.async_database_url, **_engine_kwargs(settings.async_database_url, "async"))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+# microsecond precision on MySQL so keyset cursors rarely land on ties
+Timestamp = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+
+def utcnow():
+    """set in python so sqlite stores one timestamp format and cursors compare correctly"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+track_connections(engine, "sync")
+track_connections(async_engine.sync_engine, "async")
+
+
+def _sqlite_pragmas(dbapi_conn, _):
+    # WAL lets the sync and async engines read while the other writes
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.close()
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def _widen_timestamp(conn, table, col, existing):
+    """give a MySQL column created before it became a Timestamp its microseconds, and move its rows to UTC
+
+    Those rows were stamped by the server's NOW(), in its time zone, while new ones come from utcnow();
+    left as they were, keyset order would be wrong across the switch."""
+    if engine.dialect.name != "mysql" or col.type.compile(dialect=engine.dialect) != "DATETIME(6)" or getattr(existing["type"], "fsp", None):
+        return
+    null = "NULL" if col.nullable else "NOT NULL"
+    conn.execute(text(f"ALTER TABLE {table.name} MODIFY {col.name} DATETIME(6) {null}"))
+    # the current offset; rows from either side of a DST change may be off by its hour
+    offset = conn.execute(text("SELECT TIMESTAMPDIFF(SECOND, UTC_TIMESTAMP(), NOW())")).scalar() or 0
+    offset = round(offset / 60) * 60
+    if offset:
+        conn.execute(text(f"UPDATE {table.name} SET {col.name} = {col.name} - INTERVAL :offset SECOND"), {"offset": offset})
+
+
+def _upgrade_schema():
+    """add columns and indexes that create_all skips on tables that already exist"""
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            have = {c["name"]: c for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in have:
+                    _widen_timestamp(conn, table, col, have[col.name])
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(dialect=engine.dialect)}"
+                # "backfill" lets existing rows get a different value than new ones
+                default = col.info.get("backfill", col.default.arg if col.default is not None and col.default.is_scalar else None)
+                if default is not None:
+                    ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+                conn.execute(text(ddl))
+            have_indexes = {i["name"] for i in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in have_indexes:
+                    index.create(conn)
 
 
 def init_db():
     from contextbase.models import user, chat, document
     Base.metadata.create_all(bind=engine)
+    _upgrade_schema()
@@ -0,0 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+import asyncio
+import math
+import multiprocessing
+import time
+import bcrypt
+
+from .config import settings
+from .metrics import PASSWORD_HASH_LATENCY, PASSWORD_HASH_REJECTED
+
+
+def hash_password(password: str, rounds: int = None) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)).decode()
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    return bcrypt.checkpw(plain.encode(), hashed.encode())
+
+
+def needs_rehash(hashed: str) -> bool:
+    """true when the hash was made with a cost other than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+class PasswordHasher:
+    """bcrypt on a dedicated process pool, rejecting work once `queue_size` calls are waiting"""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        # 0 workers runs on the event loop's default thread executor; the processes come from a forkserver
+        # because forking this process, with its event loop and executor threads, can copy a held lock
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver")) if workers > 0 else None
+        self._pending = 0
+        self._avg = 0.25  # seconds per hash, refined as calls complete
+
+    def retry_after(self):
+        return max(1, math.ceil(self._pending / max(1, self.workers) * self._avg))
+
+    async def _run(self, operation, fn, *args):
+        if self._pending >= self.queue_size:
+            PASSWORD_HASH_REJECTED.inc()
+            raise HTTPException(status_code=429, detail="Too many sign-in attempts, try again shortly", headers={"Retry-After": str(self.retry_after())})
+        ahead = self._pending // max(1, self.workers)
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self._pending -= 1
+            elapsed = time.perf_counter() - start
+            # the wait behind earlier calls isn't part of the per-hash cost
+            self._avg = 0.8 * self._avg + 0.2 * elapsed / (ahead + 1)
+            PASSWORD_HASH_LATENCY.labels(operation).observe(elapsed)
+
+    async def hash(self, password):
+        return await self._run("hash", hash_password, password, settings.BCRYPT_ROUNDS)
+
+    async def verify(self, plain, hashed):
+        return await self._run("verify", verify_password, plain, hashed)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher = None
+
+
+def get_hasher():
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher(settings.HASH_WORKERS, settings.HASH_QUEUE_SIZE)
+    return _hasher
+
+
+def shutdown_hasher():
+    global _hasher
+    if _hasher is not None:
+        _hasher.shutdown()
+        _hasher = None
@@ -0,0 +1,145 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+from starlette.responses import Response
+import asyncio
+import os
+import time
+
+# with PROMETHEUS_MULTIPROC_DIR set, every worker writes to mmap files and /metrics aggregates them
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+_TOKEN_BUCKETS = (0, 50, 100, 250, 500, 1000, 2000, 4000, 8000)
+
+REQUEST_LATENCY = Histogram(
+    "contextbase_http_request_duration_seconds", "Time to finish a request, including streamed bodies",
+    ["method", "route", "status"], buckets=_FAST_BUCKETS + (5.0, 10.0, 30.0, 60.0),
+)
+REQUESTS_IN_PROGRESS = Gauge("contextbase_http_requests_in_progress", "Requests being served", multiprocess_mode="livesum")
+
+SEARCH_LATENCY = Histogram("contextbase_search_duration_seconds", "Retrieval time by stage (embed, query)", ["stage"], buckets=_FAST_BUCKETS)
+
+LLM_LATENCY = Histogram("contextbase_llm_duration_seconds", "LLM call duration", ["operation"], buckets=_SLOW_BUCKETS)
+LLM_TOKENS = Counter("contextbase_llm_tokens", "Tokens reported by the LLM", ["operation", "kind"])
+LLM_ERRORS = Counter("contextbase_llm_errors", "Failed LLM calls", ["operation"])
+CONTEXT_TOKENS = Histogram("contextbase_context_tokens", "Tokens of retrieved context put in a RAG prompt", buckets=_TOKEN_BUCKETS)
+CONTEXT_TOKENS_SAVED = Histogram(
+    "contextbase_context_tokens_saved", "Tokens per RAG prompt saved by merging overlapping chunks, dropping near-duplicates and the budget",
+    buckets=_TOKEN_BUCKETS,
+)
+CHAT_TITLES = Counter("contextbase_chat_titles", "Chat titles set, by where they came from (llm, heuristic)", ["source"])
+
+INDEX_LATENCY = Histogram("contextbase_index_duration_seconds", "Time to index one document", buckets=_SLOW_BUCKETS)
+INDEXED_PAGES = Counter("contextbase_indexed_pages", "Pages indexed")
+INDEXED_CHUNKS = Counter("contextbase_indexed_chunks", "Chunks indexed")
+EMBEDDINGS = Counter("contextbase_embeddings", "Texts embedded, by where the vector came from (backend, cache)", ["source"])
+EMBEDDING_LATENCY = Histogram("contextbase_embedding_request_duration_seconds", "Embedding backend call duration", buckets=_SLOW_BUCKETS)
+
+DB_CHECKOUT_LATENCY = Histogram("contextbase_db_pool_checkout_seconds", "Time to get a pooled connection", ["engine"], buckets=_FAST_BUCKETS)
+DB_CONNECTION_HOLD = Histogram("contextbase_db_connection_hold_seconds", "Time a connection stays checked out", ["engine"], buckets=_FAST_BUCKETS + (5.0, 10.0, 30.0))
+DB_CONNECTIONS_IN_USE = Gauge("contextbase_db_pool_in_use", "Checked out connections", ["engine"], multiprocess_mode="livesum")
+
+THREADPOOL_IN_USE = Gauge("contextbase_threadpool_in_use", "Busy threads in the request threadpool", multiprocess_mode="livesum")
+THREADPOOL_LIMIT = Gauge("contextbase_threadpool_limit", "Request threadpool size", multiprocess_mode="livesum")
+
+PASSWORD_HASH_LATENCY = Histogram("contextbase_password_hash_seconds", "bcrypt call time including queueing", ["operation"], buckets=_SLOW_BUCKETS)
+PASSWORD_HASH_REJECTED = Counter("contextbase_password_hash_rejected", "Hash calls refused with 429 because the queue was full")
+
+ANSWER_CACHE_LOOKUPS = Counter("contextbase_answer_cache_lookups", "Answer cache lookups", ["result"])
+SINGLEFLIGHT_CALLS = Counter(
+    "contextbase_singleflight_calls", "Coalescable RAG calls: leader, coalesced, coalesced_remote, or fallback when the leader failed or timed out", ["result"]
+)
+
+
+class MetricsMiddleware:
+    """per-route latency; plain ASGI so streamed responses aren't buffered"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            # the matched route template keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+
+
+def observe_llm(operation, seconds, usage=None):
+    LLM_LATENCY.labels(operation).observe(seconds)
+    if usage:
+        LLM_TOKENS.labels(operation, "input").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels(operation, "output").inc(usage.get("output_tokens", 0))
+
+
+def timed_pool(pool_cls, engine_name):
+    """pool subclass that records how long getting a connection takes"""
+
+    class TimedPool(pool_cls):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                DB_CHECKOUT_LATENCY.labels(engine_name).observe(time.perf_counter() - start)
+
+    TimedPool.__name__ = f"Timed{pool_cls.__name__}"
+    return TimedPool
+
+
+def track_connections(engine, engine_name):
+    in_use = DB_CONNECTIONS_IN_USE.labels(engine_name)
+    hold = DB_CONNECTION_HOLD.labels(engine_name)
+
+    def checkout(dbapi_conn, record, proxy):
+        in_use.inc()
+        record.info["checked_out_at"] = time.perf_counter()
+
+    def checkin(dbapi_conn, record):
+        in_use.dec()
+        start = record.info.pop("checked_out_at", None)
+        if start is not None:
+            hold.observe(time.perf_counter() - start)
+
+    event.listen(engine, "checkout", checkout)
+    event.listen(engine, "checkin", checkin)
+
+
+async def sample_threadpool(interval=1.0):
+    import anyio.to_thread
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    while True:
+        THREADPOOL_IN_USE.set(limiter.borrowed_tokens)
+        THREADPOOL_LIMIT.set(limiter.total_tokens)
+        await asyncio.sleep(interval)
+
+
+def mark_process_dead(pid=None):
+    """drop a worker's live gauges (this one's by default); call on shutdown in multiprocess mode"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def metrics_response():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
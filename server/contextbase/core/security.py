@@ -1,25 +1,22 @@
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-import bcrypt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import threading
+import time
 
 from .config import settings
 from .database import get_db
+from .hashing import hash_password, verify_password
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode(), hashed.encode())
-
-
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -27,6 +24,11 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
+def create_user_token(user):
+    """access token carrying the user id and auth version, so requests can skip the users table"""
+    return create_access_token({"sub": user.email, "uid": user.id, "ver": user.auth_version or 0})
+
+
 def create_reset_token(email: str):
     return create_access_token(
         {"sub": email, "type": "reset"},
@@ -44,24 +46,126 @@ def verify_reset_token(token: str) -> Optional[str]:
     return None
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    from contextbase.models.user import User
-    
-    creds_exception = HTTPException(
+class _UserCache:
+    """users by id for AUTH_CACHE_TTL seconds, least recently used evicted first"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> (user, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+    def put(self, user_id, user):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+_user_cache = _UserCache(settings.AUTH_CACHE_TTL, settings.AUTH_CACHE_MAX_ENTRIES)
+_stamp_cache = _UserCache(settings.AUTH_CACHE_TTL, settings.AUTH_CACHE_MAX_ENTRIES)  # id -> (auth_version, is_active)
+
+
+def invalidate_user(user_id):
+    """drop a cached user after a password change or deactivation; other workers catch up within the TTL"""
+    _user_cache.invalidate(user_id)
+    _stamp_cache.invalidate(user_id)
+
+
+@dataclass(frozen=True)
+class TokenUser:
+    """identity taken from the token alone"""
+    id: str
+    email: str
+
+
+def _credentials_error():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _decode(token):
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email = payload.get("sub")
-        if not email:
-            raise creds_exception
     except JWTError:
-        raise creds_exception
-    
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise creds_exception
+        raise _credentials_error()
+    # reset tokens are signed with the same key but must not open a session
+    if not payload.get("sub") or payload.get("type") == "reset":
+        raise _credentials_error()
+    return payload
+
+
+async def _load_user(payload, db):
+    from contextbase.models.user import User
+
+    uid = payload.get("uid")
+    if uid is None:
+        # token issued before uid/ver were added; revoked by any later password change
+        user = await db.scalar(select(User).where(User.email == payload["sub"]))
+        if user is not None and user.auth_version:
+            raise _credentials_error()
+    else:
+        columns = _user_cache.get(uid)
+        if columns is None:
+            user = await db.get(User, uid)
+            if user is not None:
+                columns = {c.key: getattr(user, c.key) for c in User.__table__.columns}
+                _user_cache.put(uid, columns)
+                _stamp_cache.put(uid, (user.auth_version or 0, bool(user.is_active)))
+        else:
+            # a fresh detached copy per request, so no two requests share one object
+            user = User(**columns)
+        if user is not None and (user.auth_version or 0) != payload.get("ver"):
+            raise _credentials_error()
+    if not user or not user.is_active:
+        raise _credentials_error()
     return user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await _load_user(_decode(token), db)
+
+
+async def get_token_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """claims-only user for read-only endpoints when AUTH_STATELESS_READS is on
+
+    The user row isn't loaded, but its auth version and active flag still are (cached for AUTH_CACHE_TTL),
+    so a password change or deactivation revokes the token here too.
+    """
+    from contextbase.models.user import User
+
+    payload = _decode(token)
+    uid = payload.get("uid")
+    if not settings.AUTH_STATELESS_READS or uid is None:
+        return await _load_user(payload, db)
+    stamp = _stamp_cache.get(uid)
+    if stamp is None:
+        row = (await db.execute(select(User.auth_version, User.is_active).where(User.id == uid))).first()
+        if row is None:
+            raise _credentials_error()
+        stamp = (row.auth_version or 0, bool(row.is_active))
+        _stamp_cache.put(uid, stamp)
+    if stamp != (payload.get("ver"), True):
+        raise _credentials_error()
+    return TokenUser(id=uid, email=payload["sub"])
@@ -1,15 +1,47 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
-from contextbase.core import settings, init_db
+from contextbase.core import settings, init_db, async_engine, shutdown_hasher
+from contextbase.core.metrics import MetricsMiddleware, metrics_response, sample_threadpool, mark_process_dead
 from contextbase.api import api_router
+from contextbase.services import (
+    start_ingestion, stop_ingestion, start_reaper, stop_reaper, start_titler, stop_titler, warm_up, close_qdrant, get_llm, get_embedding_model,
+    load_tokenizer,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
+    if settings.DB_INIT_ON_STARTUP:
+        init_db()
+    # clients are made here, in each worker after a prefork master forked, so the first request doesn't pay for them
+    try:
+        get_embedding_model()
+        get_llm()
+    except Exception as e:
+        print(f"model client setup failed: {e}")
+    # may fetch the BPE file; falls back to estimating token counts when that fails
+    await asyncio.to_thread(load_tokenizer)
+    try:
+        await warm_up()
+    except Exception as e:
+        print(f"qdrant warm-up failed: {e}")
+    await start_ingestion()
+    await start_reaper()
+    await start_titler()
+    sampler = asyncio.create_task(sample_threadpool()) if settings.METRICS_ENABLED else None
     yield
+    if sampler:
+        sampler.cancel()
+    await stop_titler()
+    await stop_reaper()
+    await stop_ingestion()
+    shutdown_hasher()
+    await close_qdrant()
+    await async_engine.dispose()
+    mark_process_dead()
 
 
 def create_app():
@@ -29,6 +61,9 @@ def create_app():
         allow_headers=["*"],
     )
     
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+    
     app.include_router(api_router)
     
     @app.get("/")
@@ -39,6 +74,11 @@ def create_app():
     def health():
         return {"status": "healthy", "version": settings.APP_VERSION}
     
+    if settings.METRICS_ENABLED:
+        @app.get("/metrics", include_in_schema=False)
+        def metrics():
+            return metrics_response()
+    
     return app
 
 
@@ -1,3 +1,3 @@
 from .user import User
-from .chat import Chat, Message
-from .document import Collection, Document
+from .chat import Chat, Message, ChatCollection
+from .document import Collection, Document, DeletionJob, OrphanBlob, GarbageRun
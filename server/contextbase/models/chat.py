@@ -1,28 +1,42 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index, PrimaryKeyConstraint
 from sqlalchemy.sql import func
 import uuid
 
-from contextbase.core.database import Base
+from contextbase.core.database import Base, Timestamp, utcnow
 
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (Index("ix_chats_user_created", "user_id", "created_at", "id"),)
     
     id = Column(String(40), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String(255), index=True)
     description = Column(Text, nullable=True)
     user_id = Column(String(40), ForeignKey("users.id"), nullable=False)
-    collection_id = Column(String(40), ForeignKey("collections.id"), nullable=True)
-    created_at = Column(DateTime, default=func.now())
+    collection_id = Column(String(40), ForeignKey("collections.id"), nullable=True, index=True)  # where chat uploads go
+    summary = Column(Text, nullable=True)  # rolling summary of turns older than the history window
+    summary_until = Column(Timestamp, nullable=True)  # created_at of the last message folded into it
+    created_at = Column(Timestamp, default=utcnow)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_chat_created", "chat_id", "created_at", "id"),)
     
     id = Column(String(40), primary_key=True, default=lambda: str(uuid.uuid4()))
     chat_id = Column(String(40), ForeignKey("chats.id"), nullable=False)
     content = Column(Text, nullable=False)
     role = Column(String(20), default="user")
     sources = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(Timestamp, default=utcnow)
+
+
+class ChatCollection(Base):
+    """other collections a chat searches besides its own collection_id"""
+    __tablename__ = "chat_collections"
+    __table_args__ = (PrimaryKeyConstraint("chat_id", "collection_id"),)
+    
+    chat_id = Column(String(40), ForeignKey("chats.id"), nullable=False)
+    collection_id = Column(String(40), ForeignKey("collections.id"), nullable=False, index=True)
+    created_at = Column(Timestamp, default=utcnow)
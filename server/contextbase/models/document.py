@@ -1,8 +1,8 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text
 from sqlalchemy.sql import func
 import uuid
 
-from contextbase.core.database import Base
+from contextbase.core.database import Base, Timestamp, utcnow
 
 
 class Collection(Base):
@@ -22,4 +22,38 @@ class Document(Base):
     filename = Column(String(255), nullable=True)
     file_path = Column(String(255), nullable=False)
     file_size = Column(String(50), nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)
+    indexed_hash = Column(String(64), nullable=True)  # content_hash of the last version whose indexing completed
+    status = Column(String(20), default="pending", index=True, info={"backfill": "ready"})
+    progress = Column(Integer, default=0, info={"backfill": 100})
+    error = Column(Text, nullable=True)
+    claimed_by = Column(String(64), nullable=True)  # ingestion worker indexing it
+    claimed_at = Column(Timestamp, nullable=True)  # renewed while it works; an old claim is abandoned
     created_at = Column(DateTime, default=func.now())
+
+
+class DeletionJob(Base):
+    """a deleted collection whose vectors and indexes the reaper still has to drop"""
+    __tablename__ = "deletion_jobs"
+    
+    collection_id = Column(String(40), primary_key=True)  # no FK, the collection row is already gone
+    created_at = Column(Timestamp, default=utcnow)
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+
+
+class OrphanBlob(Base):
+    """an upload file to remove once no Document references it"""
+    __tablename__ = "orphan_blobs"
+    
+    path = Column(String(255), primary_key=True)
+    created_at = Column(Timestamp, default=utcnow)
+
+
+class GarbageRun(Base):
+    """the last orphan sweep; the worker that moves started_at forward runs the next one"""
+    __tablename__ = "garbage_runs"
+    
+    name = Column(String(40), primary_key=True)
+    started_at = Column(Timestamp, nullable=False)
+    suspects = Column(Text, nullable=True)  # JSON list of collection ids found orphaned, queued if still orphaned next time
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime
+from sqlalchemy import Column, String, Boolean, DateTime, Integer
 from sqlalchemy.sql import func
 import uuid
 
@@ -13,4 +13,5 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=False)
     password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
+    auth_version = Column(Integer, default=0)  # bumped to revoke issued tokens
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,3 +1,3 @@
-from .user import UserCreate, UserLogin, UserResponse, Token
-from .chat import ChatCreate, ChatUpdate, ChatResponse, MessageCreate, MessageResponse, ChatWithMessages, AIResponse
-from .document import CollectionCreate, CollectionResponse, DocumentResponse, DocumentUploadResponse
+from .user import UserCreate, UserLogin, UserResponse, Token, PasswordChange
+from .chat import ChatCreate, ChatUpdate, ChatResponse, MessageCreate, MessageResponse, ChatWithMessages, ChatCollectionAttach, ChatCollections, ChatPage, MessagePage, AIResponse
+from .document import CollectionCreate, CollectionResponse, DocumentResponse, DocumentUploadResponse, DocumentStatusResponse
@@ -5,6 +5,7 @@ from datetime import datetime
 
 class ChatCreate(BaseModel):
     name: Optional[str] = "New Chat"
+    collection_ids: List[str] = []  # existing collections to search alongside any uploads
 
 
 class ChatUpdate(BaseModel):
@@ -25,6 +26,14 @@ class ChatResponse(BaseModel):
         from_attributes = True
 
 
+class ChatCollectionAttach(BaseModel):
+    collection_id: str
+
+
+class ChatCollections(BaseModel):
+    collection_ids: List[str]  # the chat's own collection first, if it has one
+
+
 class MessageCreate(BaseModel):
     content: str
 
@@ -41,13 +50,26 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+class ChatPage(BaseModel):
+    items: List[ChatResponse]
+    next_cursor: Optional[str] = None
+
+
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None  # fetches older messages
+
+
 class ChatWithMessages(BaseModel):
     chat: ChatResponse
-    messages: List[MessageResponse]
+    collection_ids: List[str] = []
+    messages: List[MessageResponse]  # latest page, oldest first
+    next_cursor: Optional[str] = None
 
 
 class AIResponse(BaseModel):
     user_message: MessageResponse
     ai_message: MessageResponse
     chat_name: Optional[str] = None
+    title_pending: bool = False  # a title is being generated; poll GET /chats/{id} for it
 
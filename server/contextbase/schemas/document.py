@@ -23,6 +23,9 @@ class DocumentResponse(BaseModel):
     filename: Optional[str]
     file_path: str
     file_size: Optional[str]
+    status: Optional[str] = None
+    progress: Optional[int] = None
+    error: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -32,3 +35,13 @@ class DocumentResponse(BaseModel):
 class DocumentUploadResponse(BaseModel):
     message: str
     documents: List[DocumentResponse]
+
+
+class DocumentStatusResponse(BaseModel):
+    id: str
+    status: Optional[str]
+    progress: Optional[int]
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -1,4 +1,76 @@
-from .llm import get_embedding_model, get_llm
-from .vector_store import index_document, search_documents, delete_vector_collection
-from .file_handler import save_upload, delete_upload, format_size
-from .chat import chat_with_rag, chat_simple, generate_chat_title
+"""service layer; submodules load on first use, so importing one (or this package) doesn't pull in the rest"""
+import importlib
+
+_EXPORTS = {
+    "get_embedding_model": "llm",
+    "get_llm": "llm",
+    "get_qdrant_client": "qdrant",
+    "get_async_qdrant_client": "qdrant",
+    "warm_up": "qdrant",
+    "close_qdrant": "qdrant",
+    "index_document": "vector_store",
+    "search_documents": "vector_store",
+    "delete_vector_collection": "vector_store",
+    "delete_document_vectors": "vector_store",
+    "delete_untagged_vectors": "vector_store",
+    "asearch_documents": "vector_store",
+    "adelete_vector_collection": "vector_store",
+    "search_collections": "vector_store",
+    "asearch_collections": "vector_store",
+    "save_upload": "file_handler",
+    "delete_upload": "file_handler",
+    "release_upload": "file_handler",
+    "format_size": "file_handler",
+    "chat_with_rag": "chat",
+    "chat_simple": "chat",
+    "achat_with_rag": "chat",
+    "achat_simple": "chat",
+    "stream_chat": "chat",
+    "count_tokens": "tokens",
+    "load_tokenizer": "tokens",
+    "load_history": "history",
+    "update_summary": "history",
+    "enqueue_document": "ingestion",
+    "ingest_uploads": "ingestion",
+    "start_ingestion": "ingestion",
+    "stop_ingestion": "ingestion",
+    "get_answer_cache": "answer_cache",
+    "invalidate_answers": "answer_cache",
+    "ainvalidate_answers": "answer_cache",
+    "get_singleflight": "singleflight",
+    "coalesce": "singleflight",
+    "GENERIC_CHAT_NAMES": "titles",
+    "generate_titles": "titles",
+    "schedule_title": "titles",
+    "start_titler": "titles",
+    "stop_titler": "titles",
+    "schedule_collection_deletion": "reaper",
+    "wake_reaper": "reaper",
+    "start_reaper": "reaper",
+    "stop_reaper": "reaper",
+}
+__all__ = [*_EXPORTS, "preload"]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def preload():
+    """import every service and the client libraries the settings call for, without connecting anywhere
+
+    For a prefork master: workers forked afterwards share these modules instead of each importing them.
+    """
+    from contextbase.core.config import settings
+    for module in {*_EXPORTS.values(), "embeddings"}:
+        importlib.import_module(f".{module}", __name__)
+    import langchain_qdrant, langchain_text_splitters, qdrant_client  # noqa: F401
+    if "fake" in (settings.EMBEDDING_PROVIDER, settings.LLM_PROVIDER):
+        importlib.import_module(".fakes", __name__)
+    if settings.EMBEDDING_PROVIDER != "fake" or settings.LLM_PROVIDER != "fake":
+        import langchain_openai  # noqa: F401
@@ -0,0 +1,213 @@
+from collections import OrderedDict
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from contextbase.core.config import settings
+from contextbase.core.metrics import ANSWER_CACHE_LOOKUPS
+
+_cache = None
+
+
+def _unit(vector):
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+class MemoryAnswerBackend:
+    """per-process store, least recently used entries evicted first"""
+
+    def __init__(self):
+        self._entries = OrderedDict()  # id -> (collection_id, unit vector, answer, created_at)
+        self._lock = threading.Lock()
+
+    def candidates(self, collection_id, min_created):
+        with self._lock:
+            return [(k, v) for k, (c, v, a, t) in self._entries.items() if c == collection_id and t >= min_created]
+
+    def answer(self, entry_id):
+        with self._lock:
+            entry = self._entries.get(entry_id)
+        return entry[2] if entry else None
+
+    def touch(self, entry_id):
+        with self._lock:
+            if entry_id in self._entries:
+                self._entries.move_to_end(entry_id)
+
+    def add(self, collection_id, vector, answer, max_entries):
+        with self._lock:
+            self._entries[uuid.uuid4().hex] = (collection_id, vector, answer, time.time())
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection_id):
+        with self._lock:
+            for k in [k for k, e in self._entries.items() if e[0] == collection_id]:
+                del self._entries[k]
+
+    def purge(self, min_created):
+        with self._lock:
+            for k in [k for k, e in self._entries.items() if e[3] < min_created]:
+                del self._entries[k]
+
+
+class SqliteAnswerBackend:
+    """local file store, shared by every worker process on the host"""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers (id TEXT PRIMARY KEY, collection_id TEXT NOT NULL, vector BLOB NOT NULL, "
+            "answer TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_answers_collection ON answers (collection_id, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_answers_last_used ON answers (last_used)")
+        self._conn.commit()
+
+    def candidates(self, collection_id, min_created):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, vector FROM answers WHERE collection_id = ? AND created_at >= ?", (collection_id, min_created)
+            ).fetchall()
+        return [(k, np.frombuffer(v, dtype=np.float32)) for k, v in rows]
+
+    def answer(self, entry_id):
+        with self._lock:
+            row = self._conn.execute("SELECT answer FROM answers WHERE id = ?", (entry_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def touch(self, entry_id):
+        with self._lock:
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), entry_id))
+            self._conn.commit()
+
+    def add(self, collection_id, vector, answer, max_entries):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (id, collection_id, vector, answer, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (uuid.uuid4().hex, collection_id, vector.tobytes(), json.dumps(answer), now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if count > max_entries:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used LIMIT ?)", (count - max_entries,)
+                )
+            self._conn.commit()
+
+    def invalidate(self, collection_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE collection_id = ?", (collection_id,))
+            self._conn.commit()
+
+    def purge(self, min_created):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (min_created,))
+            self._conn.commit()
+
+
+class AnswerCache:
+    """RAG answers keyed on (collection, query embedding), matched by cosine similarity"""
+
+    def __init__(self, backend, threshold=0.95, ttl=3600, max_entries=10_000):
+        self.backend = backend
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._last_purge = 0.0
+
+    def _min_created(self):
+        return time.time() - self.ttl if self.ttl else 0
+
+    def lookup(self, collection_id, vector):
+        """returns the cached {"content", "sources"} or None"""
+        query = _unit(vector)
+        best_id, best_score = None, self.threshold
+        for entry_id, vec in self.backend.candidates(collection_id, self._min_created()):
+            if len(vec) != len(query):
+                continue
+            score = float(np.dot(query, vec))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        # only the winner's answer is loaded and decoded; it may have been invalidated meanwhile
+        best_answer = self.backend.answer(best_id) if best_id is not None else None
+        if best_answer is None:
+            self.misses += 1
+            ANSWER_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        self.hits += 1
+        ANSWER_CACHE_LOOKUPS.labels("hit").inc()
+        self.backend.touch(best_id)
+        return best_answer
+
+    def store(self, collection_id, vector, answer):
+        if self.ttl and time.time() - self._last_purge > self.ttl:
+            self.backend.purge(self._min_created())
+            self._last_purge = time.time()
+        self.backend.add(collection_id, _unit(vector), answer, self.max_entries)
+
+    def invalidate(self, collection_id):
+        self.backend.invalidate(collection_id)
+
+    async def _offload(self, fn, *args):
+        # the sqlite backend blocks on its lock and on other workers' writes, so it stays off the event loop
+        return fn(*args) if isinstance(self.backend, MemoryAnswerBackend) else await asyncio.to_thread(fn, *args)
+
+    async def alookup(self, collection_id, vector):
+        return await self._offload(self.lookup, collection_id, vector)
+
+    async def astore(self, collection_id, vector, answer):
+        await self._offload(self.store, collection_id, vector, answer)
+
+    async def ainvalidate(self, collection_id):
+        await self._offload(self.invalidate, collection_id)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+def get_answer_cache():
+    """the configured cache, or None when ANSWER_CACHE_ENABLED is off"""
+    global _cache
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        if settings.ANSWER_CACHE_BACKEND == "sqlite":
+            backend = SqliteAnswerBackend(settings.ANSWER_CACHE_PATH)
+        else:
+            backend = MemoryAnswerBackend()
+        _cache = AnswerCache(
+            backend,
+            threshold=settings.ANSWER_CACHE_THRESHOLD,
+            ttl=settings.ANSWER_CACHE_TTL,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        )
+    return _cache
+
+
+def invalidate_answers(collection_id):
+    cache = get_answer_cache()
+    if cache is not None and collection_id:
+        cache.invalidate(collection_id)
+
+
+async def ainvalidate_answers(collection_id):
+    """invalidate_answers for async callers"""
+    cache = get_answer_cache()
+    if cache is not None and collection_id:
+        await cache.ainvalidate(collection_id)
@@ -1,8 +1,13 @@
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 import json
+import time
 
-from contextbase.services.llm import get_llm
-from contextbase.services.vector_store import search_documents
+from contextbase.core.metrics import LLM_ERRORS, observe_llm
+from contextbase.services.answer_cache import get_answer_cache
+from contextbase.services.context import assemble_context
+from contextbase.services.singleflight import coalesce
+from contextbase.services.llm import ainvoke_llm, get_embedding_model, get_llm, invoke_llm
+from contextbase.services.vector_store import search_collections, asearch_collections
 
 SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided context. 
 Be concise and cite the documents when relevant. If context doesn't help, say so."""
@@ -18,72 +23,148 @@ def _format_context(docs):
     return "\n\n".join(parts)
 
 
-def chat_with_rag(query, collection_id, history=None):
-    """rag chat - gets context from docs"""
-    docs = search_documents(query, collection_id, top_k=4)
-    context = _format_context(docs)
-    
-    messages = [SystemMessage(content=SYSTEM_PROMPT)]
-    
-    if history:
-        for m in history[-10:]:
-            if m.get("role") == "user":
-                messages.append(HumanMessage(content=m.get("content", "")))
-            elif m.get("role") == "assistant":
-                messages.append(AIMessage(content=m.get("content", "")))
-    
-    prompt = f"Context:\n{context}\n\nQuestion: {query}"
-    messages.append(HumanMessage(content=prompt))
+def _history_messages(history):
+    messages = []
+    for m in history or []:
+        if m.get("role") == "summary":
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{m['content']}"))
+        elif m.get("role") == "user":
+            messages.append(HumanMessage(content=m.get("content", "")))
+        elif m.get("role") == "assistant":
+            messages.append(AIMessage(content=m.get("content", "")))
+    return messages
+
+
+def _rag_messages(query, docs, history=None):
+    prompt = f"Context:\n{_format_context(docs)}\n\nQuestion: {query}"
+    return [SystemMessage(content=SYSTEM_PROMPT), *_history_messages(history), HumanMessage(content=prompt)]
+
+
+def _simple_messages(query, history=None):
+    return [SystemMessage(content="You are a helpful assistant. Be concise."), *_history_messages(history), HumanMessage(content=query)]
+
+
+def _as_list(collection_ids):
+    return [collection_ids] if isinstance(collection_ids, str) else list(collection_ids or [])
+
+
+def chat_with_rag(query, collection_ids, history=None):
+    """rag chat - gets context from docs in one or more collections"""
+    docs = assemble_context(search_collections(query, _as_list(collection_ids)))
+    messages = _rag_messages(query, docs, history)
     
     try:
-        resp = get_llm().invoke(messages)
+        resp = invoke_llm("rag", messages)
         sources = [doc.metadata for doc in docs] if docs else []
         return {"content": resp.content, "sources": json.dumps(sources)}
     except Exception as e:
         return {"content": f"Error: {e}", "sources": "[]"}
 
 
-def generate_chat_title(user_message: str, ai_response: str) -> str:
-    """Generate a concise title for a chat based on the first Q&A exchange"""
-    prompt = f"""Based on this conversation, generate a very short, concise title (3-6 words max).
-The title should capture the main topic or question being discussed.
-Do NOT include quotes, periods, or any punctuation at the end.
-Just return the title text, nothing else.
-
-User: {user_message[:500]}
-Assistant: {ai_response[:500]}
-
-Title:"""
+def chat_simple(query, history=None):
+    """simple chat without rag"""
+    messages = _simple_messages(query, history)
     
     try:
-        messages = [HumanMessage(content=prompt)]
-        resp = get_llm().invoke(messages)
-        title = resp.content.strip().strip('"\'').strip('.')
-        # Limit length and clean up
-        if len(title) > 50:
-            title = title[:47] + "..."
-        return title if title else "New Chat"
-    except Exception:
-        # Fallback: use first few words of user message
-        words = user_message.split()[:5]
-        return " ".join(words)[:50] if words else "New Chat"
+        resp = invoke_llm("simple", messages)
+        return {"content": resp.content, "sources": "[]"}
+    except Exception as e:
+        return {"content": f"Error: {e}", "sources": "[]"}
 
 
-def chat_simple(query, history=None):
-    """simple chat without rag"""
-    messages = [SystemMessage(content="You are a helpful assistant. Be concise.")]
-    
-    if history:
-        for m in history[-10:]:
-            if m.get("role") == "user":
-                messages.append(HumanMessage(content=m.get("content", "")))
-            elif m.get("role") == "assistant":
-                messages.append(AIMessage(content=m.get("content", "")))
+async def _answer_cache_key(query, collection_ids, history):
+    """query vector for the answer cache, None when caching doesn't apply"""
+    # later turns depend on the conversation so far; entries are invalidated per collection, so only single-collection chats are cached
+    if get_answer_cache() is None or history or len(collection_ids) != 1:
+        return None
+    return await get_embedding_model().aembed_query(query)
+
+
+def _flight_key(query, collection_ids, history):
+    """identical first questions to the same collections, asked concurrently, share one retrieval and LLM call"""
+    if history or not collection_ids:
+        return None
+    return json.dumps([sorted(collection_ids), " ".join(query.casefold().split())])
+
+
+async def achat_with_rag(query, collection_ids, history=None):
+    """async chat_with_rag"""
+    collection_ids = _as_list(collection_ids)
+    cache_vector = await _answer_cache_key(query, collection_ids, history)
+    if cache_vector is not None:
+        cached = await get_answer_cache().alookup(collection_ids[0], cache_vector)
+        if cached:
+            return cached
     
-    messages.append(HumanMessage(content=query))
+    async with coalesce(_flight_key(query, collection_ids, history)) as flight:
+        if flight.result is not None:
+            return flight.result
+        docs = assemble_context(await asearch_collections(query, collection_ids))
+        messages = _rag_messages(query, docs, history)
+        
+        try:
+            resp = await ainvoke_llm("rag", messages)
+            sources = [doc.metadata for doc in docs] if docs else []
+            result = {"content": resp.content, "sources": json.dumps(sources)}
+        except Exception as e:
+            # not published: callers waiting on this one retry on their own
+            return {"content": f"Error: {e}", "sources": "[]"}
+        flight.publish(result)
     
+    if cache_vector is not None:
+        await get_answer_cache().astore(collection_ids[0], cache_vector, result)
+    return result
+
+
+async def achat_simple(query, history=None):
+    """async chat_simple"""
     try:
-        resp = get_llm().invoke(messages)
+        resp = await ainvoke_llm("simple", _simple_messages(query, history))
         return {"content": resp.content, "sources": "[]"}
     except Exception as e:
         return {"content": f"Error: {e}", "sources": "[]"}
+
+
+async def stream_chat(query, collection_ids=None, history=None):
+    """streaming chat, yields ("sources", json) once and then ("token", text) pieces"""
+    collection_ids = _as_list(collection_ids)
+    cache_vector = None
+    if collection_ids:
+        cache_vector = await _answer_cache_key(query, collection_ids, history)
+        if cache_vector is not None:
+            cached = await get_answer_cache().alookup(collection_ids[0], cache_vector)
+            if cached:
+                yield "sources", cached["sources"]
+                yield "token", cached["content"]
+                return
+    
+    async with coalesce(_flight_key(query, collection_ids, history)) as flight:
+        if flight.result is not None:
+            yield "sources", flight.result["sources"]
+            yield "token", flight.result["content"]
+            return
+        docs = assemble_context(await asearch_collections(query, collection_ids)) if collection_ids else []
+        messages = _rag_messages(query, docs, history) if collection_ids else _simple_messages(query, history)
+        
+        sources = json.dumps([doc.metadata for doc in docs] if docs else [])
+        yield "sources", sources
+        
+        operation = "rag" if collection_ids else "simple"
+        parts, usage = [], None
+        start = time.perf_counter()
+        try:
+            async for chunk in get_llm().astream(messages):
+                usage = chunk.usage_metadata or usage
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield "token", chunk.content
+        except Exception as e:
+            LLM_ERRORS.labels(operation).inc()
+            yield "token", f"Error: {e}"
+            return
+        observe_llm(operation, time.perf_counter() - start, usage)
+        result = {"content": "".join(parts), "sources": sources}
+        flight.publish(result)
+    
+    if cache_vector is not None:
+        await get_answer_cache().astore(collection_ids[0], cache_vector, result)
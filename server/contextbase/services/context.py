@@ -0,0 +1,127 @@
+from langchain_core.documents import Document
+import re
+
+from contextbase.core.config import settings
+from contextbase.core.metrics import CONTEXT_TOKENS, CONTEXT_TOKENS_SAVED
+from contextbase.services.tokens import count_tokens, truncate_tokens
+
+_MIN_OVERLAP = 32  # characters two chunks without offsets must share before they're joined
+_MAX_GAP = 2  # the splitter strips the separator between neighbouring chunks
+_MIN_TAIL_TOKENS = 50  # a truncated chunk shorter than this isn't worth its citation
+
+
+def _source(doc, rank):
+    """what a chunk was cut from; chunks without a known document stand alone"""
+    m = doc.metadata
+    source = m.get("document_id") or m.get("source")
+    return (m.get("_collection_name"), source) if source else ("rank", rank)
+
+
+def _position(doc):
+    m = doc.metadata
+    return (m.get("page") or 0, m.get("start_index") if m.get("start_index") is not None else m.get("chunk") or 0)
+
+
+def _join(a, b):
+    """a's text followed by the part of b it doesn't already contain, None when they aren't neighbours; b starts at or after a"""
+    sa, sb = a.metadata.get("start_index"), b.metadata.get("start_index")
+    if sa is not None and sb is not None:
+        end = sa + len(a.page_content)
+        if sb > end + _MAX_GAP:
+            return None
+        if sb > end:
+            return f"{a.page_content}\n{b.page_content}"
+        return a.page_content + b.page_content[end - sb:]
+    # chunks indexed before offsets were stored: find where b's opening sits in a
+    head = b.page_content[:_MIN_OVERLAP]
+    at = a.page_content.find(head) if len(head) == _MIN_OVERLAP else -1
+    while at >= 0:
+        tail = a.page_content[at:]
+        if b.page_content.startswith(tail):
+            return a.page_content + b.page_content[len(tail):]
+        if tail.startswith(b.page_content):
+            return a.page_content
+        at = a.page_content.find(head, at + 1)
+    return None
+
+
+def _merge_overlapping(docs):
+    """chunks of the same document page joined where they overlap, as (rank, document) with the rank of the best part"""
+    groups = {}
+    for rank, doc in enumerate(docs):
+        groups.setdefault((*_source(doc, rank), doc.metadata.get("page")), []).append((rank, doc))
+
+    merged = []
+    for parts in groups.values():
+        parts.sort(key=lambda p: _position(p[1]))
+        rank, current = parts[0]
+        for r, doc in parts[1:]:
+            text = _join(current, doc)
+            if text is None:
+                merged.append((rank, current))
+                rank, current = r, doc
+                continue
+            score = max(current.metadata.get("_score", 0.0), doc.metadata.get("_score", 0.0))
+            current = Document(page_content=text, metadata={**current.metadata, "_score": score})
+            rank = min(rank, r)
+        merged.append((rank, current))
+    return merged
+
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.casefold())
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def _drop_near_duplicates(ranked, threshold):
+    """best-ranked first; a piece goes when most of its word trigrams are already in a kept one"""
+    kept = []
+    for rank, doc in ranked:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) >= threshold * len(shingles) for _, _, other in kept):
+            continue
+        kept.append((rank, doc, shingles))
+    return [(rank, doc) for rank, doc, _ in kept]
+
+
+def _pack(ranked, budget):
+    """best-ranked pieces that fit in `budget` tokens, the first one that doesn't cut short if enough room is left"""
+    packed, used = [], 0
+    for rank, doc in ranked:
+        tokens = count_tokens(doc.page_content)
+        if budget and used + tokens > budget:
+            room = budget - used
+            if room < _MIN_TAIL_TOKENS:
+                continue
+            doc = Document(page_content=truncate_tokens(doc.page_content, room), metadata=doc.metadata)
+            tokens = count_tokens(doc.page_content)
+        packed.append((rank, doc))
+        used += tokens
+    return packed, used
+
+
+def assemble_context(docs, budget=None, threshold=None):
+    """retrieved chunks, best first, turned into prompt context
+
+    Overlapping chunks of one document page are joined using their stored offsets, near-duplicates
+    dropped and the rest packed into CONTEXT_TOKEN_BUDGET. Each document's pieces come out in reading
+    order, documents ordered by their best hit.
+    """
+    if not docs:
+        return []
+    budget = settings.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    threshold = settings.CONTEXT_DEDUP_THRESHOLD if threshold is None else threshold
+
+    ranked = sorted(_merge_overlapping(docs), key=lambda p: p[0])
+    if threshold < 1:
+        ranked = _drop_near_duplicates(ranked, threshold)
+    packed, used = _pack(ranked, budget)
+
+    first_hit = {}
+    for rank, doc in packed:
+        first_hit.setdefault(_source(doc, rank), rank)
+    packed.sort(key=lambda p: (first_hit[_source(p[1], p[0])], _position(p[1])))
+
+    CONTEXT_TOKENS.observe(used)
+    CONTEXT_TOKENS_SAVED.observe(max(0, sum(count_tokens(d.page_content) for d in docs) - used))
+    return [doc for _, doc in packed]
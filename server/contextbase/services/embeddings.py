@@ -0,0 +1,208 @@
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from contextbase.core.metrics import EMBEDDING_LATENCY, EMBEDDINGS
+
+
+class EmbeddingCache:
+    """sqlite-backed vector cache keyed by hash(model, text), evicts least recently used
+
+    Reads don't write: hits are remembered and their recency is flushed in batches. The row count is
+    tracked from this process's inserts and only recounted once those add up to a slice of max_entries,
+    which also catches up on rows other workers added.
+    """
+
+    TOUCH_BATCH = 1000  # recency updates held back before they're written
+    TOUCH_INTERVAL = 60.0  # or seconds since the last flush
+
+    def __init__(self, path, max_entries=500_000):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._inserted = 0  # since the last recount
+        self._touched = {}
+        self._flushed_at = time.monotonic()
+
+    @staticmethod
+    def key(model, text):
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        if not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                for k, blob in self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part):
+                    found[k] = array("f", blob).tolist()
+                    self._touched[k] = now
+            if len(self._touched) >= self.TOUCH_BATCH or time.monotonic() - self._flushed_at > self.TOUCH_INTERVAL:
+                self._flush_touched()
+                self._conn.commit()
+        return found
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+        self._flushed_at = time.monotonic()
+
+    def put_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._flush_touched()  # before eviction reads last_used
+            before = self._conn.total_changes
+            # a key already present holds the same vector
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, array("f", v).tobytes(), now) for k, v in items.items()],
+            )
+            added = self._conn.total_changes - before
+            self._count += added
+            self._inserted += added
+            if self._inserted > self.max_entries // 20:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self._inserted = 0
+            if self._count > self.max_entries:
+                # trim to 90% so we don't evict on every insert
+                excess = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self._inserted = 0
+            self._conn.commit()
+
+
+def _is_rate_limit(err):
+    status = getattr(err, "status_code", None) or getattr(getattr(err, "response", None), "status_code", None)
+    return status == 429 or type(err).__name__ in ("RateLimitError", "APITimeoutError", "APIConnectionError")
+
+
+def _retry_after(err):
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CachedEmbeddings(Embeddings):
+    """wraps an embedding backend with batching, concurrent requests, backoff and a cache"""
+
+    def __init__(self, backend, model_name, cache=None, batch_size=256, concurrency=4, max_retries=6):
+        self.backend = backend
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backend_calls = 0
+
+    def _embed_batch(self, texts):
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.backend_calls += 1
+                with EMBEDDING_LATENCY.time():
+                    return self.backend.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not _is_rate_limit(e):
+                    raise
+                time.sleep(_retry_after(e) or delay * (1 + random.random()))
+                delay = min(delay * 2, 60)
+
+    async def _aembed_batch(self, texts):
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.backend_calls += 1
+                with EMBEDDING_LATENCY.time():
+                    return await self.backend.aembed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not _is_rate_limit(e):
+                    raise
+                await asyncio.sleep(_retry_after(e) or delay * (1 + random.random()))
+                delay = min(delay * 2, 60)
+
+    def _lookup(self, texts):
+        """returns (keys, cached vectors, uncached batches)"""
+        keys = [EmbeddingCache.key(self.model_name, t) for t in texts]
+        vectors = self.cache.get_many(list(set(keys))) if self.cache else {}
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in vectors:
+                missing.setdefault(k, t)
+        pending = list(missing.items())
+        EMBEDDINGS.labels("cache").inc(len(texts) - len(pending))
+        EMBEDDINGS.labels("backend").inc(len(pending))
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        return keys, vectors, batches
+
+    def _store(self, vectors, batches, results):
+        fresh = {}
+        for batch, vecs in zip(batches, results):
+            for (k, _), v in zip(batch, vecs):
+                fresh[k] = v
+        if self.cache:
+            self.cache.put_many(fresh)
+        vectors.update(fresh)
+
+    def embed_documents(self, texts):
+        keys, vectors, batches = self._lookup(texts)
+        if batches:
+            if len(batches) == 1:
+                results = [self._embed_batch([t for _, t in batches[0]])]
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                    results = list(pool.map(lambda b: self._embed_batch([t for _, t in b]), batches))
+            self._store(vectors, batches, results)
+        return [vectors[k] for k in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def _offload(self, fn, *args):
+        # the sqlite cache blocks on its lock and on other writers, so it stays off the event loop
+        return await asyncio.to_thread(fn, *args) if self.cache else fn(*args)
+
+    async def aembed_documents(self, texts):
+        keys, vectors, batches = await self._offload(self._lookup, texts)
+        if batches:
+            sem = asyncio.Semaphore(self.concurrency)
+
+            async def run(batch):
+                async with sem:
+                    return await self._aembed_batch([t for _, t in batch])
+
+            results = await asyncio.gather(*(run(b) for b in batches))
+            await self._offload(self._store, vectors, batches, results)
+        return [vectors[k] for k in keys]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
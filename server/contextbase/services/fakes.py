@@ -0,0 +1,78 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+import asyncio
+import time
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """offline embeddings: the same vector for the same text, after `latency` per call like an API round trip"""
+
+    latency: float = 0.0
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """offline chat model: fixed answer, `latency` before the first token, then `tokens_per_sec`"""
+
+    response: str
+    latency: float = 0.0
+    tokens_per_sec: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "contextbase-fake"
+
+    def _tokens(self):
+        words = self.response.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _token_delay(self):
+        return 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0
+
+    def _usage(self, messages):
+        # word counts stand in for tokens so the token metrics move in benchmarks
+        prompt = sum(len(str(m.content).split()) for m in messages)
+        completion = len(self._tokens())
+        return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+    def _message(self, messages):
+        return AIMessage(content=self.response, usage_metadata=self._usage(messages))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency + self._token_delay() * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency + self._token_delay() * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for token in self._tokens():
+            time.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages)))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for token in self._tokens():
+            await asyncio.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages)))
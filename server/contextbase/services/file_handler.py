@@ -1,23 +1,55 @@
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select, func
+import asyncio
+import hashlib
 import os
-import uuid
+import tempfile
+import time
 
 from contextbase.core.config import settings
+from contextbase.core.database import utcnow
+from contextbase.services.loaders import LOADERS
 
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+CHUNK_SIZE = 1024 * 1024
+REUSE_GRACE = 300  # seconds a stored file is kept after being written, while the upload that wrote it commits its Document
 
 
-def save_upload(file: UploadFile):
-    """save file, returns (path, original_name, size)"""
+async def save_upload(file: UploadFile):
+    """stream file to disk under its sha256, returns (path, original_name, size, sha256)"""
     original = file.filename or "unknown"
-    ext = os.path.splitext(original)[1] or ".pdf"
-    path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{ext}")
+    ext = os.path.splitext(original)[1].lower() or ".pdf"
+    if ext not in LOADERS:
+        raise HTTPException(status_code=415, detail=f"{original}: unsupported file type, expected one of {', '.join(sorted(LOADERS))}")
     
-    content = file.file.read()
-    with open(path, "wb") as f:
-        f.write(content)
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=settings.UPLOAD_DIR, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+
+            def write(chunk):
+                digest.update(chunk)
+                out.write(chunk)
+
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail=f"{original} exceeds the {format_size(settings.MAX_UPLOAD_SIZE)} upload limit")
+                # hashing and writing a chunk would otherwise hold up every request on this worker
+                await asyncio.to_thread(write, chunk)
+        
+        sha256 = digest.hexdigest()
+        path = os.path.join(settings.UPLOAD_DIR, f"{sha256}{ext}")
+        # also when identical bytes are already stored: the swap is atomic, and the fresh mtime keeps
+        # release_upload and the reaper off the file until this upload's Document is committed
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
     
-    return path, original, len(content)
+    return path, original, size, sha256
 
 
 def delete_upload(path):
@@ -30,6 +62,27 @@ def delete_upload(path):
     return False
 
 
+def recently_written(path):
+    try:
+        return time.time() - os.stat(path).st_mtime < REUSE_GRACE
+    except OSError:
+        return False
+
+
+async def release_upload(db, path):
+    """delete the stored file once no Document references it anymore; one saved again in the last
+    REUSE_GRACE seconds is queued for the reaper instead, as its new Document may not be committed yet"""
+    from contextbase.models import Document, OrphanBlob
+    
+    refs = await db.scalar(select(func.count()).select_from(Document).where(Document.file_path == path))
+    if refs:
+        return False
+    if recently_written(path):
+        await db.merge(OrphanBlob(path=path, created_at=utcnow()))
+        return False
+    return delete_upload(path)
+
+
 def format_size(bytes):
     if bytes < 1024:
         return f"{bytes} B"
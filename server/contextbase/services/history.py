@@ -0,0 +1,92 @@
+from langchain_core.messages import HumanMessage
+from sqlalchemy import select, update
+
+from contextbase.core.config import settings
+from contextbase.core.database import AsyncSessionLocal
+from contextbase.models import Chat, Message
+from contextbase.services.llm import ainvoke_llm
+from contextbase.services.tokens import count_tokens
+
+
+def trim_to_budget(history, budget):
+    """newest turns that fit in `budget` tokens, oldest first"""
+    kept, used = [], 0
+    for m in reversed(history):
+        used += count_tokens(m["content"]) + 4  # role and separators
+        if used > budget:
+            break
+        kept.append(m)
+    return kept[::-1]
+
+
+async def load_history(db, chat, before=None):
+    """prompt history for the next turn: the chat summary, then the last HISTORY_MAX_MESSAGES trimmed to HISTORY_TOKEN_BUDGET
+
+    `before` is the message being answered, left out since the prompt adds the question itself.
+    Returns (history, is_first_message).
+    """
+    stmt = select(Message.id, Message.role, Message.content).where(Message.chat_id == chat.id)
+    stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(settings.HISTORY_MAX_MESSAGES + 1)
+    rows = (await db.execute(stmt)).all()
+    # end the read transaction so the pooled connection isn't held while the LLM runs
+    await db.commit()
+
+    turns = [{"role": r.role, "content": r.content} for r in reversed(rows) if before is None or r.id != before.id]
+    is_first = not turns
+    turns = trim_to_budget(turns[-settings.HISTORY_MAX_MESSAGES:], settings.HISTORY_TOKEN_BUDGET)
+    if settings.HISTORY_SUMMARY_ENABLED and chat.summary:
+        turns.insert(0, {"role": "summary", "content": chat.summary})
+    return turns, is_first
+
+
+def _summary_prompt(summary, turns):
+    lines = "\n".join(f"{m.role.capitalize()}: {m.content[:2000]}" for m in turns)
+    return f"""Update the running summary of a conversation with the new turns below.
+Keep names, facts, decisions and open questions; drop pleasantries. At most {settings.HISTORY_SUMMARY_TOKENS} tokens.
+Return only the summary.
+
+Current summary:
+{summary or "(empty)"}
+
+New turns:
+{lines}
+
+Updated summary:"""
+
+
+async def update_summary(chat_id):
+    """fold messages that slid out of the history window into Chat.summary; runs after the reply is sent"""
+    async with AsyncSessionLocal() as db:
+        chat = await db.get(Chat, chat_id)
+        if chat is None:
+            return
+        window = (await db.execute(
+            select(Message.created_at).where(Message.chat_id == chat_id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .offset(settings.HISTORY_MAX_MESSAGES).limit(1)
+        )).scalar()
+        if window is None:
+            return  # everything still fits in the window
+        stmt = select(Message).where(Message.chat_id == chat_id, Message.created_at <= window)
+        if chat.summary_until is not None:
+            stmt = stmt.where(Message.created_at > chat.summary_until)
+        # bounded per turn so a long chat that just enabled summaries catches up gradually
+        turns = (await db.scalars(stmt.order_by(Message.created_at, Message.id).limit(settings.HISTORY_SUMMARY_BATCH))).all()
+        summary, until = chat.summary, chat.summary_until
+        await db.commit()
+        if not turns:
+            return
+
+        try:
+            resp = await ainvoke_llm("summary", [HumanMessage(content=_summary_prompt(summary, turns))])
+        except Exception as e:
+            print(f"summary update failed: {e}")
+            return
+
+        # only apply if no other turn moved the summary meanwhile
+        unchanged = Chat.summary_until.is_(None) if until is None else Chat.summary_until == until
+        await db.execute(
+            update(Chat).where(Chat.id == chat_id, unchanged)
+            .values(summary=resp.content.strip(), summary_until=turns[-1].created_at)
+        )
+        await db.commit()
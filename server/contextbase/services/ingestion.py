@@ -0,0 +1,221 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from sqlalchemy import and_, or_, select
+import asyncio
+import os
+import socket
+import uuid
+
+from contextbase.core.config import settings
+from contextbase.core.database import SessionLocal, utcnow
+from contextbase.models import Document
+from contextbase.services.vector_store import delete_document_vectors, index_document
+from contextbase.services.loaders import shutdown_parse_pool
+from contextbase.services.answer_cache import ainvalidate_answers
+from contextbase.services.file_handler import save_upload, release_upload, format_size
+
+_queue = None
+_executor = None
+_workers = []
+_recovery = None
+_owner = None  # this process's name on the documents it claims
+_queued = set()
+
+
+def _claim(doc_id):
+    """take a document for this worker; False when it isn't waiting or another worker's claim is still live"""
+    now = utcnow()
+    expired = or_(Document.claimed_at.is_(None), Document.claimed_at < now - timedelta(seconds=settings.INGEST_LEASE))
+    db = SessionLocal()
+    try:
+        claimed = db.query(Document).filter(
+            Document.id == doc_id, or_(Document.status == "pending", and_(Document.status == "processing", expired))
+        ).update({"status": "processing", "progress": 10, "claimed_by": _owner, "claimed_at": now}, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+    finally:
+        db.close()
+
+
+def _renew(doc_id):
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(Document.id == doc_id, Document.claimed_by == _owner).update(
+            {"claimed_at": utcnow()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _set_status(doc_id, status, progress, error=None, **values):
+    """finish a claimed document; False (and nothing written) once the claim was lost, e.g. to a replace or delete"""
+    db = SessionLocal()
+    try:
+        updated = db.query(Document).filter(Document.id == doc_id, Document.claimed_by == _owner).update(
+            {"status": status, "progress": progress, "error": error, "claimed_by": None, "claimed_at": None, **values},
+            synchronize_session=False,
+        )
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+
+def _drop_late_vectors(doc_id, collection_id):
+    """chunks written after the claim was lost: all of them once the document is gone, otherwise those of
+    any version other than the one it has now"""
+    db = SessionLocal()
+    try:
+        current = db.query(Document.content_hash).filter(Document.id == doc_id).first()
+    finally:
+        db.close()
+    delete_document_vectors(collection_id, doc_id, exclude_hash=current.content_hash if current else None)
+
+
+def _job(doc):
+    return doc.id, doc.file_path, doc.collection_id, doc.content_hash, doc.indexed_hash
+
+
+def _pending_jobs():
+    """docs waiting to be indexed, or claimed by a worker that stopped renewing its claim"""
+    expired = utcnow() - timedelta(seconds=settings.INGEST_LEASE)
+    db = SessionLocal()
+    try:
+        rows = db.query(Document).filter(or_(
+            Document.status == "pending",
+            and_(Document.status == "processing", or_(Document.claimed_at.is_(None), Document.claimed_at < expired)),
+        )).order_by(Document.created_at).all()
+        return [_job(d) for d in rows]
+    finally:
+        db.close()
+
+
+async def _indexed(doc_id, future):
+    """the indexing result, renewing the claim meanwhile so other workers leave the document alone"""
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=settings.INGEST_LEASE / 3)
+        if done:
+            return future.result()
+        await asyncio.to_thread(_renew, doc_id)
+
+
+async def _worker():
+    loop = asyncio.get_running_loop()
+    while True:
+        doc_id, path, collection_id, content_hash, indexed_hash = await _queue.get()
+        _queued.discard(doc_id)
+        try:
+            # every worker process recovers the same rows; only the one that claims a document indexes it
+            if not await asyncio.to_thread(_claim, doc_id):
+                continue
+            ok = await _indexed(doc_id, loop.run_in_executor(_executor, partial(index_document, path, collection_id, doc_id, indexed_hash=indexed_hash)))
+            if ok:
+                # the file is stored under its sha256, so content_hash is what was just indexed
+                kept = await asyncio.to_thread(_set_status, doc_id, "ready", 100, indexed_hash=content_hash)
+            else:
+                kept = await asyncio.to_thread(_set_status, doc_id, "failed", 100, "No content could be indexed")
+            if not kept:
+                # deleted or replaced mid-index: its delete already ran, so these chunks would stay in qdrant for good
+                await asyncio.to_thread(_drop_late_vectors, doc_id, collection_id)
+            if ok or not kept:
+                # cached answers were produced without this document, or may have used the dropped chunks
+                await ainvalidate_answers(collection_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            try:
+                await asyncio.to_thread(_set_status, doc_id, "failed", 100, str(e))
+            except Exception:
+                pass
+        finally:
+            _queue.task_done()
+
+
+async def _recover():
+    """queue documents left behind by other runs or workers, at startup and then once per lease"""
+    while True:
+        try:
+            for job in await asyncio.to_thread(_pending_jobs):
+                if job[0] not in _queued:
+                    _queued.add(job[0])
+                    _queue.put_nowait(job)
+        except Exception as e:
+            print(f"ingestion recovery error: {e}")
+        await asyncio.sleep(settings.INGEST_LEASE)
+
+
+def enqueue_document(doc):
+    """queue a saved Document for indexing, returns immediately"""
+    if _queue is None:
+        raise RuntimeError("ingestion pipeline is not running")
+    _queued.add(doc.id)
+    _queue.put_nowait(_job(doc))
+
+
+async def ingest_uploads(db, collection_id, files, pending=()):
+    """save uploads and queue them for indexing; a file already in the collection is returned as-is.
+    New documents go in with one bulk insert alongside `pending` (rows they depend on, like a new
+    collection), and no connection is held while files are written"""
+    if db.in_transaction():
+        await db.commit()  # hand the caller's connection back to the pool for the duration of the writes
+    saved = []
+    try:
+        for f in files:
+            saved.append(await save_upload(f))
+    except Exception:
+        # a later file was rejected (413/415); no Document will point at the ones already written
+        for path, *_ in saved:
+            await release_upload(db, path)
+        await db.commit()
+        raise
+
+    existing = {}
+    if saved:
+        existing = {d.content_hash: d for d in await db.scalars(
+            select(Document).where(Document.collection_id == collection_id, Document.content_hash.in_({s[3] for s in saved}))
+        )}
+    docs, new = [], []
+    for path, name, size, sha256 in saved:
+        doc = existing.get(sha256)
+        if doc is None:
+            # every column set client-side, so the insert is one executemany and nothing needs a refresh
+            doc = existing[sha256] = Document(
+                id=str(uuid.uuid4()), collection_id=collection_id, file_path=path, filename=name, file_size=format_size(size),
+                content_hash=sha256, indexed_hash=None, status="pending", progress=0, claimed_by=None, claimed_at=None,
+                created_at=utcnow(),
+            )
+            new.append(doc)
+        docs.append(doc)
+    db.add_all([*pending, *new])
+    await db.commit()
+    for doc in new:
+        enqueue_document(doc)
+    return docs
+
+
+async def start_ingestion():
+    global _queue, _executor, _workers, _recovery, _owner
+    if _queue is not None:
+        return
+    _owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[-64:]
+    workers = max(1, settings.INGEST_WORKERS)
+    # threads only drive embedding and qdrant writes; parsing runs in the loaders' process pool
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+    _queue = asyncio.Queue()
+    _workers = [asyncio.create_task(_worker()) for _ in range(workers)]
+    _recovery = asyncio.create_task(_recover())
+
+
+async def stop_ingestion():
+    global _queue, _executor, _workers, _recovery
+    tasks = [*_workers, *([_recovery] if _recovery else [])]
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if _executor:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    shutdown_parse_pool()
+    _queue, _executor, _workers, _recovery = None, None, [], None
+    _queued.clear()
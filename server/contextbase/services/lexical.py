@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from langchain_core.documents import Document
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from contextbase.core.config import settings
+
+_indexes = OrderedDict()  # least recently used first, at most LEXICAL_INDEX_MAX_OPEN open
+_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    point_id TEXT NOT NULL UNIQUE,
+    document_id TEXT,
+    content_hash TEXT,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_chunks_document ON chunks (document_id, content_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(content, content='chunks', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts (rowid, content) VALUES (new.rowid, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+END;
+"""
+
+
+def match_query(text, max_terms=32):
+    """FTS5 query that ORs the query's terms; "ERR-4021" becomes the phrase "ERR 4021" so codes match as a unit"""
+    terms = []
+    for part in text.split():
+        words = re.findall(r"\w+", part)
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+    return " OR ".join(dict.fromkeys(terms[:max_terms]))
+
+
+class LexicalIndex:
+    """BM25 over one collection's chunks in an on-disk sqlite FTS5 table, read through mmap rather than held in memory"""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._closed = False
+        with self._lock:
+            conn = self._connection()
+            conn.executescript(_SCHEMA)
+            conn.commit()
+
+    def _connection(self):
+        """the open connection, reopened if the index was evicted while a caller still held it; call under _lock"""
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"{self.path} was dropped")
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"PRAGMA mmap_size={256 * 1024 * 1024}")
+        return self._conn
+
+    def add(self, ids, docs):
+        rows = [
+            (i, d.metadata.get("document_id"), d.metadata.get("content_hash"), d.page_content, json.dumps(d.metadata))
+            for i, d in zip(ids, docs)
+        ]
+        with self._lock:
+            conn = self._connection()
+            # delete first: the fts delete trigger doesn't fire for INSERT OR REPLACE
+            conn.executemany("DELETE FROM chunks WHERE point_id = ?", [(r[0],) for r in rows])
+            conn.executemany(
+                "INSERT INTO chunks (point_id, document_id, content_hash, content, metadata) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            conn.commit()
+
+    def has_document(self, document_id, content_hash):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT 1 FROM chunks WHERE document_id = ? AND content_hash = ? LIMIT 1", (document_id, content_hash)
+            ).fetchone()
+        return row is not None
+
+    def delete_document(self, document_id, exclude_hash=None):
+        with self._lock:
+            conn = self._connection()
+            if exclude_hash:
+                conn.execute("DELETE FROM chunks WHERE document_id = ? AND content_hash IS NOT ?", (document_id, exclude_hash))
+            else:
+                conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            conn.commit()
+
+    def delete_untagged(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM chunks WHERE document_id IS NULL")
+            conn.commit()
+
+    def search(self, query, limit):
+        """best BM25 matches first, as (point_id, Document)"""
+        match = match_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT c.point_id, c.content, c.metadata FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        return [(pid, Document(page_content=content, metadata=json.loads(meta))) for pid, content, meta in rows]
+
+    def release(self):
+        """close the file handles; the next call opens them again"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def close(self):
+        self.release()
+        self._closed = True
+
+
+def _path(collection_name):
+    return os.path.join(settings.LEXICAL_INDEX_DIR, re.sub(r"[^\w.-]", "_", collection_name) + ".sqlite3")
+
+
+def get_lexical_index(collection_name, create=True):
+    """the collection's index, None when hybrid search is off or (with create=False) nothing was indexed yet"""
+    if not settings.RAG_HYBRID_ENABLED:
+        return None
+    evicted = []
+    with _lock:
+        index = _indexes.get(collection_name)
+        if index is not None:
+            _indexes.move_to_end(collection_name)
+            return index
+        if not create and not os.path.exists(_path(collection_name)):
+            return None
+        index = _indexes[collection_name] = LexicalIndex(_path(collection_name))
+        # with many collections an open connection each (plus its -wal/-shm) would run out of file descriptors
+        while len(_indexes) > max(1, settings.LEXICAL_INDEX_MAX_OPEN):
+            evicted.append(_indexes.popitem(last=False)[1])
+    for old in evicted:
+        old.release()
+    return index
+
+
+def drop_lexical_index(collection_name):
+    with _lock:
+        index = _indexes.pop(collection_name, None)
+    if index is not None:
+        index.close()
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(_path(collection_name) + suffix)
+        except FileNotFoundError:
+            pass
@@ -1,19 +1,94 @@
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+import time
+
 from contextbase.core.config import settings
+from contextbase.core.metrics import LLM_ERRORS, observe_llm
 
 _embedding = None
 _llm = None
+_title_llm = None
+
+
+def _embedding_backend():
+    if settings.EMBEDDING_PROVIDER == "fake":
+        from contextbase.services.fakes import FakeEmbeddings
+        return FakeEmbeddings(size=settings.EMBEDDING_DIMENSIONS or settings.FAKE_EMBEDDING_SIZE, latency=settings.FAKE_EMBEDDING_LATENCY)
+    from langchain_openai import OpenAIEmbeddings  # heavy; only loaded when configured
+    # retries are handled by CachedEmbeddings so rate limits back off across batches
+    return OpenAIEmbeddings(
+        model=settings.EMBEDDING_MODEL, dimensions=settings.EMBEDDING_DIMENSIONS or None, openai_api_key=settings.OPENAI_API_KEY, max_retries=0
+    )
+
+
+def embedding_model_name():
+    """cache key for the configured model; shortened vectors are cached separately"""
+    name = f"{settings.EMBEDDING_PROVIDER}:{settings.EMBEDDING_MODEL}"
+    return f"{name}@{settings.EMBEDDING_DIMENSIONS}" if settings.EMBEDDING_DIMENSIONS else name
 
 
 def get_embedding_model():
     global _embedding
     if not _embedding:
-        _embedding = OpenAIEmbeddings(model="text-embedding-3-large", openai_api_key=settings.OPENAI_API_KEY)
+        # langchain's Embeddings base class pulls in its runnables and langsmith
+        from contextbase.services.embeddings import CachedEmbeddings, EmbeddingCache
+        cache = None
+        if settings.EMBEDDING_CACHE_PATH:
+            cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        _embedding = CachedEmbeddings(
+            _embedding_backend(),
+            model_name=embedding_model_name(),
+            cache=cache,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            concurrency=settings.EMBEDDING_CONCURRENCY,
+            max_retries=settings.EMBEDDING_MAX_RETRIES,
+        )
     return _embedding
 
 
 def get_llm():
     global _llm
     if not _llm:
-        _llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, openai_api_key=settings.OPENAI_API_KEY)
+        if settings.LLM_PROVIDER == "fake":
+            from contextbase.services.fakes import FakeChatModel
+            _llm = FakeChatModel(
+                response=settings.FAKE_LLM_RESPONSE,
+                latency=settings.FAKE_LLM_LATENCY,
+                tokens_per_sec=settings.FAKE_LLM_TOKENS_PER_SEC,
+            )
+        else:
+            from langchain_openai import ChatOpenAI
+            _llm = ChatOpenAI(model=settings.LLM_MODEL, temperature=0.7, openai_api_key=settings.OPENAI_API_KEY, stream_usage=True)
     return _llm
+
+
+def get_title_llm():
+    """TITLE_MODEL when set (a smaller, faster model), otherwise the chat model"""
+    global _title_llm
+    if not settings.TITLE_MODEL or settings.LLM_PROVIDER == "fake":
+        return get_llm()
+    if not _title_llm:
+        from langchain_openai import ChatOpenAI
+        _title_llm = ChatOpenAI(model=settings.TITLE_MODEL, temperature=0.3, max_tokens=200, openai_api_key=settings.OPENAI_API_KEY)
+    return _title_llm
+
+
+def invoke_llm(operation, messages):
+    """one chat model call, timed and counted under `operation`"""
+    start = time.perf_counter()
+    try:
+        resp = get_llm().invoke(messages)
+    except Exception:
+        LLM_ERRORS.labels(operation).inc()
+        raise
+    observe_llm(operation, time.perf_counter() - start, resp.usage_metadata)
+    return resp
+
+
+async def ainvoke_llm(operation, messages):
+    start = time.perf_counter()
+    try:
+        resp = await get_llm().ainvoke(messages)
+    except Exception:
+        LLM_ERRORS.labels(operation).inc()
+        raise
+    observe_llm(operation, time.perf_counter() - start, resp.usage_metadata)
+    return resp
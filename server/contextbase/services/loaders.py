@@ -0,0 +1,159 @@
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from langchain_core.documents import Document
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+
+from contextbase.core.config import settings
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PdfLoader:
+    """one unit per PARSE_PAGES_PER_TASK pages, so a large pdf spreads over the pool"""
+
+    @staticmethod
+    def units(path):
+        from pypdf import PdfReader
+        total = len(PdfReader(path).pages)
+        step = max(1, settings.PARSE_PAGES_PER_TASK)
+        return [(start, min(start + step, total), total) for start in range(0, total, step)]
+
+    @staticmethod
+    def load(path, unit):
+        from pypdf import PdfReader
+        start, end, total = unit
+        reader = PdfReader(path)
+        labels = reader.page_labels
+        docs = []
+        for i in range(start, end):
+            text = reader.pages[i].extract_text() or ""
+            docs.append(Document(page_content=text, metadata={"source": path, "page": i, "page_label": labels[i], "total_pages": total}))
+        return docs
+
+
+class TextLoader:
+    @staticmethod
+    def units(path):
+        return [None]
+
+    @staticmethod
+    def load(path, unit):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return [Document(page_content=f.read(), metadata={"source": path})]
+
+
+class _TextExtractor(HTMLParser):
+    SKIP = {"script", "style", "noscript", "template"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts, self._skipping = [], 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skipping:
+            self._skipping -= 1
+        elif tag in ("p", "div", "li", "br", "tr", "h1", "h2", "h3", "h4", "h5", "h6"):
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+class HtmlLoader(TextLoader):
+    @staticmethod
+    def load(path, unit):
+        parser = _TextExtractor()
+        with open(path, encoding="utf-8", errors="replace") as f:
+            parser.feed(f.read())
+        text = re.sub(r"\n\s*\n+", "\n\n", "".join(parser.parts)).strip()
+        return [Document(page_content=text, metadata={"source": path})]
+
+
+class DocxLoader(TextLoader):
+    """reads word/document.xml directly, paragraphs become lines"""
+
+    @staticmethod
+    def load(path, unit):
+        with zipfile.ZipFile(path) as z:
+            xml = z.read("word/document.xml").decode("utf-8", errors="replace")
+        paragraphs = []
+        for p in re.findall(r"<w:p[ >].*?</w:p>", xml, flags=re.S):
+            text = "".join(re.findall(r"<w:t(?: [^>]*)?>([^<]*)</w:t>", p))
+            paragraphs.append(text.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">").replace("&quot;", '"').replace("&apos;", "'"))
+        return [Document(page_content="\n".join(paragraphs), metadata={"source": path})]
+
+
+LOADERS = {
+    ".pdf": PdfLoader,
+    ".txt": TextLoader,
+    ".md": TextLoader,
+    ".markdown": TextLoader,
+    ".html": HtmlLoader,
+    ".htm": HtmlLoader,
+    ".docx": DocxLoader,
+}
+
+
+def get_loader(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in LOADERS:
+        raise ValueError(f"Unsupported file type: {ext or path}")
+    return LOADERS[ext]
+
+
+def _parse_unit(path, unit, chunk_size, chunk_overlap):
+    """runs in a pool process: load one unit and split it into chunks"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    # start_index lets prompt assembly join overlapping neighbours
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+    return splitter.split_documents(get_loader(path).load(path, unit))
+
+
+def _get_pool():
+    global _pool
+    # ingest threads ask for the pool concurrently; only one of them may create it
+    with _pool_lock:
+        if _pool is None and settings.PARSE_WORKERS > 0:
+            # forking this process, with its event loop and executor threads, can copy a held lock into the child
+            _pool = ProcessPoolExecutor(max_workers=settings.PARSE_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+        return _pool
+
+
+def shutdown_parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def iter_chunks(path, chunk_size=None, chunk_overlap=None):
+    """yield chunks in document order while later pages are still being parsed"""
+    chunk_size = chunk_size or settings.CHUNK_SIZE
+    chunk_overlap = settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+    units = get_loader(path).units(path)
+    pool = _get_pool()
+    if pool is None:
+        for unit in units:
+            yield from _parse_unit(path, unit, chunk_size, chunk_overlap)
+        return
+
+    # keep a bounded number of units in flight so memory doesn't grow with document size
+    window = max(2, settings.PARSE_WORKERS * 2)
+    pending = []
+    for unit in units:
+        pending.append(pool.submit(_parse_unit, path, unit, chunk_size, chunk_overlap))
+        if len(pending) >= window:
+            yield from pending.pop(0).result()
+    for future in pending:
+        yield from future.result()
@@ -0,0 +1,206 @@
+import functools
+import os
+import threading
+import zlib
+
+from contextbase.core.config import settings
+from contextbase.services.llm import get_embedding_model
+
+REBUILD_SUFFIX = "__rebuild"  # staging copies made by `contextbase.cli rebuild`
+TENANT_KEY = "metadata.collection_id"  # the Collection a chunk belongs to, in shared storage mode
+
+_client = None
+_async_client = None
+_stores = {}
+_lock = threading.Lock()
+
+
+def is_local():
+    """true for qdrant's embedded mode (":memory:" or a directory path)"""
+    return not settings.QDRANT_URL.startswith(("http://", "https://"))
+
+
+def _client_kwargs():
+    if settings.QDRANT_URL == ":memory:":
+        return {"location": ":memory:"}
+    if is_local():
+        return {"path": settings.QDRANT_URL}
+    return {
+        "url": settings.QDRANT_URL,
+        "api_key": settings.QDRANT_API_KEY or None,
+        "prefer_grpc": settings.QDRANT_PREFER_GRPC,
+        "timeout": settings.QDRANT_TIMEOUT,
+        "pool_size": settings.QDRANT_POOL_SIZE,
+    }
+
+
+class _Serialized:
+    """embedded qdrant keeps points in plain numpy arrays that concurrent ingest threads corrupt; one call at a time"""
+
+    def __init__(self, local):
+        self._local = local
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._local, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+def get_qdrant_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from qdrant_client import QdrantClient  # heavy; imported on first use
+                client = QdrantClient(**_client_kwargs())
+                if is_local():
+                    client._client = _Serialized(client._client)
+                _client = client
+    return _client
+
+
+def get_async_qdrant_client():
+    """async client for remote servers; None in embedded mode, where it would not share storage"""
+    global _async_client
+    if is_local():
+        return None
+    if _async_client is None:
+        from qdrant_client import AsyncQdrantClient
+        _async_client = AsyncQdrantClient(**_client_kwargs())
+    return _async_client
+
+
+def is_shared():
+    """true when Collections share qdrant collections and are told apart by TENANT_KEY"""
+    if settings.QDRANT_STORAGE_MODE not in ("per_collection", "shared"):
+        raise ValueError(f"unknown QDRANT_STORAGE_MODE {settings.QDRANT_STORAGE_MODE!r}")
+    return settings.QDRANT_STORAGE_MODE == "shared"
+
+
+def shared_collections():
+    base, shards = settings.QDRANT_SHARED_COLLECTION, max(1, settings.QDRANT_SHARED_SHARDS)
+    return [base] if shards == 1 else [f"{base}_{i}" for i in range(shards)]
+
+
+def physical_collection(collection_id):
+    """the qdrant collection holding a Collection's chunks"""
+    if not is_shared():
+        return collection_id
+    names = shared_collections()
+    return names[zlib.crc32(collection_id.encode()) % len(names)]
+
+
+def _quantization_config():
+    from qdrant_client import models
+    if settings.QDRANT_QUANTIZATION == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM)
+        )
+    if settings.QDRANT_QUANTIZATION == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM))
+    if settings.QDRANT_QUANTIZATION not in ("", "none"):
+        raise ValueError(f"unknown QDRANT_QUANTIZATION {settings.QDRANT_QUANTIZATION!r}")
+    return None
+
+
+def collection_config(dim, name=None):
+    """create_collection arguments for the configured storage layout"""
+    from qdrant_client import models
+    if name in shared_collections():
+        # every search filters on one tenant, so build per-tenant graphs instead of one global graph
+        hnsw = models.HnswConfigDiff(
+            m=0, payload_m=settings.QDRANT_HNSW_M, ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT, on_disk=settings.QDRANT_HNSW_ON_DISK
+        )
+    else:
+        hnsw = models.HnswConfigDiff(m=settings.QDRANT_HNSW_M, ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT, on_disk=settings.QDRANT_HNSW_ON_DISK)
+    return {
+        "vectors_config": models.VectorParams(size=dim, distance=models.Distance.COSINE, on_disk=settings.QDRANT_ON_DISK_VECTORS),
+        "hnsw_config": hnsw,
+        "quantization_config": _quantization_config(),
+        "on_disk_payload": settings.QDRANT_ON_DISK_PAYLOAD,
+    }
+
+
+def search_params():
+    """query_points search_params, None when nothing differs from the server defaults"""
+    from qdrant_client import models
+    quantization = None
+    if settings.QDRANT_QUANTIZATION not in ("", "none"):
+        quantization = models.QuantizationSearchParams(rescore=settings.QDRANT_RESCORE, oversampling=settings.QDRANT_OVERSAMPLING)
+    if quantization is None and not settings.QDRANT_HNSW_EF:
+        return None
+    return models.SearchParams(hnsw_ef=settings.QDRANT_HNSW_EF or None, quantization=quantization)
+
+
+def create_payload_indexes(collection_name):
+    from qdrant_client import models
+    if is_local():  # embedded mode has no payload indexes
+        return
+    client = get_qdrant_client()
+    if collection_name in shared_collections():
+        # tenant index: qdrant keeps each collection id's points together on disk
+        client.create_payload_index(collection_name, TENANT_KEY, models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True))
+    client.create_payload_index(collection_name, "metadata.document_id", models.PayloadSchemaType.KEYWORD)
+
+
+def ensure_collection(collection_name, dim):
+    client = get_qdrant_client()
+    if client.collection_exists(collection_name):
+        return
+    try:
+        client.create_collection(collection_name, **collection_config(dim, collection_name))
+    except Exception:
+        # another ingestion worker may have created it first
+        if not client.collection_exists(collection_name):
+            raise
+        return
+    create_payload_indexes(collection_name)
+
+
+def get_store(collection_name):
+    """cached langchain store, validated against the collection once per process"""
+    store = _stores.get(collection_name)
+    if store is None:
+        from langchain_qdrant import QdrantVectorStore
+        store = QdrantVectorStore(client=get_qdrant_client(), collection_name=collection_name, embedding=get_embedding_model())
+        _stores[collection_name] = store
+    return store
+
+
+def invalidate_store(collection_name):
+    _stores.pop(collection_name, None)
+
+
+async def warm_up():
+    client = get_qdrant_client()
+    client.get_collections()
+    if get_async_qdrant_client():
+        await _async_client.get_collections()
+
+
+async def close_qdrant():
+    global _client, _async_client
+    _stores.clear()
+    if _async_client is not None:
+        await _async_client.close()
+    if _client is not None:
+        _client.close()
+    _client, _async_client = None, None
+
+
+def _forget_after_fork():
+    """a forked child (a process pool worker, a prefork server worker) must not share the parent's
+    HTTP/gRPC connections; it drops the inherited clients, without closing them, and opens its own"""
+    global _client, _async_client, _lock
+    _client, _async_client, _lock = None, None, threading.Lock()
+    _stores.clear()
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, literal, select, update
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from contextbase.core.config import settings
+from contextbase.core.database import SessionLocal, Timestamp, utcnow
+from contextbase.models import Collection, Document, DeletionJob, OrphanBlob, GarbageRun
+from contextbase.services.answer_cache import invalidate_answers
+from contextbase.services.file_handler import delete_upload, recently_written
+from contextbase.services.qdrant import get_qdrant_client, physical_collection, shared_collections, is_shared, TENANT_KEY
+from contextbase.services.vector_store import delete_vector_collection
+
+_TENANT_SCAN_LIMIT = 1_000_000  # most collection ids one garbage pass reads from a shared collection
+
+_task = None
+_wake = None
+
+
+async def schedule_collection_deletion(db, collection_ids):
+    """bulk-delete the collections' documents and queue their files and vectors for the reaper; the caller commits"""
+    if not collection_ids:
+        return
+    now = literal(utcnow(), Timestamp)
+    # one statement each, however many documents there are; files already queued are skipped
+    await db.execute(
+        insert(OrphanBlob)
+        .from_select(["path", "created_at"], select(Document.file_path, now).where(Document.collection_id.in_(collection_ids)).distinct())
+        .prefix_with("OR IGNORE", dialect="sqlite")
+        .prefix_with("IGNORE", dialect="mysql")
+    )
+    await db.execute(delete(Document).where(Document.collection_id.in_(collection_ids)))
+    existing = set(await db.scalars(select(DeletionJob.collection_id).where(DeletionJob.collection_id.in_(collection_ids))))
+    db.add_all(DeletionJob(collection_id=c) for c in collection_ids if c not in existing)
+
+
+def wake_reaper():
+    """start a pass now instead of waiting for REAPER_INTERVAL; call after committing"""
+    if _wake is not None:
+        _wake.set()
+
+
+def _next_jobs(limit):
+    with SessionLocal() as db:
+        return list(db.scalars(select(DeletionJob.collection_id).order_by(DeletionJob.created_at).limit(limit)))
+
+
+def _run_job(collection_id):
+    """drop the collection's vectors; safe to repeat, so a crash mid-way just means doing it again"""
+    try:
+        if not delete_vector_collection(collection_id) and get_qdrant_client().collection_exists(physical_collection(collection_id)):
+            raise RuntimeError("qdrant refused to drop the collection")
+        invalidate_answers(collection_id)
+    except Exception as e:
+        with SessionLocal() as db:
+            job = db.get(DeletionJob, collection_id)
+            if job is not None:
+                job.attempts = (job.attempts or 0) + 1
+                job.error = str(e)
+                db.commit()
+        print(f"reaper: {collection_id}: {e}")
+        return False
+    with SessionLocal() as db:
+        db.execute(delete(DeletionJob).where(DeletionJob.collection_id == collection_id))
+        db.commit()
+    return True
+
+
+def _reap_blobs(limit, queued_before):
+    """remove up to `limit` files queued before `queued_before` that nothing references anymore, returns how many rows were handled"""
+    with SessionLocal() as db:
+        paths = list(db.scalars(
+            select(OrphanBlob.path).where(OrphanBlob.created_at < queued_before).order_by(OrphanBlob.created_at).limit(limit)
+        ))
+        if not paths:
+            return 0
+        # the same bytes may have been uploaded again since, or be shared with another collection
+        in_use = set(db.scalars(select(Document.file_path).where(Document.file_path.in_(paths)).distinct()))
+        # saved again just now, by an upload whose Document may not be committed yet: look again later
+        fresh = [p for p in paths if p not in in_use and recently_written(p)]
+        for path in paths:
+            if path not in in_use and path not in fresh:
+                delete_upload(path)
+        db.execute(delete(OrphanBlob).where(OrphanBlob.path.in_(set(paths) - set(fresh))))
+        if fresh:
+            db.execute(update(OrphanBlob).where(OrphanBlob.path.in_(fresh)).values(created_at=utcnow()))
+        db.commit()
+    return len(paths)
+
+
+def reap_once():
+    """one pass: pending collection deletions, then queued files in batches"""
+    done = 0
+    for collection_id in _next_jobs(settings.REAPER_BATCH_SIZE):
+        done += _run_job(collection_id)
+    started = utcnow()
+    while (handled := _reap_blobs(settings.REAPER_BATCH_SIZE, started)):
+        done += handled
+    return done
+
+
+def _is_collection_id(name):
+    """whether `name` looks like a Collection id; anything else in qdrant belongs to someone else"""
+    try:
+        return str(uuid.UUID(name)) == name
+    except ValueError:
+        return False
+
+
+def _claim_garbage_run():
+    """True for the one worker that gets this REAPER_GC_INTERVAL's sweep, with the suspects the last sweep left"""
+    now = utcnow()
+    with SessionLocal() as db:
+        db.execute(
+            insert(GarbageRun).values(name="gc", started_at=datetime(1970, 1, 1))
+            .prefix_with("OR IGNORE", dialect="sqlite")
+            .prefix_with("IGNORE", dialect="mysql")
+        )
+        # the conditional update is atomic, so of the workers racing here only one sees a row change
+        claimed = db.execute(
+            update(GarbageRun)
+            .where(GarbageRun.name == "gc", GarbageRun.started_at < now - timedelta(seconds=settings.REAPER_GC_INTERVAL * 0.9))
+            .values(started_at=now)
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return False, set()
+        return True, set(json.loads(db.get(GarbageRun, "gc").suspects or "[]"))
+
+
+def _orphaned_collections(db):
+    """ids of this app's collections with vectors or a lexical index but no Collection row or pending deletion"""
+    client = get_qdrant_client()
+    names = set()
+    if is_shared():
+        # standalone collections are left alone here, including ones `cli migrate --keep` kept
+        existing = {c.name for c in client.get_collections().collections}
+        for shared in existing & set(shared_collections()):
+            names |= {hit.value for hit in client.facet(shared, TENANT_KEY, limit=_TENANT_SCAN_LIMIT).hits}
+    else:
+        # also skips `cli rebuild` staging copies, whose names carry a suffix
+        names = {c.name for c in client.get_collections().collections}
+    if os.path.isdir(settings.LEXICAL_INDEX_DIR):
+        names |= {f[:-len(".sqlite3")] for f in os.listdir(settings.LEXICAL_INDEX_DIR) if f.endswith(".sqlite3")}
+    names = {n for n in names if _is_collection_id(n)}
+    known = set(db.scalars(select(Collection.id))) | set(db.scalars(select(DeletionJob.collection_id)))
+    return names - known
+
+
+def collect_garbage():
+    """queue files in UPLOAD_DIR and qdrant collections that no database row points at
+
+    Runs in one worker per REAPER_GC_INTERVAL. A collection is only queued when two sweeps in a row find
+    it orphaned, so one whose row is still being committed survives the first.
+    """
+    claimed, suspects = _claim_garbage_run()
+    if not claimed:
+        return 0, 0
+    cutoff = time.time() - settings.REAPER_GC_GRACE
+    found_files = found_collections = 0
+    try:
+        candidates = []
+        with os.scandir(settings.UPLOAD_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    candidates.append(os.path.join(settings.UPLOAD_DIR, entry.name))
+    except FileNotFoundError:
+        candidates = []
+    with SessionLocal() as db:
+        for i in range(0, len(candidates), settings.REAPER_BATCH_SIZE):
+            part = candidates[i:i + settings.REAPER_BATCH_SIZE]
+            referenced = set(db.scalars(select(Document.file_path).where(Document.file_path.in_(part))))
+            queued = set(db.scalars(select(OrphanBlob.path).where(OrphanBlob.path.in_(part))))
+            orphans = [p for p in part if p not in referenced and p not in queued]
+            db.add_all(OrphanBlob(path=p) for p in orphans)
+            found_files += len(orphans)
+        db.commit()
+
+        orphaned = _orphaned_collections(db)
+        for name in sorted(orphaned & suspects):
+            db.add(DeletionJob(collection_id=name))
+            found_collections += 1
+        db.execute(update(GarbageRun).where(GarbageRun.name == "gc").values(suspects=json.dumps(sorted(orphaned - suspects))))
+        db.commit()
+    if found_files or found_collections:
+        print(f"reaper: queued {found_files} orphaned files and {found_collections} orphaned collections")
+    return found_files, found_collections
+
+
+async def _loop():
+    last_gc = 0.0
+    while True:
+        try:
+            if settings.REAPER_GC_INTERVAL and time.monotonic() - last_gc >= settings.REAPER_GC_INTERVAL:
+                last_gc = time.monotonic()
+                await asyncio.to_thread(collect_garbage)
+            await asyncio.to_thread(reap_once)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"reaper error: {e}")
+        try:
+            await asyncio.wait_for(_wake.wait(), settings.REAPER_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
+
+async def start_reaper():
+    global _task, _wake
+    if _task is None:
+        _wake = asyncio.Event()
+        _task = asyncio.create_task(_loop())
+
+
+async def stop_reaper():
+    global _task, _wake
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+    _task, _wake = None, None
@@ -0,0 +1,88 @@
+import re
+
+import numpy as np
+
+from contextbase.core.config import settings
+
+_reranker = None
+
+
+def rrf_fuse(rankings, k=60):
+    """reciprocal rank fusion of several best-first [(key, doc)] lists, returns [(doc, score)] best first"""
+    scores, docs = {}, {}
+    for ranking in rankings:
+        for rank, (key, doc) in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    return [(docs[key], score) for key, score in sorted(scores.items(), key=lambda kv: kv[1], reverse=True)]
+
+
+def mmr(scored, vectors, top_k, lambda_mult=0.7):
+    """maximal marginal relevance: trade each candidate's score against its similarity to what's already picked"""
+    if len(scored) <= top_k:
+        return [doc for doc, _ in scored]
+    vecs = np.asarray(vectors, dtype=np.float32)
+    vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+    sims = vecs @ vecs.T
+    relevance = np.asarray([s for _, s in scored], dtype=np.float32)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread else np.ones_like(relevance)
+
+    picked = [0]
+    while len(picked) < top_k:
+        redundancy = sims[:, picked].max(axis=1)
+        score = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        score[picked] = -np.inf
+        picked.append(int(score.argmax()))
+    return [scored[i][0] for i in picked]
+
+
+class CrossEncoderReranker:
+    """sentence-transformers cross-encoder, scores (query, chunk) pairs jointly"""
+
+    def __init__(self, model_name):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            raise RuntimeError("RAG_RERANKER=cross-encoder needs the sentence-transformers package")
+        self.model = CrossEncoder(model_name)
+
+    def score(self, query, docs):
+        return [float(s) for s in self.model.predict([(query, d.page_content) for d in docs])]
+
+
+class TermOverlapReranker:
+    """offline stand-in: fraction of the query's terms found in the chunk"""
+
+    def score(self, query, docs):
+        terms = set(re.findall(r"\w+", query.lower()))
+        if not terms:
+            return [0.0] * len(docs)
+        return [len(terms & set(re.findall(r"\w+", d.page_content.lower()))) / len(terms) for d in docs]
+
+
+RERANKERS = {
+    "cross-encoder": lambda: CrossEncoderReranker(settings.RAG_RERANK_MODEL),
+    "fake": TermOverlapReranker,
+}
+
+
+def get_reranker():
+    """the configured reranker, None for RAG_RERANKER=none"""
+    global _reranker
+    if settings.RAG_RERANKER in ("", "none"):
+        return None
+    if _reranker is None:
+        if settings.RAG_RERANKER not in RERANKERS:
+            raise ValueError(f"unknown RAG_RERANKER {settings.RAG_RERANKER!r}")
+        _reranker = RERANKERS[settings.RAG_RERANKER]()
+    return _reranker
+
+
+def rerank(query, scored):
+    """re-score the best RAG_RERANK_CANDIDATES with the reranker, dropping the rest"""
+    reranker = get_reranker()
+    if reranker is None or not scored:
+        return scored
+    docs = [doc for doc, _ in scored[:settings.RAG_RERANK_CANDIDATES]]
+    return sorted(zip(docs, reranker.score(query, docs)), key=lambda ds: ds[1], reverse=True)
@@ -0,0 +1,151 @@
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from contextbase.core.config import settings
+from contextbase.core.metrics import SINGLEFLIGHT_CALLS
+
+_group = None
+
+
+class SqliteFlights:
+    """flight claims and just-finished results in a local file, shared by every worker process on the host"""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS flights (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)")
+        self._conn.commit()
+
+    def claim(self, key, ttl):
+        """true when this caller now owns the flight; a claim left by a crashed worker lapses after ttl"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM flights WHERE key = ? AND expires_at < ?", (key, now))
+            claimed = self._conn.execute("INSERT OR IGNORE INTO flights (key, expires_at) VALUES (?, ?)", (key, now + ttl)).rowcount
+            self._conn.commit()
+        return claimed == 1
+
+    def poll(self, key, since):
+        """(result published since `since` or None, whether the flight is still running)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ? AND created_at >= ?", (key, since)).fetchone()
+            active = self._conn.execute("SELECT 1 FROM flights WHERE key = ? AND expires_at >= ?", (key, time.time())).fetchone()
+        return (json.loads(row[0]) if row else None), active is not None
+
+    def release(self, key, result, keep):
+        now = time.time()
+        with self._lock:
+            if result is not None:
+                self._conn.execute("INSERT OR REPLACE INTO results (key, value, created_at) VALUES (?, ?, ?)", (key, json.dumps(result), now))
+            self._conn.execute("DELETE FROM flights WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - keep,))
+            self._conn.commit()
+
+
+class Flight:
+    """one caller's view of a key: `result` is set when another caller already computed it, else call publish"""
+
+    def __init__(self):
+        self.result = None
+        self.published = None
+
+    def publish(self, result):
+        self.published = result
+
+
+class SingleFlight:
+    """concurrent callers asking for the same key share the first caller's computation"""
+
+    def __init__(self, timeout=30.0, shared=None, poll_interval=0.05):
+        self.timeout = timeout
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self._inflight = {}  # key -> future the leader resolves with its result, None if it gave up
+
+    async def _follow(self, future):
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _follow_remote(self, key):
+        """claims key across workers: None when this process leads, else another worker's result (or False if it never came)"""
+        since = time.time()
+        if await asyncio.to_thread(self.shared.claim, key, self.timeout):
+            return None
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            result, active = await asyncio.to_thread(self.shared.poll, key, since)
+            if result is not None:
+                return result
+            if not active:
+                break
+        return False
+
+    @asynccontextmanager
+    async def flight(self, key):
+        """a Flight carrying the result if an identical call was already running; a key of None never coalesces"""
+        flight = Flight()
+        if key is None:
+            yield flight
+            return
+
+        future = self._inflight.get(key)
+        if future is not None:
+            flight.result = await self._follow(future)
+            SINGLEFLIGHT_CALLS.labels("coalesced" if flight.result is not None else "fallback").inc()
+            yield flight
+            return
+
+        # registered before any await so every later caller in this process follows it
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        leads = True
+        try:
+            if self.shared is not None:
+                remote = await self._follow_remote(key)
+                leads = remote is None
+                if remote:
+                    flight.result = flight.published = remote
+                SINGLEFLIGHT_CALLS.labels("leader" if leads else "coalesced_remote" if remote else "fallback").inc()
+            else:
+                SINGLEFLIGHT_CALLS.labels("leader").inc()
+            yield flight
+        finally:
+            del self._inflight[key]
+            # followers get None if the leader failed or was cancelled, and then compute it themselves
+            future.set_result(flight.published)
+            if self.shared is not None and leads:
+                await asyncio.shield(asyncio.to_thread(self.shared.release, key, flight.published, self.timeout))
+
+
+def get_singleflight():
+    """the configured coalescing group, or None when SINGLEFLIGHT_ENABLED is off"""
+    global _group
+    if not settings.SINGLEFLIGHT_ENABLED:
+        return None
+    if _group is None:
+        shared = SqliteFlights(settings.SINGLEFLIGHT_PATH) if settings.SINGLEFLIGHT_BACKEND == "sqlite" else None
+        _group = SingleFlight(timeout=settings.SINGLEFLIGHT_TIMEOUT, shared=shared)
+    return _group
+
+
+def coalesce(key):
+    """`async with coalesce(key) as flight:` in the configured group; never coalesces when single-flight is off"""
+    group = get_singleflight()
+    if group is None:
+        return _passthrough.flight(None)
+    return group.flight(key)
+
+
+_passthrough = SingleFlight()
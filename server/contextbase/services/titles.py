@@ -0,0 +1,155 @@
+from langchain_core.messages import HumanMessage
+from sqlalchemy import bindparam, or_, update
+import asyncio
+import re
+import time
+
+from contextbase.core.config import settings
+from contextbase.core.database import AsyncSessionLocal
+from contextbase.core.metrics import CHAT_TITLES, LLM_ERRORS, observe_llm
+from contextbase.models import Chat
+from contextbase.services.llm import get_title_llm
+
+GENERIC_CHAT_NAMES = ("New Chat", "Documents", "")
+
+_queue = None
+_task = None
+_running = set()
+
+
+def title_prompt(user_message, ai_response):
+    return f"""Based on this conversation, generate a very short, concise title (3-6 words max).
+The title should capture the main topic or question being discussed.
+Do NOT include quotes, periods, or any punctuation at the end.
+Just return the title text, nothing else.
+
+User: {user_message[:500]}
+Assistant: {ai_response[:500]}
+
+Title:"""
+
+
+def clean_title(text):
+    title = text.strip().strip('"\'').strip('.')
+    # Limit length and clean up
+    if len(title) > 50:
+        title = title[:47] + "..."
+    return title if title else "New Chat"
+
+
+_FILLER = re.compile(r"^(hi|hello|hey|please|so|ok|okay|can you|could you|would you|i want to|i need to|i'd like to|tell me|help me)\b[\s,!:]*", re.I)
+
+
+def heuristic_title(user_message):
+    """title from the start of the question, no model call"""
+    text = re.split(r"(?<=[.?!])\s", " ".join(user_message.split()), maxsplit=1)[0]
+    while (shorter := _FILLER.sub("", text)) != text:
+        text = shorter
+    words = re.sub(r"[^\w\s'-]", "", text).split()[:6]
+    if not words:
+        return "New Chat"
+    title = " ".join(words)
+    return clean_title(title[0].upper() + title[1:])
+
+
+def _batch_prompt(pairs):
+    conversations = "\n\n".join(f"{i}.\nUser: {u[:300]}\nAssistant: {a[:300]}" for i, (u, a) in enumerate(pairs, 1))
+    return f"""Give each conversation below a very short title (3-6 words) capturing its main topic.
+Reply with exactly one line per conversation, formatted as "<number>. <title>", with no quotes or final punctuation.
+
+{conversations}
+
+Titles:"""
+
+
+def _parse_batch(text, count):
+    titles = {}
+    for line in text.splitlines():
+        m = re.match(r"\s*(\d+)[.):]\s*(.+)", line)
+        if m and 1 <= int(m.group(1)) <= count:
+            titles[int(m.group(1)) - 1] = clean_title(m.group(2))
+    return titles
+
+
+async def generate_titles(pairs):
+    """titles for (user_message, ai_response) pairs; one model call however many there are, heuristics for any it misses"""
+    titles = {}
+    if settings.TITLE_MODE == "llm":
+        prompt = title_prompt(*pairs[0]) if len(pairs) == 1 else _batch_prompt(pairs)
+        start = time.perf_counter()
+        try:
+            resp = await get_title_llm().ainvoke([HumanMessage(content=prompt)])
+            observe_llm("title", time.perf_counter() - start, resp.usage_metadata)
+            titles = {0: clean_title(resp.content)} if len(pairs) == 1 else _parse_batch(resp.content, len(pairs))
+        except Exception:
+            LLM_ERRORS.labels("title").inc()
+    CHAT_TITLES.labels("llm").inc(len(titles))
+    CHAT_TITLES.labels("heuristic").inc(len(pairs) - len(titles))
+    return [titles.get(i) or heuristic_title(u) for i, (u, _) in enumerate(pairs)]
+
+
+async def _save_titles(named):
+    """rename in one statement batch, skipping chats the user renamed in the meantime"""
+    table = Chat.__table__
+    stmt = (
+        update(table)
+        # IN () can't be expanded in an executemany
+        .where(table.c.id == bindparam("chat_id"), or_(*(table.c.name == n for n in GENERIC_CHAT_NAMES)))
+        .values(name=bindparam("title"))
+    )
+    async with AsyncSessionLocal() as db:
+        await db.execute(stmt, [{"chat_id": c, "title": t} for c, t in named])
+        await db.commit()
+
+
+async def _title_batch(batch):
+    titles = [None] * len(batch)
+    try:
+        titles = await generate_titles([(u, a) for _, u, a, _ in batch])
+        await _save_titles([(chat_id, t) for (chat_id, _, _, _), t in zip(batch, titles)])
+    except Exception as e:
+        print(f"chat titles failed: {e}")
+        titles = [None] * len(batch)  # the chats keep their names; a later rename still works
+    for (*_, done), title in zip(batch, titles):
+        if not done.done():
+            done.set_result(title)
+
+
+async def _loop():
+    while True:
+        batch = [await _queue.get()]
+        # let a burst of new chats gather so they share one title call
+        deadline = time.monotonic() + settings.TITLE_BATCH_WAIT
+        while len(batch) < settings.TITLE_BATCH_SIZE:
+            try:
+                batch.append(await asyncio.wait_for(_queue.get(), max(0.0, deadline - time.monotonic())))
+            except asyncio.TimeoutError:
+                break
+        # batches don't wait on each other; a slow model call shouldn't hold up the next burst
+        task = asyncio.create_task(_title_batch(batch))
+        _running.add(task)
+        task.add_done_callback(_running.discard)
+
+
+def schedule_title(chat_id, user_message, ai_response):
+    """title the chat after its first exchange, off the request path; returns a future for the new name (None if it failed)"""
+    if _queue is None:
+        raise RuntimeError("chat titler is not running")
+    done = asyncio.get_running_loop().create_future()
+    _queue.put_nowait((chat_id, user_message, ai_response, done))
+    return done
+
+
+async def start_titler():
+    global _queue, _task
+    if _task is None:
+        _queue = asyncio.Queue()
+        _task = asyncio.create_task(_loop())
+
+
+async def stop_titler():
+    global _queue, _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, *_running, return_exceptions=True)
+    _queue, _task = None, None
@@ -0,0 +1,44 @@
+import threading
+
+from contextbase.core.config import settings
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def load_tokenizer():
+    """tiktoken encoding for LLM_MODEL, False when it can't be loaded (e.g. no network for the BPE file)
+
+    The first load may download the BPE file, so the app calls this at startup off the event loop;
+    anything counting tokens before that loads it on first use.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    try:
+                        _encoding = tiktoken.encoding_for_model(settings.LLM_MODEL)
+                    except KeyError:
+                        _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    print(f"tokenizer unavailable, estimating tokens: {e}")
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    enc = load_tokenizer()
+    if enc:
+        return len(enc.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text, budget):
+    """the longest prefix of text that fits in `budget` tokens"""
+    enc = load_tokenizer()
+    if enc:
+        tokens = enc.encode(text, disallowed_special=())
+        return text if len(tokens) <= budget else enc.decode(tokens[:budget])
+    return text[:max(0, budget - 1) * 4]
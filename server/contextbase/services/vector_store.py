@@ -1,53 +1,333 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+import asyncio
+import hashlib
+import time
+import uuid
 
 from contextbase.core.config import settings
+from contextbase.core.metrics import INDEX_LATENCY, INDEXED_CHUNKS, INDEXED_PAGES, SEARCH_LATENCY
+from contextbase.services.lexical import get_lexical_index, drop_lexical_index
 from contextbase.services.llm import get_embedding_model
+from contextbase.services.loaders import iter_chunks
+from contextbase.services.retrieval import rrf_fuse, mmr, rerank
+from contextbase.services.qdrant import (
+    get_qdrant_client, get_async_qdrant_client, get_store, invalidate_store, ensure_collection, search_params,
+    is_shared, physical_collection, TENANT_KEY,
+)
 
+_POINT_NAMESPACE = uuid.UUID("6f1c2a8e-3b7d-4c5e-9a0f-2d4b6c8e0a1f")
 
-def index_document(file_path, collection_name):
-    """chunk pdf and store in qdrant"""
+
+def file_hash(file_path):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _tenant(collection_name):
+    """conditions keeping a query inside one collection's chunks; none when it has a qdrant collection to itself"""
+    if not is_shared():
+        return []
+    from qdrant_client import models
+    return [models.FieldCondition(key=TENANT_KEY, match=models.MatchValue(value=collection_name))]
+
+
+def _tenant_filter(collection_name):
+    from qdrant_client import models
+    tenant = _tenant(collection_name)
+    return models.Filter(must=tenant) if tenant else None
+
+
+def _document_filter(collection_name, document_id, exclude_hash=None):
+    from qdrant_client import models
+    must_not = [models.FieldCondition(key="metadata.content_hash", match=models.MatchValue(value=exclude_hash))] if exclude_hash else None
+    return models.Filter(
+        must=[*_tenant(collection_name), models.FieldCondition(key="metadata.document_id", match=models.MatchValue(value=document_id))],
+        must_not=must_not,
+    )
+
+
+def index_document(file_path, collection_name, document_id=None, batch_size=64, indexed_hash=None):
+    """chunk the file and store in qdrant, replacing the document's previous chunks
+
+    `indexed_hash` is the content hash a previous run finished indexing (Document.indexed_hash, recorded
+    only once the old version's chunks are gone); a file that still has it isn't indexed again.
+    """
+    from qdrant_client import models
     try:
-        loader = PyPDFLoader(file_path)
-        docs = loader.load()
-        if not docs:
+        content_hash = file_hash(file_path)
+        lexical = get_lexical_index(collection_name)
+        if document_id and indexed_hash == content_hash:
+            if lexical is None or lexical.has_document(document_id, content_hash):
+                return True  # unchanged since it was last indexed
+
+        # chunks stream in from the parse pool and are embedded batch by batch
+        start = time.perf_counter()
+        count, pages = 0, set()
+        physical = physical_collection(collection_name)
+        for batch in _batched(iter_chunks(file_path), batch_size):
+            if physical != collection_name:
+                for chunk in batch:
+                    chunk.metadata["collection_id"] = collection_name
+            if document_id:
+                for i, chunk in enumerate(batch, start=count):
+                    chunk.metadata.update(document_id=document_id, content_hash=content_hash, chunk=i)
+                # stable ids so a re-index overwrites points instead of duplicating them
+                ids = [str(uuid.uuid5(_POINT_NAMESPACE, f"{document_id}:{content_hash}:{i}")) for i in range(count, count + len(batch))]
+            else:
+                ids = [str(uuid.uuid4()) for _ in batch]
+            if count == 0:
+                # the probe vector is cached, so add_documents doesn't pay for it twice
+                dim = len(get_embedding_model().embed_query(batch[0].page_content))
+                ensure_collection(physical, dim)
+            get_store(physical).add_documents(batch, ids=ids)
+            if lexical is not None:
+                lexical.add(ids, batch)
+            count += len(batch)
+            pages.update(c.metadata.get("page", 0) for c in batch)
+            INDEXED_CHUNKS.inc(len(batch))
+
+        if not count:
             return False
-        
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=400)
-        chunks = splitter.split_documents(docs)
-        
-        if chunks:
-            QdrantVectorStore.from_documents(
-                documents=chunks,
-                embedding=get_embedding_model(),
-                url=settings.QDRANT_URL,
-                collection_name=collection_name
-            )
+        if document_id:
+            # drop chunks of the previous version only once the new ones are searchable
+            get_qdrant_client().delete(physical, points_selector=models.FilterSelector(filter=_document_filter(collection_name, document_id, content_hash)))
+            if lexical is not None:
+                lexical.delete_document(document_id, exclude_hash=content_hash)
+        INDEXED_PAGES.inc(len(pages))
+        INDEX_LATENCY.observe(time.perf_counter() - start)
         return True
     except Exception as e:
         print(f"indexing error: {e}")
         return False
 
 
-def search_documents(query, collection_name, top_k=5):
-    """search qdrant for similar chunks"""
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _candidates(top_k):
+    return max(top_k, settings.RAG_DENSE_CANDIDATES)
+
+
+def _dense_ranking(points, collection_name):
+    return [(str(p.id), _to_document(p, collection_name)) for p in points]
+
+
+def _lexical_ranking(query, collection_name):
+    index = get_lexical_index(collection_name, create=False)
+    if index is None:
+        return []
+    with SEARCH_LATENCY.labels("lexical").time():
+        hits = index.search(query, settings.RAG_LEXICAL_CANDIDATES)
+    return [(pid, Document(page_content=doc.page_content, metadata={**doc.metadata, "_id": pid, "_collection_name": collection_name})) for pid, doc in hits]
+
+
+def _missing_vectors(scored, vectors):
+    """candidates mmr needs a vector for that the dense query didn't return (lexical-only hits)"""
+    return [doc for doc, _ in scored if str(doc.metadata["_id"]) not in vectors]
+
+
+def _diversify(scored, vectors, top_k):
+    for doc, score in scored:
+        doc.metadata["_score"] = round(float(score), 6)
+    if not settings.RAG_MMR_ENABLED:
+        return [doc for doc, _ in scored[:top_k]]
+    with SEARCH_LATENCY.labels("mmr").time():
+        return mmr(scored, [vectors[str(doc.metadata["_id"])] for doc, _ in scored], top_k, settings.RAG_MMR_LAMBDA)
+
+
+def search_documents(query, collection_name, top_k=None, vector=None):
+    """hybrid search: qdrant and the bm25 index, fused by reciprocal rank, then optionally reranked and diversified"""
+    top_k = top_k or settings.RAG_TOP_K
     try:
-        store = QdrantVectorStore.from_existing_collection(
-            collection_name=collection_name,
-            url=settings.QDRANT_URL,
-            embedding=get_embedding_model()
-        )
-        return store.similarity_search(query, k=top_k)
-    except:
+        if vector is None:
+            with SEARCH_LATENCY.labels("embed").time():
+                vector = get_embedding_model().embed_query(query)
+        with SEARCH_LATENCY.labels("query").time():
+            resp = get_qdrant_client().query_points(
+                physical_collection(collection_name), query=vector, query_filter=_tenant_filter(collection_name), limit=_candidates(top_k),
+                with_payload=True, with_vectors=settings.RAG_MMR_ENABLED, search_params=search_params(),
+            )
+        scored = rrf_fuse([_dense_ranking(resp.points, collection_name), _lexical_ranking(query, collection_name)], settings.RAG_RRF_K)
+        with SEARCH_LATENCY.labels("rerank").time():
+            scored = rerank(query, scored)
+        vectors = {str(p.id): p.vector for p in resp.points}
+        if settings.RAG_MMR_ENABLED and len(scored) > top_k:
+            # chunk vectors come back from the embedding cache, so this rarely calls the backend
+            missing = _missing_vectors(scored, vectors)
+            vectors.update(zip((str(d.metadata["_id"]) for d in missing), get_embedding_model().embed_documents([d.page_content for d in missing])))
+        return _diversify(scored, vectors, top_k)
+    except Exception as e:
+        print(f"search error: {e}")
         return []
 
 
+def delete_document_vectors(collection_name, document_id, exclude_hash=None):
+    """remove one document's chunks (all but the `exclude_hash` version's, if given), leaving the rest of the collection alone"""
+    from qdrant_client import models
+    try:
+        client = get_qdrant_client()
+        physical = physical_collection(collection_name)
+        if client.collection_exists(physical):
+            client.delete(physical, points_selector=models.FilterSelector(filter=_document_filter(collection_name, document_id, exclude_hash)))
+        lexical = get_lexical_index(collection_name, create=False)
+        if lexical is not None:
+            lexical.delete_document(document_id, exclude_hash=exclude_hash)
+        return True
+    except Exception as e:
+        print(f"vector delete error: {e}")
+        return False
+
+
+def delete_untagged_vectors(collection_name):
+    """remove chunks indexed before they carried a document_id"""
+    from qdrant_client import models
+    try:
+        client = get_qdrant_client()
+        physical = physical_collection(collection_name)
+        if client.collection_exists(physical):
+            untagged = models.Filter(must=[*_tenant(collection_name), models.IsEmptyCondition(is_empty=models.PayloadField(key="metadata.document_id"))])
+            client.delete(physical, points_selector=models.FilterSelector(filter=untagged))
+        lexical = get_lexical_index(collection_name, create=False)
+        if lexical is not None:
+            lexical.delete_untagged()
+        return True
+    except Exception as e:
+        print(f"vector delete error: {e}")
+        return False
+
+
 def delete_vector_collection(collection_name):
+    drop_lexical_index(collection_name)
+    if is_shared():
+        return _delete_tenant(collection_name)
+    invalidate_store(collection_name)
     try:
-        client = QdrantClient(url=settings.QDRANT_URL)
-        client.delete_collection(collection_name)
+        get_qdrant_client().delete_collection(collection_name)
         return True
     except:
         return False
+
+
+def _delete_tenant(collection_name):
+    """remove a collection's chunks from the shared qdrant collection; the collection itself stays"""
+    from qdrant_client import models
+    try:
+        client = get_qdrant_client()
+        physical = physical_collection(collection_name)
+        if client.collection_exists(physical):
+            client.delete(physical, points_selector=models.FilterSelector(filter=_tenant_filter(collection_name)))
+        return True
+    except Exception as e:
+        print(f"vector delete error: {e}")
+        return False
+
+
+def _to_document(point, collection_name):
+    payload = point.payload or {}
+    metadata = {**(payload.get("metadata") or {}), "_id": point.id, "_collection_name": collection_name}
+    return Document(page_content=payload.get("page_content", ""), metadata=metadata)
+
+
+async def asearch_documents(query, collection_name, top_k=None, vector=None):
+    """async search_documents, uses the async qdrant client when talking to a server"""
+    client = get_async_qdrant_client()
+    if client is None:
+        return await asyncio.to_thread(search_documents, query, collection_name, top_k, vector)
+    top_k = top_k or settings.RAG_TOP_K
+    try:
+        if vector is None:
+            with SEARCH_LATENCY.labels("embed").time():
+                vector = await get_embedding_model().aembed_query(query)
+
+        async def dense():
+            with SEARCH_LATENCY.labels("query").time():
+                return await client.query_points(
+                    physical_collection(collection_name), query=vector, query_filter=_tenant_filter(collection_name), limit=_candidates(top_k),
+                    with_payload=True, with_vectors=settings.RAG_MMR_ENABLED, search_params=search_params(),
+                )
+
+        resp, lexical = await asyncio.gather(dense(), asyncio.to_thread(_lexical_ranking, query, collection_name))
+        scored = rrf_fuse([_dense_ranking(resp.points, collection_name), lexical], settings.RAG_RRF_K)
+        with SEARCH_LATENCY.labels("rerank").time():
+            scored = await asyncio.to_thread(rerank, query, scored)
+        vectors = {str(p.id): p.vector for p in resp.points}
+        if settings.RAG_MMR_ENABLED and len(scored) > top_k:
+            missing = _missing_vectors(scored, vectors)
+            vectors.update(zip((str(d.metadata["_id"]) for d in missing), await get_embedding_model().aembed_documents([d.page_content for d in missing])))
+        return _diversify(scored, vectors, top_k)
+    except Exception as e:
+        print(f"search error: {e}")
+        return []
+
+
+def _merge(results, top_k):
+    """best-scoring chunks across collections, at most RAG_MAX_PER_COLLECTION from any one, identical text kept once"""
+    ranked = sorted((doc for docs in results for doc in docs), key=lambda d: d.metadata.get("_score", 0.0), reverse=True)
+    cap = settings.RAG_MAX_PER_COLLECTION or top_k
+    picked, over_quota, seen, taken = [], [], set(), {}
+    for doc in ranked:
+        # the same file uploaded to two collections yields the same chunks
+        key = hashlib.sha1(" ".join(doc.page_content.split()).encode()).digest()
+        if key in seen:
+            continue
+        seen.add(key)
+        name = doc.metadata["_collection_name"]
+        if taken.get(name, 0) >= cap:
+            over_quota.append(doc)
+            continue
+        taken[name] = taken.get(name, 0) + 1
+        picked.append(doc)
+        if len(picked) == top_k:
+            return picked
+    # the cap only matters while other collections have hits to offer
+    return picked + over_quota[:top_k - len(picked)]
+
+
+def search_collections(query, collection_names, top_k=None):
+    """search_documents over several collections at once, merged by score"""
+    names = list(dict.fromkeys(collection_names))
+    if len(names) <= 1:
+        return search_documents(query, names[0], top_k) if names else []
+    top_k = top_k or settings.RAG_TOP_K
+    with SEARCH_LATENCY.labels("embed").time():
+        vector = get_embedding_model().embed_query(query)
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        results = list(pool.map(lambda name: search_documents(query, name, top_k, vector), names))
+    return _merge(results, top_k)
+
+
+async def asearch_collections(query, collection_names, top_k=None):
+    """async search_collections; the per-collection searches run concurrently, so latency follows the slowest one"""
+    names = list(dict.fromkeys(collection_names))
+    if len(names) <= 1:
+        return await asearch_documents(query, names[0], top_k) if names else []
+    top_k = top_k or settings.RAG_TOP_K
+    with SEARCH_LATENCY.labels("embed").time():
+        vector = await get_embedding_model().aembed_query(query)
+    results = await asyncio.gather(*(asearch_documents(query, name, top_k, vector) for name in names))
+    return _merge(results, top_k)
+
+
+async def adelete_vector_collection(collection_name):
+    client = get_async_qdrant_client()
+    if client is None or is_shared():
+        return await asyncio.to_thread(delete_vector_collection, collection_name)
+    invalidate_store(collection_name)
+    drop_lexical_index(collection_name)
+    try:
+        await client.delete_collection(collection_name)
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,52 @@
+"""production server: gunicorn -c gunicorn.conf.py contextbase.main:app
+
+The master imports the app and its client libraries once and creates the schema before forking, so
+workers share those pages and start without repeating either. Connections, thread pools and model
+clients are made in each worker's lifespan, after the fork.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# read by the settings the preloaded app import creates below; the master runs init_db instead, and
+# per-host defaults (answer cache backend, pool sizes) follow the worker count
+os.environ.setdefault("DB_INIT_ON_STARTUP", "false")
+os.environ.setdefault("WEB_CONCURRENCY", str(multiprocessing.cpu_count()))
+# workers write their metrics to files here and /metrics adds them up; prometheus_client reads this
+# when the preloaded app imports it, which happens before on_starting
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "contextbase-prometheus"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ["WEB_CONCURRENCY"])  # change WEB_CONCURRENCY, not --workers, so the settings see the same count
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    from contextbase import services
+    from contextbase.core import engine, init_db
+
+    # a previous run's files would be added to this one's counters; only here, as a reload re-reads
+    # this file while the workers are still writing theirs
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+
+    init_db()
+    engine.dispose()  # workers must not inherit the master's connections
+    services.preload()
+
+
+def post_fork(server, worker):
+    from contextbase.core import async_engine, engine
+
+    # leave the parent's pooled connections to the parent
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from contextbase.core.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
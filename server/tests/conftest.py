@@ -0,0 +1,53 @@
+"""tests run the app against the fake model providers, an in-memory qdrant and a throwaway sqlite database"""
+import os
+import tempfile
+import uuid
+
+_tmp = tempfile.mkdtemp(prefix="contextbase-tests-")
+# before anything imports the settings
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_tmp}/contextbase.db",
+    QDRANT_URL=":memory:",
+    UPLOAD_DIR=f"{_tmp}/uploads",
+    LEXICAL_INDEX_DIR=f"{_tmp}/lexical",
+    EMBEDDING_CACHE_PATH="",
+    ANSWER_CACHE_PATH=f"{_tmp}/answers.sqlite3",
+    SINGLEFLIGHT_PATH=f"{_tmp}/singleflight.sqlite3",
+    EMBEDDING_PROVIDER="fake",
+    LLM_PROVIDER="fake",
+    PARSE_WORKERS="0",
+    HASH_WORKERS="0",
+    BCRYPT_ROUNDS="4",
+)
+
+import httpx
+import pytest
+
+from contextbase.main import create_app
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def app():
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def auth_headers(client):
+    """a freshly registered user"""
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    await client.post("/api/v1/auth/register", json={"name": "tester", "email": email, "password": "secret-pw"})
+    resp = await client.post("/api/v1/auth/login", json={"email": email, "password": "secret-pw"})
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
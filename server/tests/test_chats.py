@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from contextbase.core import settings
+
+pytestmark = pytest.mark.anyio
+
+
+def _events(body):
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        yield lines["event"], json.loads(lines["data"])
+
+
+async def test_stream_saves_the_model_reply(client, auth_headers):
+    chat = (await client.post("/api/v1/chats/", data={"data": json.dumps({})}, headers=auth_headers)).json()["chat"]
+
+    resp = await client.post(f"/api/v1/chats/{chat['id']}/messages/stream", json={"content": "hello there"}, headers=auth_headers)
+    assert resp.status_code == 200
+    events = list(_events(resp.text))
+    streamed = "".join(data for kind, data in events if kind == "token")
+    assert streamed == settings.FAKE_LLM_RESPONSE
+    assert not streamed.startswith("Error")
+
+    saved = dict(events)["done"]["ai_message"]
+    assert saved["content"] == streamed
+    messages = (await client.get(f"/api/v1/chats/{chat['id']}/messages", headers=auth_headers)).json()["items"]
+    assert [(m["role"], m["content"]) for m in messages] == [("user", "hello there"), ("assistant", streamed)]
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+import pytest
+
+from contextbase.services import ingestion
+from contextbase.services.lexical import get_lexical_index
+from contextbase.services.qdrant import get_qdrant_client
+from contextbase.services.vector_store import _document_filter, physical_collection
+
+pytestmark = pytest.mark.anyio
+
+
+def _chunk_count(collection_id, doc_id):
+    client = get_qdrant_client()
+    physical = physical_collection(collection_id)
+    if not client.collection_exists(physical):
+        return 0
+    return client.count(physical, count_filter=_document_filter(collection_id, doc_id)).count
+
+
+def _lexical_count(collection_id, doc_id):
+    index = get_lexical_index(collection_id, create=False)
+    if index is None:
+        return 0
+    with index._lock:
+        return index._connection().execute("SELECT COUNT(*) FROM chunks WHERE document_id = ?", (doc_id,)).fetchone()[0]
+
+
+async def test_delete_during_index_leaves_no_vectors(client, auth_headers, monkeypatch):
+    started, deleted = threading.Event(), threading.Event()
+    index_document = ingestion.index_document
+
+    def held_index(*args, **kwargs):
+        # the worker has claimed the document; the user deletes it before any chunk is written
+        started.set()
+        deleted.wait(10)
+        return index_document(*args, **kwargs)
+
+    monkeypatch.setattr(ingestion, "index_document", held_index)
+    collection = (await client.post("/api/v1/documents/collections", json={"name": "docs"}, headers=auth_headers)).json()
+    files = [("files", ("notes.txt", b"qdrant keeps the vectors for every chunk of this file. " * 40, "text/plain"))]
+    resp = await client.post(f"/api/v1/documents/collections/{collection['id']}/documents", files=files, headers=auth_headers)
+    doc_id = resp.json()["documents"][0]["id"]
+
+    assert await asyncio.to_thread(started.wait, 10)
+    assert (await client.delete(f"/api/v1/documents/{doc_id}", headers=auth_headers)).status_code == 200
+    deleted.set()
+    await asyncio.wait_for(ingestion._queue.join(), 30)
+
+    assert await asyncio.to_thread(_chunk_count, collection["id"], doc_id) == 0
+    assert await asyncio.to_thread(_lexical_count, collection["id"], doc_id) == 0